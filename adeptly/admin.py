@@ -1,9 +1,10 @@
 from django.contrib import admin
-from .models import Rank, Topic, UserTopicStats, Problem, TrainingSession, TopicExperienceEarned
+from . import search
+from .models import Rank, Topic, UserTopicStats, Problem, TrainingSession, TopicExperienceEarned, AnswerAttempt, TopicMastery, ProblemQueueEntry, ExperienceRollup, UserTotalStats, TopicStats
 
 @admin.register(Rank)
 class RankAdmin(admin.ModelAdmin):
-    list_display = ('name',)
+    list_display = ('name', 'threshold')
 
 @admin.register(Topic)
 class TopicAdmin(admin.ModelAdmin):
@@ -22,13 +23,19 @@ class ProblemAdmin(admin.ModelAdmin):
     filter_horizontal = ('topics', 'solved_by')
     search_fields = ('name', 'prompt')
     
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains scans where there is one
+        if search_term and search.is_supported():
+            return queryset.filter(id__in=search.search_ids(search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+    
     def get_topics(self, obj):
         return ", ".join([t.name for t in obj.topics.all()])
     get_topics.short_description = 'Topics'
 
 @admin.register(TrainingSession)
 class TrainingSessionAdmin(admin.ModelAdmin):
-    list_display = ('user', 'created_at', 'completed_at', 'was_completed', 'correct_attempts', 'incorrect_attempts')
+    list_display = ('user', 'created_at', 'completed_at', 'was_completed', 'total_problems', 'correct_attempts', 'incorrect_attempts')
     list_filter = ('user', 'was_completed', 'created_at')
     filter_horizontal = ('problems', 'problems_completed', 'topics_covered')
     search_fields = ('user__username',)
@@ -38,3 +45,47 @@ class TopicExperienceEarnedAdmin(admin.ModelAdmin):
     list_display = ('user', 'topic', 'experience_earned', 'earned_at')
     list_filter = ('topic', 'user', 'earned_at')
     search_fields = ('user__username', 'topic__name')
+    
+    # The ledger is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(AnswerAttempt)
+class AnswerAttemptAdmin(admin.ModelAdmin):
+    list_display = ('user', 'problem', 'selected_answer', 'is_correct', 'elapsed_ms', 'answered_at')
+    list_filter = ('is_correct', 'answered_at')
+    search_fields = ('user__username', 'problem__name')
+    raw_id_fields = ('user', 'problem', 'training_session')
+    
+    # The attempt log is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(TopicMastery)
+class TopicMasteryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'topic', 'attempts', 'misses', 'weakness')
+    list_filter = ('topic',)
+    search_fields = ('user__username', 'topic__name')
+    raw_id_fields = ('user',)
+
+@admin.register(ProblemQueueEntry)
+class ProblemQueueEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'problem', 'score', 'streak', 'solved', 'due_at', 'last_answered_at')
+    list_filter = ('solved',)
+    search_fields = ('user__username', 'problem__name')
+    raw_id_fields = ('user', 'problem')
+
+@admin.register(ExperienceRollup)
+class ExperienceRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'topic', 'day', 'experience', 'entries')
+    list_filter = ('topic', 'day')
+    search_fields = ('user__username', 'topic__name')
+
+@admin.register(UserTotalStats)
+class UserTotalStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_experience', 'topics_trained', 'updated_at')
+    search_fields = ('user__username',)
+
+@admin.register(TopicStats)
+class TopicStatsAdmin(admin.ModelAdmin):
+    list_display = ('topic', 'users_count')
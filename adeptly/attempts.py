@@ -0,0 +1,245 @@
+"""
+The per-answer attempt log and the analytics read from it.
+
+Every graded answer becomes an AnswerAttempt row: who answered which problem
+in which session, the choice made, whether it was right and how long the
+problem was on screen. The time comes from a signed token rendered with the
+problem (shown_token()), so it costs no session writes or extra queries.
+
+Rows aren't written by the request that grades the answer. Once the grading
+transaction commits they are queued in a process-wide AttemptBuffer and
+written with one bulk INSERT when BUFFER_SIZE rows are waiting or when the
+process exits. The age of the oldest queued row is checked whenever a row
+is queued and at the end of every request, and the queue is written once
+it has waited MAX_AGE seconds, so a quiet process still writes its answers
+after its next request. A crash can lose the last few queued attempts, and
+a batch the database refuses is logged and dropped rather than failing the
+request that happened to write it; the XP ledger and counters are written
+synchronously and are unaffected. The analytics functions flush first, so
+they always see this process's own answers.
+
+problem_calibration() compares each problem's observed accuracy with its
+labelled difficulty and weak_topics() ranks a user's topics by accuracy,
+each in a single grouped query over the attempt table's indexes.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.core import signing
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Avg, Count, F, Q
+
+from .models import AnswerAttempt, Problem, TrainingSession
+
+# Attempts queued before they are written
+BUFFER_SIZE = 100
+
+# Seconds the oldest queued attempt may wait before the queue is written
+MAX_AGE = 5
+
+# Problem times longer than this (an abandoned tab) aren't recorded
+MAX_ELAPSED_MS = 60 * 60 * 1000
+
+# Answers a problem or topic needs before its accuracy is reported
+MIN_ATTEMPTS = 5
+
+# (lowest accuracy, difficulty) from easiest to hardest
+DIFFICULTY_BANDS = [
+    (0.9, 1),
+    (0.75, 2),
+    (0.55, 3),
+    (0.35, 4),
+    (0.0, 5),
+]
+
+SHOWN_SALT = 'adeptly.attempts.shown'
+
+logger = logging.getLogger(__name__)
+
+ProblemCalibration = namedtuple('ProblemCalibration', [
+    'problem_id', 'difficulty', 'attempts', 'correct', 'accuracy', 'avg_correct_ms', 'suggested_difficulty',
+])
+
+TopicWeakness = namedtuple('TopicWeakness', ['topic_id', 'attempts', 'misses', 'accuracy'])
+
+
+class AttemptBuffer:
+    """A thread-safe queue of unsaved AnswerAttempts, written in bulk."""
+
+    def __init__(self, size=BUFFER_SIZE, max_age=MAX_AGE):
+        self.size = size
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.attempts = []
+        self.oldest = None
+
+    def __len__(self):
+        return len(self.attempts)
+
+    def _old(self):
+        return bool(self.attempts) and time.monotonic() - self.oldest >= self.max_age
+
+    def add(self, attempt):
+        """Queue `attempt`, writing the queue if it's full or old enough."""
+        with self.lock:
+            if not self.attempts:
+                self.oldest = time.monotonic()
+            self.attempts.append(attempt)
+            due = len(self.attempts) >= self.size or self._old()
+        if due:
+            self.flush()
+
+    def flush_if_old(self):
+        """Write the queue if its oldest attempt has waited max_age seconds. Returns the number written."""
+        with self.lock:
+            due = self._old()
+        return self.flush() if due else 0
+
+    def clear(self):
+        """Drop the queued attempts without writing them."""
+        with self.lock:
+            attempts, self.attempts = self.attempts, []
+        return attempts
+
+    def flush(self):
+        """
+        Write every queued attempt. Returns the number written. Flushes run
+        after the answers they hold were committed, so a database error is
+        logged and the batch dropped instead of raised.
+        """
+        attempts = self.clear()
+        if not attempts:
+            return 0
+        try:
+            return self._write(attempts)
+        except DatabaseError:
+            logger.exception('Could not write %d queued answer attempts', len(attempts))
+            return 0
+
+    def _write(self, attempts):
+        try:
+            with transaction.atomic():
+                AnswerAttempt.objects.bulk_create(attempts)
+            return len(attempts)
+        except IntegrityError:
+            # Sessions or problems deleted while their attempts were queued
+            # would have taken the attempts with them; leave those out.
+            session_ids = set(TrainingSession.objects.filter(
+                id__in={attempt.training_session_id for attempt in attempts}
+            ).values_list('id', flat=True))
+            problem_ids = set(Problem.objects.filter(
+                id__in={attempt.problem_id for attempt in attempts}
+            ).values_list('id', flat=True))
+            attempts = [
+                attempt for attempt in attempts
+                if attempt.training_session_id in session_ids and attempt.problem_id in problem_ids
+            ]
+            with transaction.atomic():
+                AnswerAttempt.objects.bulk_create(attempts)
+            return len(attempts)
+
+
+buffer = AttemptBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    buffer.flush()
+
+
+def shown_token(session_id, problem_id):
+    """A signed token recording when `problem_id` was shown in `session_id`."""
+    return signing.dumps([session_id, problem_id, int(time.time() * 1000)], salt=SHOWN_SALT, compress=True)
+
+
+def elapsed_ms(token, session_id, problem_id):
+    """
+    Milliseconds since `token` was issued for this session and problem, or
+    None if it's missing, forged, for another problem or implausibly old.
+    """
+    if not token:
+        return None
+    try:
+        shown_session, shown_problem, shown_at = signing.loads(token, salt=SHOWN_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if (shown_session, shown_problem) != (session_id, problem_id):
+        return None
+    elapsed = int(time.time() * 1000) - shown_at
+    return elapsed if 0 <= elapsed <= MAX_ELAPSED_MS else None
+
+
+def record(user, session, problem, selected_answer, is_correct, elapsed=None):
+    """Queue an attempt to be written once the current transaction commits."""
+    attempt = AnswerAttempt(
+        user_id=user.pk, problem_id=problem.pk, training_session_id=session.pk,
+        selected_answer=selected_answer[:1], is_correct=is_correct, elapsed_ms=elapsed,
+    )
+    transaction.on_commit(lambda: buffer.add(attempt))
+
+
+def suggested_difficulty(accuracy):
+    """The difficulty (1-5) that an observed accuracy suggests."""
+    return next(difficulty for lowest, difficulty in DIFFICULTY_BANDS if accuracy >= lowest)
+
+
+def problem_calibration(problem_ids=None, min_attempts=MIN_ATTEMPTS):
+    """
+    ProblemCalibration for every problem (or those in `problem_ids`) with at
+    least `min_attempts` answers, least accurate first.
+    """
+    buffer.flush()
+    attempts = AnswerAttempt.objects.all()
+    if problem_ids is not None:
+        attempts = attempts.filter(problem_id__in=problem_ids)
+    rows = (
+        attempts.values('problem_id')
+        .annotate(
+            difficulty=F('problem__difficulty'),
+            attempts=Count('id'),
+            correct=Count('id', filter=Q(is_correct=True)),
+            avg_correct_ms=Avg('elapsed_ms', filter=Q(is_correct=True)),
+        )
+        .filter(attempts__gte=min_attempts)
+        .order_by()
+    )
+
+    calibrations = []
+    for row in rows:
+        accuracy = row['correct'] / row['attempts']
+        avg_ms = row['avg_correct_ms']
+        calibrations.append(ProblemCalibration(
+            row['problem_id'], row['difficulty'], row['attempts'], row['correct'], accuracy,
+            None if avg_ms is None else round(avg_ms), suggested_difficulty(accuracy),
+        ))
+    calibrations.sort(key=lambda calibration: (calibration.accuracy, calibration.problem_id))
+    return calibrations
+
+
+def weak_topics(user_id, since=None, min_attempts=MIN_ATTEMPTS, limit=None):
+    """
+    TopicWeakness for the topics `user_id` has answered at least
+    `min_attempts` times (since `since`, if given), weakest first.
+    """
+    buffer.flush()
+    attempts = AnswerAttempt.objects.filter(user_id=user_id)
+    if since is not None:
+        attempts = attempts.filter(answered_at__gte=since)
+    rows = (
+        attempts.filter(problem__topics__isnull=False)
+        .values(topic_id=F('problem__topics'))
+        .annotate(attempts=Count('id'), misses=Count('id', filter=Q(is_correct=False)))
+        .filter(attempts__gte=min_attempts)
+        .order_by()
+    )
+
+    weaknesses = [
+        TopicWeakness(row['topic_id'], row['attempts'], row['misses'], 1 - row['misses'] / row['attempts'])
+        for row in rows
+    ]
+    weaknesses.sort(key=lambda weakness: (weakness.accuracy, -weakness.attempts, weakness.topic_id))
+    return weaknesses[:limit] if limit else weaknesses
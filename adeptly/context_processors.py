@@ -1,5 +1,6 @@
 from django.conf import settings
-from .models import Topic, UserTopicStats
+from django.utils.functional import SimpleLazyObject
+from .stats import get_user_summary
 
 def adeptly_context(request):
     """
@@ -10,14 +11,12 @@ def adeptly_context(request):
         'app_version': '1.0.0',
     }
     
-    # Add user-specific data if user is logged in
+    # Add user-specific data if user is logged in. The summary is lazy so
+    # pages that never display it don't pay for it.
     if request.user.is_authenticated:
-        try:
-            # Get user's top topics by experience
-            top_topics = UserTopicStats.objects.filter(user=request.user).order_by('-experience')[:3]
-            context['user_top_topics'] = top_topics
-        except:
-            # Handle the case where the user has no topic stats
-            pass
+        user_id = request.user.pk
+        summary = SimpleLazyObject(lambda: get_user_summary(user_id))
+        context['user_summary'] = summary
+        context['user_top_topics'] = SimpleLazyObject(lambda: summary['top_topics'])
     
     return context
@@ -0,0 +1,648 @@
+"""
+Streaming export and restore of the whole database.
+
+export() writes one NDJSON file per model in dependency order, followed by
+the auto-created many-to-many tables, plus a manifest.json recording each
+file's columns, row count and SHA-256 checksum. Rows are read with
+.iterator(chunk_size=...) and written as they arrive, so memory use stays
+flat however large the tables are. Each line is a JSON array of column
+values in the order given by the manifest's `fields`.
+
+Permissions are recreated by migrate with ids of their own, so they aren't
+exported; the user and group permission rows that point at them are, with
+each permission written as its natural key (codename, app label, model)
+and matched to the target database's permission ids on restore.
+
+Files may be gzip or zstd compressed. zstd needs the optional `zstandard`
+package. Checksums cover the uncompressed NDJSON so they don't depend on
+the compression used.
+
+restore() streams an export directory, or a legacy Django JSON dump, back
+into a database: rows are buffered per table and written with COPY on
+PostgreSQL or batched multi-row INSERTs elsewhere, in transactions of a configurable
+size with foreign key checks deferred to each commit. Rows the database
+rejects are written to a reject file and the load carries on.
+"""
+
+import base64
+import datetime
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import time
+from collections import namedtuple
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.utils import timezone
+
+FORMAT = 'adeptly-export'
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+
+CHUNK_SIZE = 2000
+
+# Rebuilt by migrate or meaningless on another database
+EXCLUDED_MODELS = {
+    'contenttypes.contenttype',
+    'auth.permission',
+    'admin.logentry',
+    'sessions.session',
+    'adeptly.migrationcheckpoint',
+}
+
+# Excluded models that rows of other tables may still point at. Those
+# references are written as the natural key of the row, and the value maps
+# each model to the relations its natural_key() reads.
+NATURAL_KEY_MODELS = {
+    'auth.permission': ['content_type'],
+}
+
+COMPRESSION_SUFFIXES = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without its truncation of times to milliseconds."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError('zstd compression requires the zstandard package (pip install zstandard)')
+    return zstandard
+
+
+def open_writer(path, compression='none'):
+    """A binary file object for `path` that compresses what's written to it."""
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compression == 'zstd':
+        return _zstandard().ZstdCompressor().stream_writer(open(path, 'wb'))
+    return open(path, 'wb')
+
+
+def open_reader(path):
+    """A binary file object for `path`, decompressed according to its suffix."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        return _zstandard().ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def _sort_by_foreign_keys(models):
+    """Order `models` so each comes after the models its foreign keys point to."""
+    remaining = list(models)
+    ordered = []
+    while remaining:
+        done = set(ordered)
+        ready = [
+            model for model in remaining
+            if all(
+                field.related_model in done or field.related_model is model or field.related_model not in remaining
+                for field in model._meta.concrete_fields if field.is_relation
+            )
+        ]
+        # A foreign key cycle: break it in registration order
+        ordered.extend(ready or remaining[:1])
+        remaining = [model for model in remaining if model not in ordered]
+    return ordered
+
+
+def export_models(exclude=()):
+    """Models to export, each after the models it references."""
+    excluded = EXCLUDED_MODELS | {label.lower() for label in exclude}
+    models = _sort_by_foreign_keys([
+        model for model in apps.get_models()
+        if model._meta.label_lower not in excluded
+        and model._meta.managed and not model._meta.proxy
+    ])
+
+    # Many-to-many tables go last, so both sides already exist
+    through_models = []
+    for model in models:
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            related = {f.related_model._meta.label_lower for f in through._meta.fields if f.is_relation}
+            if through._meta.auto_created and not related & (excluded - NATURAL_KEY_MODELS.keys()):
+                through_models.append(through)
+
+    return models + through_models
+
+
+def _natural_key_field(field):
+    return field.is_relation and field.related_model._meta.label_lower in NATURAL_KEY_MODELS
+
+
+def natural_keys(model, using=DEFAULT_DB_ALIAS):
+    """{pk: natural key as a list} for every row of one of NATURAL_KEY_MODELS."""
+    rows = model._base_manager.using(using).select_related(*NATURAL_KEY_MODELS[model._meta.label_lower])
+    return {row.pk: list(row.natural_key()) for row in rows}
+
+
+def _encoders(fields, using=DEFAULT_DB_ALIAS):
+    """
+    Per-column functions making values JSON serializable and replacing ids
+    of NATURAL_KEY_MODELS rows with their natural keys.
+    """
+    def binary(value):
+        return None if value is None else base64.b64encode(bytes(value)).decode('ascii')
+
+    def natural_key(keys):
+        return lambda value: keys.get(value, value)
+
+    encoders = []
+    for field in fields:
+        if field.get_internal_type() == 'BinaryField':
+            encoders.append(binary)
+        elif _natural_key_field(field):
+            encoders.append(natural_key(natural_keys(field.related_model, using)))
+        else:
+            encoders.append(None)
+    return encoders
+
+
+def _encoded_lines(model, using, chunk_size):
+    """The NDJSON lines of a model's rows in primary key order, as bytes."""
+    fields = list(model._meta.concrete_fields)
+    names = [field.attname for field in fields]
+    encoders = _encoders(fields, using)
+    convert = any(encoders)
+    encoder = ExportEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    rows = model._base_manager.using(using).order_by('pk').values_list(*names).iterator(chunk_size=chunk_size)
+    for row in rows:
+        if convert:
+            row = [encode(value) if encode else value for encode, value in zip(encoders, row)]
+        yield (encoder.encode(row) + '\n').encode('utf-8')
+
+
+def table_digest(model, using=DEFAULT_DB_ALIAS, chunk_size=CHUNK_SIZE):
+    """
+    (row count, SHA-256) of a model's table, hashed exactly as export()
+    checksums its file, so the same rows match across database vendors.
+    """
+    checksum = hashlib.sha256()
+    count = 0
+    for line in _encoded_lines(model, using, chunk_size):
+        checksum.update(line)
+        count += 1
+    return count, checksum.hexdigest()
+
+
+def _export_model(model, directory, compression, chunk_size, using):
+    filename = model._meta.label_lower + '.ndjson' + COMPRESSION_SUFFIXES[compression]
+    checksum = hashlib.sha256()
+    count = 0
+
+    with open_writer(os.path.join(directory, filename), compression) as f:
+        for line in _encoded_lines(model, using, chunk_size):
+            checksum.update(line)
+            f.write(line)
+            count += 1
+
+    return {
+        'model': model._meta.label_lower,
+        'table': model._meta.db_table,
+        'file': filename,
+        'fields': [field.attname for field in model._meta.concrete_fields],
+        'count': count,
+        'sha256': checksum.hexdigest(),
+    }
+
+
+def export(directory, compression='none', chunk_size=CHUNK_SIZE, exclude=(), using=DEFAULT_DB_ALIAS,
+           on_model=None):
+    """
+    Export every model to `directory` and write its manifest.
+    `on_model` is called with each manifest entry as its file is finished.
+    Returns the manifest.
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f'Unknown compression {compression!r}')
+    if compression == 'zstd':
+        _zstandard()
+    os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    entries = []
+    connection = connections[using]
+
+    # Read everything from one snapshot so related tables agree
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        for model in export_models(exclude):
+            entry = _export_model(model, directory, compression, chunk_size, using)
+            entries.append(entry)
+            if on_model:
+                on_model(entry)
+
+    manifest = {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'created_at': timezone.now().isoformat(),
+        'vendor': connection.vendor,
+        'compression': compression,
+        'elapsed': round(time.perf_counter() - start, 3),
+        'models': entries,
+    }
+
+    # Write the manifest last, and atomically, so it marks a complete export
+    path = os.path.join(directory, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+    return manifest
+
+
+# Restoring
+
+# Rows buffered per table before they are written
+BATCH_SIZE = 2000
+
+# Rows written per transaction
+TRANSACTION_ROWS = 50000
+
+LEGACY_READ_SIZE = 1 << 16
+
+RestoreResult = namedtuple('RestoreResult', ['rows', 'rejected', 'elapsed', 'counts'])
+
+
+class RestoreError(Exception):
+    pass
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT or manifest.get('version') != FORMAT_VERSION:
+        raise RestoreError(f'{directory} does not contain an {FORMAT} v{FORMAT_VERSION} export')
+    return manifest
+
+
+def verify_export(directory, manifest):
+    """Check every file against the row counts and checksums in the manifest."""
+    for entry in manifest['models']:
+        checksum = hashlib.sha256()
+        count = 0
+        with open_reader(os.path.join(directory, entry['file'])) as f:
+            for line in f:
+                checksum.update(line)
+                count += 1
+        if count != entry['count'] or checksum.hexdigest() != entry['sha256']:
+            raise RestoreError(f'{entry["file"]} does not match the manifest (corrupt or truncated export)')
+
+
+def _export_rows(directory, manifest):
+    """(model, field names, values) for every row of an export directory."""
+    for entry in manifest['models']:
+        model = apps.get_model(entry['model'])
+        names = tuple(entry['fields'])
+        with open_reader(os.path.join(directory, entry['file'])) as f:
+            for line in f:
+                yield model, names, json.loads(line)
+
+
+def iter_json_array(f, read_size=LEGACY_READ_SIZE):
+    """Yield the items of a JSON array from a text file without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = eof = False
+
+    while True:
+        # Skip separators, reading more text as needed
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            more = f.read(read_size)
+            eof = not more
+            buffer, position = buffer[position:] + more, 0
+
+        if position >= len(buffer):
+            raise RestoreError('Unexpected end of JSON dump')
+        if not started:
+            if buffer[position] != '[':
+                raise RestoreError('Expected a JSON array of objects')
+            started = True
+            position += 1
+            continue
+        if buffer[position] == ']':
+            return
+
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The item is cut off at the end of the buffer
+            more = f.read(read_size)
+            eof = not more
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield item
+
+
+def _legacy_rows(path, exclude=()):
+    """
+    (model, field names, values) for the objects of a Django JSON dump,
+    as written by dumpdata or the old export_sqlite_data.py.
+    Many-to-many values become rows of the auto-created through tables,
+    except user and group permissions: the dump's permission ids don't
+    match the target's, so those are left out.
+    """
+    excluded = EXCLUDED_MODELS | {label.lower() for label in exclude}
+    with open(path, encoding='utf-8') as f:
+        for item in iter_json_array(f):
+            if item['model'] in excluded:
+                continue
+            model = apps.get_model(item['model'])
+            opts = model._meta
+            fields = item['fields']
+
+            names = [opts.pk.attname]
+            values = [item.get('pk')]
+            for field in opts.concrete_fields:
+                if field.name in fields and not field.primary_key:
+                    names.append(field.attname)
+                    values.append(fields[field.name])
+            yield model, tuple(names), values
+
+            for field in opts.local_many_to_many:
+                through = field.remote_field.through
+                if field.name not in fields or not through._meta.auto_created:
+                    continue
+                if field.related_model._meta.label_lower in excluded:
+                    continue
+                names = (field.m2m_column_name(), field.m2m_reverse_name())
+                for related_pk in fields[field.name]:
+                    yield through, names, [item['pk'], related_pk]
+
+
+class _Loader:
+    """
+    Buffers rows per table and writes them with COPY or batched INSERTs.
+    A strict loader raises RestoreError on the first bad row instead of
+    rejecting it. Callers producing rows they know to be consistent can
+    skip the foreign key pre-checks with check_foreign_keys=False.
+    Natural keys of NATURAL_KEY_MODELS rows are replaced with the ids of the
+    matching rows in the target database.
+    """
+
+    def __init__(self, using, method, batch_size, reject_file, strict=False, check_foreign_keys=True):
+        self.using = using
+        self.connection = connections[using]
+        self.method = method
+        self.batch_size = batch_size
+        self.reject_file = reject_file
+        self.strict = strict
+        self.check_foreign_keys = check_foreign_keys
+        self.buffers = {}
+        self.decoders = {}
+        self.written = {}
+        self.rejected = 0
+
+    def _decoders(self, model, names):
+        """(position, {natural key: id}) for the natural key columns of `names`."""
+        decoders = []
+        for position, name in enumerate(names):
+            field = model._meta.get_field(name)
+            if _natural_key_field(field):
+                keys = natural_keys(field.related_model, self.using)
+                decoders.append((position, {tuple(key): pk for pk, key in keys.items()}))
+        return decoders
+
+    def add(self, model, names, values):
+        key = (model, names)
+        decoders = self.decoders.get(key)
+        if decoders is None:
+            decoders = self.decoders[key] = self._decoders(model, names)
+        if decoders:
+            values = list(values)
+            for position, ids in decoders:
+                if isinstance(values[position], list):
+                    # Unknown keys stay lists and are rejected as missing parents
+                    values[position] = ids.get(tuple(values[position]), values[position])
+        buffer = self.buffers.setdefault(key, [])
+        buffer.append(values)
+        if len(buffer) >= self.batch_size:
+            self.flush(key)
+
+    def flush(self, key=None):
+        """
+        Write the buffer for `key` (or every buffer). Buffers started earlier
+        in the stream are written first, so parent rows land before the rows
+        that reference them.
+        """
+        for buffered_key in list(self.buffers):
+            self._write(buffered_key, self.buffers.pop(buffered_key))
+            if buffered_key == key:
+                break
+
+    def _write(self, key, rows):
+        model, names = key
+        if self.check_foreign_keys:
+            rows = self._check_foreign_keys(model, names, rows)
+        if not rows:
+            return
+        try:
+            with transaction.atomic(using=self.using):
+                if self.method == 'copy':
+                    self._copy(model, names, rows)
+                else:
+                    self._insert(model, names, rows)
+        except DatabaseError:
+            # Find the bad rows one by one so the good ones still load
+            for values in rows:
+                try:
+                    with transaction.atomic(using=self.using):
+                        self._insert(model, names, [values])
+                except DatabaseError as e:
+                    self.reject(model, names, values, e)
+                else:
+                    self._count(model, 1)
+        else:
+            self._count(model, len(rows))
+
+    def _check_foreign_keys(self, model, names, rows):
+        """Reject rows whose foreign keys point at rows that don't exist."""
+        bad = {}
+        for position, name in enumerate(names):
+            field = model._meta.get_field(name)
+            if not field.is_relation or not field.concrete:
+                continue
+            target = field.target_field.attname
+            parent = field.related_model
+            # Natural keys (lists) that didn't match a row are rejected below
+            values = {
+                row[position] for row in rows
+                if row[position] is not None and not isinstance(row[position], list)
+            }
+            if not values:
+                continue
+            found = set(
+                parent._base_manager.using(self.using)
+                .filter(**{f'{target}__in': values}).values_list(target, flat=True)
+            )
+            if parent is model and target in names:
+                # Rows may point at other rows of the same batch
+                found.update(row[names.index(target)] for row in rows)
+            for index, row in enumerate(rows):
+                value = row[position]
+                if value is not None and (isinstance(value, list) or value not in found):
+                    bad.setdefault(index, f'no {parent._meta.label_lower} row with {target}={value!r}')
+
+        for index, error in bad.items():
+            self.reject(model, names, rows[index], error)
+        return [row for index, row in enumerate(rows) if index not in bad]
+
+    def _count(self, model, count):
+        label = model._meta.label_lower
+        self.written[label] = self.written.get(label, 0) + count
+
+    def _insert(self, model, names, rows):
+        fields = [model._meta.get_field(name) for name in names]
+        binary = [field.get_internal_type() == 'BinaryField' for field in fields]
+        objects = []
+        for values in rows:
+            if any(binary):
+                values = [field.to_python(value) if is_binary else value
+                          for field, is_binary, value in zip(fields, binary, values)]
+            objects.append(model(**dict(zip(names, values))))
+
+        # bulk_create() would re-stamp auto_now fields, so use the raw insert
+        # it is built on, as loaddata does, batched the same way
+        queryset = model._base_manager.using(self.using)
+        batch_size = max(self.connection.ops.bulk_batch_size(fields, objects), 1)
+        for start in range(0, len(objects), batch_size):
+            queryset._insert(objects[start:start + batch_size], fields=fields, raw=True, using=self.using)
+
+    def _copy(self, model, names, rows):
+        fields = [model._meta.get_field(name) for name in names]
+        buffer = io.StringIO()
+        for values in rows:
+            buffer.write(','.join(_copy_value(field, value) for field, value in zip(fields, values)) + '\n')
+        buffer.seek(0)
+
+        quote = self.connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        with self.connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+    def reject(self, model, names, values, error):
+        if self.strict:
+            raise RestoreError(f'{model._meta.label_lower} row {values!r}: {error}')
+        self.rejected += 1
+        if self.reject_file is not None:
+            self.reject_file.write(json.dumps(
+                {'model': model._meta.label_lower, 'fields': list(names), 'values': values, 'error': str(error)},
+                cls=ExportEncoder,
+            ) + '\n')
+
+
+def _copy_value(field, value):
+    """
+    A value in PostgreSQL's CSV COPY format. NULL is an unquoted empty field
+    and everything else is quoted, so empty strings stay empty strings.
+    """
+    if value is None:
+        return ''
+    internal_type = field.get_internal_type()
+    if internal_type == 'BinaryField':
+        value = '\\x' + base64.b64decode(value).hex()
+    elif internal_type == 'JSONField':
+        value = json.dumps(value)
+    elif isinstance(value, bool):
+        value = 't' if value else 'f'
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def reset_sequences(using=DEFAULT_DB_ALIAS):
+    """Point every auto-increment sequence past the highest restored id."""
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), apps.get_models(include_auto_created=True))
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def restore(source, method='auto', batch_size=BATCH_SIZE, transaction_rows=TRANSACTION_ROWS,
+            reject_path=None, exclude=(), verify=True, using=DEFAULT_DB_ALIAS, on_progress=None):
+    """
+    Load an export directory or a legacy Django JSON dump into an empty database.
+
+    Rows are committed every `transaction_rows` rows with foreign key checks
+    deferred to the end of each transaction. Rows the database refuses, or
+    whose foreign keys point at missing rows, are written to `reject_path`
+    as NDJSON instead of stopping the restore.
+    `on_progress` is called with the running row count after each commit.
+    Returns a RestoreResult.
+    """
+    connection = connections[using]
+    if method == 'auto':
+        method = 'copy' if connection.vendor == 'postgresql' else 'insert'
+    if method == 'copy' and connection.vendor != 'postgresql':
+        raise RestoreError('COPY is only available on PostgreSQL')
+
+    if os.path.isdir(source):
+        manifest = read_manifest(source)
+        if verify:
+            verify_export(source, manifest)
+        excluded = {label.lower() for label in exclude}
+        rows = (row for row in _export_rows(source, manifest) if row[0]._meta.label_lower not in excluded)
+    else:
+        rows = _legacy_rows(source, exclude)
+
+    start = time.perf_counter()
+    reject_file = open(reject_path, 'w', encoding='utf-8') if reject_path else None
+    loader = _Loader(using, method, batch_size, reject_file)
+    rows = iter(rows)
+    total = 0
+
+    try:
+        while True:
+            with transaction.atomic(using=using):
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+                count = 0
+                for model, names, values in itertools.islice(rows, transaction_rows):
+                    loader.add(model, names, values)
+                    count += 1
+                loader.flush()
+            total += count
+            if on_progress and count:
+                on_progress(total)
+            if count < transaction_rows:
+                break
+        reset_sequences(using)
+    finally:
+        if reject_file is not None:
+            reject_file.close()
+
+    written = sum(loader.written.values())
+    return RestoreResult(written, loader.rejected, time.perf_counter() - start, loader.written)
@@ -0,0 +1,157 @@
+"""
+Answer grading for training sessions.
+
+record_answer() records a single answer in a fixed number of queries no
+matter how many topics the problem covers: ledger rows are bulk inserted,
+UserTopicStats experience and rank are bumped with one conditional UPDATE
+built from the cached rank ladder, and solved state is claimed with an
+INSERT ... ON CONFLICT DO NOTHING. It takes plain model instances so it can
+be called from views, management commands or scripts.
+
+Every counter is incremented in the database rather than read, changed and
+saved, so concurrent answers (double-clicks, several tabs or workers) can't
+lose updates. That includes the problem's own attempt_count and
+solve_count, which are bumped by one UPDATE per answer. Missing
+UserTopicStats rows are inserted with ON CONFLICT DO NOTHING ... RETURNING,
+which tells each request exactly which rows it created even when two race
+to create the same one.
+"""
+
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Problem, TrainingSession, UserTopicStats, TopicExperienceEarned
+from . import attempts, leaderboard, ranks, selection, solved, stats
+
+AnswerResult = namedtuple('AnswerResult', ['is_correct', 'experience_earned', 'newly_solved'])
+
+
+def _insert_ignoring_conflicts(model, columns, rows, conflict, returning):
+    """
+    INSERT `rows` into `model`'s table, skipping rows that would violate the
+    unique `conflict` columns. Returns the `returning` column of each row
+    actually inserted.
+    """
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(map(quote, columns))}) '
+            f'VALUES {placeholders} '
+            f'ON CONFLICT ({", ".join(map(quote, conflict))}) DO NOTHING '
+            f'RETURNING {quote(returning)}',
+            [value for row in rows for value in row],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _count_attempt(session, field):
+    """Increment one of `session`'s attempt counters and refresh both on the instance."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {quote(TrainingSession._meta.db_table)} SET {quote(field)} = {quote(field)} + 1 '
+            f'WHERE {quote("id")} = %s RETURNING {quote("correct_attempts")}, {quote("incorrect_attempts")}',
+            [session.pk],
+        )
+        row = cursor.fetchone()
+    if row:
+        session.correct_attempts, session.incorrect_attempts = row
+
+
+def _count_problem(problem, newly_solved):
+    """Count an answer to `problem`, and a new solver if `newly_solved`."""
+    counts = {'attempt_count': F('attempt_count') + 1}
+    if newly_solved:
+        counts['solve_count'] = F('solve_count') + 1
+    Problem.objects.filter(pk=problem.pk).update(**counts)
+
+
+def experience_for(problem):
+    """XP awarded per topic for solving a problem."""
+    return problem.difficulty * 10
+
+
+@transaction.atomic
+def record_answer(user, session, problem, selected_answer, elapsed_ms=None):
+    """
+    Grade `selected_answer` for `problem` and record the outcome.
+
+    Updates the session's attempt counters, marks the problem solved and
+    completed, writes the XP ledger and awards experience for every topic of
+    the problem. The answer and `elapsed_ms` (time spent on the problem) are
+    queued for the attempt log, and the user's adaptive problem queue is
+    rescored. Returns an AnswerResult.
+    """
+    is_correct = selected_answer == problem.correct_answer
+    attempts.record(user, session, problem, selected_answer, is_correct, elapsed_ms)
+    topic_ids = list(
+        Problem.topics.through.objects.filter(problem_id=problem.pk).values_list('topic_id', flat=True)
+    )
+
+    if not is_correct:
+        _count_attempt(session, 'incorrect_attempts')
+        _count_problem(problem, newly_solved=False)
+        selection.record_outcome(user, problem, topic_ids, is_correct=False)
+        return AnswerResult(False, 0, False)
+
+    _count_attempt(session, 'correct_attempts')
+
+    # Mark problem as solved; only the request that inserts the row sees it as new
+    newly_solved = bool(_insert_ignoring_conflicts(
+        Problem.solved_by.through, ['problem_id', 'user_id'], [(problem.pk, user.pk)],
+        conflict=['problem_id', 'user_id'], returning='id',
+    ))
+    _count_problem(problem, newly_solved)
+    if newly_solved:
+        solved.invalidate_solved_sets([user.pk])
+
+    # Add to the session's completed problems
+    ProblemsCompleted = TrainingSession.problems_completed.through
+    ProblemsCompleted.objects.bulk_create(
+        [ProblemsCompleted(trainingsession_id=session.pk, problem_id=problem.pk)], ignore_conflicts=True
+    )
+
+    exp_earned = experience_for(problem)
+    if topic_ids:
+        award_experience(user, session, problem, topic_ids, exp_earned)
+    selection.record_outcome(user, problem, topic_ids, is_correct=True)
+
+    return AnswerResult(True, exp_earned * len(topic_ids), newly_solved)
+
+
+def award_experience(user, session, problem, topic_ids, exp_earned):
+    """Award `exp_earned` XP in each of `topic_ids` for solving `problem`."""
+    # Record experience earned
+    TopicExperienceEarned.objects.bulk_create([
+        TopicExperienceEarned(
+            user=user,
+            topic_id=topic_id,
+            experience_earned=exp_earned,
+            training_session=session,
+            problem=problem,
+        )
+        for topic_id in topic_ids
+    ])
+
+    ladder = ranks.get_ladder()
+
+    # Create stats rows for topics the user hasn't trained before
+    new_topic_ids = _insert_ignoring_conflicts(
+        UserTopicStats, ['user_id', 'topic_id', 'experience', 'rank_id'],
+        [(user.pk, topic_id, 0, ladder.rank_id_for(0)) for topic_id in topic_ids],
+        conflict=['user_id', 'topic_id'], returning='topic_id',
+    )
+
+    # Add experience and promote rank in one statement, which row-locks the
+    # stats so concurrent awards queue up behind it. The WHEN conditions see
+    # the pre-update experience, so compare against threshold - exp_earned.
+    UserTopicStats.objects.filter(user=user, topic_id__in=topic_ids).update(
+        experience=F('experience') + exp_earned,
+        rank=ladder.rank_case('experience', exp_earned),
+    )
+
+    leaderboard.record_experience(user.pk, exp_earned * len(topic_ids), new_topic_ids)
+    stats.invalidate_user_summary(user.pk)
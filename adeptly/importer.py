@@ -0,0 +1,239 @@
+"""
+Bulk, idempotent problem imports.
+
+Problems are read lazily from JSONL, CSV or YAML files and written in
+batches: each batch is upserted on Problem.slug with a single
+bulk_create(update_conflicts=True), its topic links are replaced with one
+executemany() insert into the through table, and the search index is
+refreshed for it. Re-running an import updates problems in place instead
+of duplicating them. Rows without a slug get one derived from their name;
+a name with nothing to slugify, or two rows of one import deriving the same
+slug, is an error rather than a silent overwrite.
+
+Each row holds the Problem fields plus `topics`, a list of topic names
+(a "|"-separated string in CSV files).
+"""
+
+import csv
+import json
+import os
+import time
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from .models import Problem, Topic
+from . import sampling, search
+
+BANK_DIR = os.path.join(os.path.dirname(__file__), 'problem_bank')
+
+BATCH_SIZE = 1000
+
+REQUIRED_FIELDS = [
+    'name', 'prompt', 'choice_a', 'choice_b', 'choice_c', 'choice_d',
+    'correct_answer', 'estimated_time_to_complete',
+]
+
+UPDATE_FIELDS = REQUIRED_FIELDS + ['difficulty']
+
+CSV_TOPIC_SEPARATOR = '|'
+
+ImportResult = namedtuple('ImportResult', ['rows', 'created', 'updated', 'elapsed'])
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                yield line_number, json.loads(line)
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        # Line 1 is the header
+        for line_number, row in enumerate(csv.DictReader(f), 2):
+            topics = row.get('topics') or ''
+            row['topics'] = [name.strip() for name in topics.split(CSV_TOPIC_SEPARATOR) if name.strip()]
+            yield line_number, row
+
+
+def read_yaml(path):
+    """YAML files may hold one list of problems or a stream of documents."""
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError('Reading YAML files requires PyYAML (pip install pyyaml)')
+
+    with open(path, encoding='utf-8') as f:
+        number = 0
+        for document in yaml.safe_load_all(f):
+            for row in document if isinstance(document, list) else [document]:
+                if row is not None:
+                    number += 1
+                    yield number, row
+
+
+READERS = {
+    '.jsonl': read_jsonl,
+    '.ndjson': read_jsonl,
+    '.csv': read_csv,
+    '.yaml': read_yaml,
+    '.yml': read_yaml,
+}
+
+
+def read_rows(path):
+    """(location, row) pairs from a problem file, chosen by its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f'{path}: unsupported file type (expected one of {", ".join(sorted(READERS))})')
+    for number, row in READERS[extension](path):
+        yield f'{os.path.basename(path)}:{number}', row
+
+
+def build_problem(location, row):
+    """A validated, unsaved Problem and its topic names for one row."""
+    missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f'{location}: missing {", ".join(missing)}')
+
+    correct_answer = str(row['correct_answer']).strip().upper()
+    if correct_answer not in ('A', 'B', 'C', 'D'):
+        raise ValueError(f'{location}: correct_answer must be A, B, C or D')
+
+    try:
+        estimated_time = int(row['estimated_time_to_complete'])
+        difficulty = int(row.get('difficulty') or 3)
+    except (TypeError, ValueError):
+        raise ValueError(f'{location}: estimated_time_to_complete and difficulty must be integers')
+    if not 1 <= difficulty <= 5:
+        raise ValueError(f'{location}: difficulty must be between 1 and 5')
+
+    slug = row.get('slug') or slugify(row['name'])
+    if not slug:
+        raise ValueError(f'{location}: cannot derive a slug from the name; give the row a slug')
+    problem = Problem(
+        slug=slug,
+        name=row['name'],
+        prompt=row['prompt'],
+        choice_a=row['choice_a'],
+        choice_b=row['choice_b'],
+        choice_c=row['choice_c'],
+        choice_d=row['choice_d'],
+        correct_answer=correct_answer,
+        estimated_time_to_complete=estimated_time,
+        difficulty=difficulty,
+    )
+    return problem, list(row.get('topics') or [])
+
+
+def get_topic_ids(names, create=False):
+    """Map topic names to ids; unknown topics are created or rejected."""
+    topic_ids = dict(Topic.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = sorted(set(names) - set(topic_ids))
+    if missing and not create:
+        raise ValueError(f'Unknown topics: {", ".join(missing)}. Please run initialize_adeptly first.')
+    for name in missing:
+        # Few and rare, so create them one by one to fire the Topic signals
+        topic_ids[name] = Topic.objects.get_or_create(name=name)[0].id
+    return topic_ids
+
+
+def _write_batch(batch, topic_ids):
+    """Upsert one batch of (problem, topic names) pairs."""
+    slugs = [problem.slug for problem, names in batch]
+    existing = set(Problem.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+
+    Problem.objects.bulk_create(
+        [problem for problem, names in batch],
+        update_conflicts=True,
+        unique_fields=['slug'],
+        update_fields=UPDATE_FIELDS,
+    )
+    problem_ids = dict(Problem.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+
+    # Replace the topic links of every problem in the batch. The rows are
+    # plain id pairs, so insert them with one executemany() rather than
+    # building a model instance and compiling SQL for each.
+    ProblemTopics = Problem.topics.through
+    ProblemTopics.objects.filter(problem_id__in=problem_ids.values()).delete()
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {ProblemTopics._meta.db_table} (problem_id, topic_id) VALUES (%s, %s)',
+            [
+                (problem_ids[problem.slug], topic_ids[name])
+                for problem, names in batch
+                for name in set(names)
+            ],
+        )
+
+    search.index_problems(problem_ids.values())
+    return len(batch) - len(existing), len(existing)
+
+
+def _batches(rows, batch_size):
+    """
+    Validated batches. A later row with the same explicit slug replaces the
+    earlier one; a repeated slug that either row derived from its name is
+    an error.
+    """
+    batch = {}
+    seen = {}
+    for location, row in rows:
+        problem, names = build_problem(location, row)
+        derived = not row.get('slug')
+        earlier = seen.get(problem.slug)
+        if earlier and (derived or earlier[1]):
+            raise ValueError(
+                f'{location}: slug "{problem.slug}" is also used by {earlier[0]}; give the rows distinct slugs'
+            )
+        seen[problem.slug] = (location, derived)
+        batch[problem.slug] = (problem, names)
+        if len(batch) >= batch_size:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+def import_rows(rows, create_topics=False, batch_size=BATCH_SIZE, on_problem=None):
+    """
+    Import (location, row) pairs in batches inside one transaction.
+    `on_problem` is called with each Problem after its batch is written.
+    Returns an ImportResult; raises ValueError on the first invalid row.
+    """
+    start = time.perf_counter()
+    created = updated = 0
+    topic_ids = {}
+
+    with transaction.atomic():
+        for batch in _batches(rows, batch_size):
+            names = {name for problem, topic_names in batch for name in topic_names}
+            unknown = names - set(topic_ids)
+            if unknown:
+                topic_ids.update(get_topic_ids(unknown, create=create_topics))
+
+            batch_created, batch_updated = _write_batch(batch, topic_ids)
+            created += batch_created
+            updated += batch_updated
+            if on_problem:
+                for problem, topic_names in batch:
+                    on_problem(problem)
+
+        sampling.invalidate()
+
+    return ImportResult(created + updated, created, updated, time.perf_counter() - start)
+
+
+def import_files(paths, **kwargs):
+    """Import every problem in `paths` as a single transaction."""
+    def rows():
+        for path in paths:
+            yield from read_rows(path)
+    return import_rows(rows(), **kwargs)
+
+
+def bank_path(filename):
+    """Path of a file shipped in adeptly/problem_bank."""
+    return os.path.join(BANK_DIR, filename)
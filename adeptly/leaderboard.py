@@ -0,0 +1,253 @@
+"""
+Materialized leaderboard for Adeptly.
+
+UserTotalStats holds one row per user with their summed XP and TopicStats
+holds one row per topic with the number of users training it. Both are
+derived from UserTopicStats and kept current by the signal handlers in
+signals.py (for ORM saves) and by record_experience() (for code paths that
+update UserTopicStats with queryset updates, which don't fire signals).
+
+Reads are served from indexed columns so the leaderboard never has to
+aggregate the full UserTopicStats table on a page view. Weekly and monthly
+leaderboards sum the per-day ExperienceRollup rows of the window instead.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import ExperienceRollup, User, Topic, UserTopicStats, UserTotalStats, TopicStats
+
+# Leaderboard periods, in the order they're offered
+PERIODS = {
+    'week': 'This Week',
+    'month': 'This Month',
+    'all': 'All Time',
+}
+
+
+def refresh_user(user_id):
+    """Recompute the materialized total for a single user."""
+    totals = UserTopicStats.objects.filter(user_id=user_id).aggregate(
+        total_experience=Sum('experience'),
+        topics_trained=Count('topic', distinct=True),
+    )
+
+    if not totals['topics_trained']:
+        UserTotalStats.objects.filter(user_id=user_id).delete()
+        return None
+
+    total, created = UserTotalStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'total_experience': totals['total_experience'] or 0,
+            'topics_trained': totals['topics_trained'],
+        }
+    )
+    return total
+
+
+def refresh_topics(topic_ids, create=True):
+    """
+    Recompute the materialized user counts for the given topics.
+    With create=False only existing TopicStats rows are touched, which is
+    what delete handlers want while a topic may be mid-cascade.
+    """
+    topic_ids = set(topic_ids)
+    counts = dict(
+        UserTopicStats.objects.filter(topic_id__in=topic_ids)
+        .values_list('topic_id')
+        .annotate(users_count=Count('user', distinct=True))
+        .order_by()
+    )
+
+    if not create:
+        topic_ids = set(
+            TopicStats.objects.filter(topic_id__in=topic_ids).values_list('topic_id', flat=True)
+        )
+
+    # Replace the rows wholesale so the cost doesn't depend on len(topic_ids)
+    TopicStats.objects.filter(topic_id__in=topic_ids).delete()
+    TopicStats.objects.bulk_create([
+        TopicStats(topic_id=topic_id, users_count=counts.get(topic_id, 0))
+        for topic_id in topic_ids
+    ])
+
+
+def record_experience(user_id, experience, new_topic_ids=()):
+    """
+    Apply an XP award to the materialized tables without re-aggregating.
+
+    `experience` is the total XP added across all topics and `new_topic_ids`
+    are the topics the user had no UserTopicStats row for before the award.
+    Falls back to a full refresh when the materialized rows don't exist yet.
+    """
+    new_topic_ids = list(new_topic_ids)
+
+    updated = UserTotalStats.objects.filter(user_id=user_id).update(
+        total_experience=F('total_experience') + experience,
+        topics_trained=F('topics_trained') + len(new_topic_ids),
+    )
+    if not updated:
+        refresh_user(user_id)
+
+    if new_topic_ids:
+        updated = TopicStats.objects.filter(topic_id__in=new_topic_ids).update(
+            users_count=F('users_count') + 1
+        )
+        if updated < len(new_topic_ids):
+            refresh_topics(new_topic_ids)
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Rebuild both materialized tables from UserTopicStats.
+    Returns a (users, topics) tuple with the number of rows written.
+    """
+    UserTotalStats.objects.all().delete()
+    TopicStats.objects.all().delete()
+
+    user_totals = UserTopicStats.objects.values('user_id').annotate(
+        total_experience=Sum('experience'),
+        topics_trained=Count('topic', distinct=True),
+    ).order_by()
+    UserTotalStats.objects.bulk_create(
+        (UserTotalStats(**row) for row in user_totals.iterator()),
+        batch_size=1000,
+    )
+
+    topic_counts = Topic.objects.annotate(
+        users_count=Count('usertopicstats__user', distinct=True)
+    ).values_list('id', 'users_count')
+    TopicStats.objects.bulk_create(
+        (TopicStats(topic_id=topic_id, users_count=count) for topic_id, count in topic_counts.iterator()),
+        batch_size=1000,
+    )
+
+    return UserTotalStats.objects.count(), TopicStats.objects.count()
+
+
+def find_discrepancies():
+    """
+    Compare the materialized tables against the raw UserTopicStats aggregates.
+    Returns a list of (kind, object_id, expected, actual) tuples.
+    """
+    problems = []
+
+    expected_users = {
+        row['user_id']: (row['total_experience'] or 0, row['topics_trained'])
+        for row in UserTopicStats.objects.values('user_id').annotate(
+            total_experience=Sum('experience'),
+            topics_trained=Count('topic', distinct=True),
+        ).order_by().iterator()
+    }
+    actual_users = {
+        user_id: (total, topics)
+        for user_id, total, topics in UserTotalStats.objects.values_list(
+            'user_id', 'total_experience', 'topics_trained'
+        ).iterator()
+    }
+    for user_id in expected_users.keys() | actual_users.keys():
+        expected = expected_users.get(user_id)
+        actual = actual_users.get(user_id)
+        if expected != actual:
+            problems.append(('user', user_id, expected, actual))
+
+    expected_topics = dict(
+        Topic.objects.annotate(
+            users_count=Count('usertopicstats__user', distinct=True)
+        ).values_list('id', 'users_count')
+    )
+    actual_topics = dict(TopicStats.objects.values_list('topic_id', 'users_count'))
+    for topic_id in expected_topics.keys() | actual_topics.keys():
+        # A missing TopicStats row is equivalent to a count of zero
+        expected = expected_topics.get(topic_id, 0)
+        actual = actual_topics.get(topic_id, 0)
+        if expected != actual:
+            problems.append(('topic', topic_id, expected, actual))
+
+    return problems
+
+
+def top_users(limit=10):
+    """Users ordered by total XP, annotated with `total_experience`."""
+    return User.objects.filter(total_stats__isnull=False).annotate(
+        total_experience=F('total_stats__total_experience')
+    ).order_by('-total_stats__total_experience', 'total_stats__user_id')[:limit]
+
+
+def user_total_experience(user):
+    """A user's total XP, or 0 if they haven't earned any."""
+    return UserTotalStats.objects.filter(user=user).values_list(
+        'total_experience', flat=True
+    ).first() or 0
+
+
+def user_rank(user, total_experience=None):
+    """A user's 1-based position in the overall leaderboard."""
+    if total_experience is None:
+        total_experience = user_total_experience(user)
+    return UserTotalStats.objects.filter(total_experience__gt=total_experience).count() + 1
+
+
+def total_users_with_experience():
+    """Number of users with a positive XP total."""
+    return UserTotalStats.objects.filter(total_experience__gt=0).count()
+
+
+def most_popular_topic():
+    """Name of the topic trained by the most users, or None."""
+    return TopicStats.objects.filter(users_count__gt=0).order_by(
+        '-users_count', 'topic_id'
+    ).values_list('topic__name', flat=True).first()
+
+
+def top_experience():
+    """The highest XP total of any user."""
+    return UserTotalStats.objects.order_by('-total_experience').values_list(
+        'total_experience', flat=True
+    ).first() or 0
+
+
+def period_start(period, today=None):
+    """First day of `period` ('week' starts on Monday), or None for all time."""
+    today = today or timezone.now().date()
+    if period == 'week':
+        return today - timedelta(days=today.weekday())
+    if period == 'month':
+        return today.replace(day=1)
+    return None
+
+
+def _period_totals(start):
+    return ExperienceRollup.objects.filter(day__gte=start).values('user_id').annotate(
+        total_experience=Sum('experience')
+    ).order_by()
+
+
+def top_users_since(start, limit=10):
+    """
+    Users ordered by XP earned from day `start` on, annotated with
+    `total_experience`. Reads only rollup rows.
+    """
+    totals = list(_period_totals(start).order_by('-total_experience', 'user_id')[:limit])
+    users = User.objects.in_bulk([row['user_id'] for row in totals])
+    leaders = []
+    for row in totals:
+        user = users[row['user_id']]
+        user.total_experience = row['total_experience']
+        leaders.append(user)
+    return leaders
+
+
+def user_rank_since(user, start):
+    """A user's 1-based position in the leaderboard from day `start` on, or None if they earned no XP."""
+    experience = ExperienceRollup.objects.filter(user=user, day__gte=start).aggregate(
+        total=Sum('experience')
+    )['total']
+    if not experience:
+        return None
+    return _period_totals(start).filter(total_experience__gt=experience).count() + 1
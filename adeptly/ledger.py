@@ -0,0 +1,285 @@
+"""
+Rollups of the append-only XP ledger.
+
+TopicExperienceEarned only ever grows, so reading it for "this week" or
+"this month" leaderboards would mean scanning it. roll_up() instead folds
+new ledger rows into ExperienceRollup, one row per user, topic and day, and
+windowed leaderboards read only those.
+
+The job is watermark-based: RollupWatermark holds the last ledger id folded
+in, and it moves in the same transaction as the rollup rows, so a job that
+dies part way is simply re-run. Rows younger than `settle` seconds are left
+for the next run, so a slow transaction that commits a lower id after a
+higher one isn't skipped.
+
+On PostgreSQL the ledger is partitioned by month (see migration 0015);
+ensure_partitions() creates the coming months' partitions ahead of time so
+new rows never land in the default partition. Elsewhere the earned_at index
+gives the same month-sized range scans.
+
+The ledger is also the source of truth for UserTopicStats.experience.
+topic_stats_drift() lists where the two disagree and recompute_topic_stats()
+repairs them, both with a few set-based statements per range of user ids
+rather than a loop over users.
+"""
+
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ExperienceRollup, RollupWatermark, TopicExperienceEarned, User, UserTopicStats
+from . import ranks, stats
+
+WATERMARK = 'experience-rollup'
+
+# Ledger ids folded in per transaction
+BATCH_SIZE = 10000
+
+# Seconds a ledger row must have existed before it's rolled up
+SETTLE = 60
+
+# Months of partitions to keep ready past the current one
+MONTHS_AHEAD = 2
+
+UPSERT_CHUNK = 500
+
+RollupResult = namedtuple('RollupResult', ['entries', 'rollups', 'last_id'])
+
+TopicStatsDrift = namedtuple('TopicStatsDrift', [
+    'user_id', 'topic_id', 'expected_experience', 'actual_experience', 'expected_rank_id', 'actual_rank_id',
+])
+
+
+def _upsert(rows):
+    """Add (user_id, topic_id, day, experience, entries) rows to their rollups."""
+    table = connection.ops.quote_name(ExperienceRollup._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_CHUNK):
+            chunk = rows[start:start + UPSERT_CHUNK]
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, topic_id, day, experience, entries) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))} '
+                f'ON CONFLICT (user_id, topic_id, day) DO UPDATE SET '
+                f'experience = {table}.experience + EXCLUDED.experience, '
+                f'entries = {table}.entries + EXCLUDED.entries',
+                [value for row in chunk for value in row],
+            )
+
+
+@transaction.atomic
+def _roll_up_batch(batch_size, cutoff):
+    watermark, created = RollupWatermark.objects.get_or_create(name=WATERMARK)
+    watermark = RollupWatermark.objects.select_for_update().get(pk=watermark.pk)
+
+    pending = TopicExperienceEarned.objects.filter(id__gt=watermark.last_id)
+    if cutoff is not None:
+        # Stop short of the first row that hasn't settled yet
+        unsettled = pending.filter(earned_at__gte=cutoff).order_by('id').values_list('id', flat=True).first()
+        if unsettled is not None:
+            pending = pending.filter(id__lt=unsettled)
+    last_id = pending.order_by('id').values_list('id', flat=True)[batch_size - 1:batch_size].first()
+    if last_id is None:
+        last_id = pending.order_by('-id').values_list('id', flat=True).first()
+    if last_id is None:
+        return RollupResult(0, 0, watermark.last_id)
+
+    rows = [
+        (row['user_id'], row['topic_id'], row['day'], row['experience'], row['entries'])
+        for row in pending.filter(id__lte=last_id)
+        .annotate(day=TruncDate('earned_at'))
+        .values('user_id', 'topic_id', 'day')
+        .annotate(experience=Sum('experience_earned'), entries=Count('id'))
+        .order_by()
+    ]
+    _upsert(rows)
+
+    watermark.last_id = last_id
+    watermark.save()
+    return RollupResult(sum(row[4] for row in rows), len(rows), last_id)
+
+
+def roll_up(batch_size=BATCH_SIZE, settle=SETTLE, on_batch=None):
+    """
+    Fold every settled ledger row past the watermark into ExperienceRollup,
+    `batch_size` ledger rows per transaction. With settle=None every row is
+    folded in, however recent. Safe to run concurrently and to re-run.
+    Returns a RollupResult totalled over the batches.
+    """
+    if connection.vendor == 'postgresql':
+        ensure_partitions()
+
+    cutoff = None if settle is None else timezone.now() - timedelta(seconds=settle)
+    entries = rollups = 0
+    while True:
+        result = _roll_up_batch(batch_size, cutoff)
+        if not result.entries:
+            return RollupResult(entries, rollups, result.last_id)
+        entries += result.entries
+        rollups += result.rollups
+        if on_batch:
+            on_batch(result)
+
+
+@transaction.atomic
+def rebuild(batch_size=BATCH_SIZE):
+    """
+    Recompute every rollup from the whole ledger, for use when nothing else
+    is writing to it. Returns a RollupResult.
+    """
+    ExperienceRollup.objects.all().delete()
+    RollupWatermark.objects.filter(name=WATERMARK).delete()
+    return roll_up(batch_size, settle=None)
+
+
+def _month_start(day, months=0):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TopicExperienceEarned._meta.db_table}_p{month:%Y%m}'
+
+
+def ensure_partitions(months_ahead=MONTHS_AHEAD, today=None):
+    """
+    Create the monthly ledger partitions from this month to `months_ahead`
+    months on, on PostgreSQL. A month whose rows already sit in the default
+    partition is left there. Returns the names of the partitions created.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+
+    quote = connection.ops.quote_name
+    table = TopicExperienceEarned._meta.db_table
+    today = today or timezone.now().date()
+    created = []
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s)', [table])
+        row = cursor.fetchone()
+        if not row or row[0] != 'p':
+            return []
+
+        for months in range(months_ahead + 1):
+            start, end = _month_start(today, months), _month_start(today, months + 1)
+            name = partition_name(start)
+            cursor.execute('SELECT to_regclass(%s)', [name])
+            if cursor.fetchone()[0]:
+                continue
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM {quote(table + "_default")} WHERE earned_at >= %s AND earned_at < %s)',
+                [start, end],
+            )
+            if cursor.fetchone()[0]:
+                continue
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [start.isoformat(), end.isoformat()],
+            )
+            created.append(name)
+    return created
+
+
+def user_id_ranges(chunk_size=None):
+    """(first, last) user id ranges covering every user, `chunk_size` ids each."""
+    bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return []
+    if not chunk_size:
+        return [(bounds['first'], bounds['last'])]
+    return [
+        (first, min(first + chunk_size - 1, bounds['last']))
+        for first in range(bounds['first'], bounds['last'] + 1, chunk_size)
+    ]
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return quote(TopicExperienceEarned._meta.db_table), quote(UserTopicStats._meta.db_table)
+
+
+def _ledger_sums(ledger_table):
+    return (
+        f'SELECT user_id, topic_id, SUM(experience_earned) AS experience FROM {ledger_table} '
+        f'WHERE user_id >= %s AND user_id <= %s GROUP BY user_id, topic_id'
+    )
+
+
+def topic_stats_drift(first_user_id, last_user_id):
+    """
+    The UserTopicStats rows of users `first_user_id` to `last_user_id` whose
+    experience or rank don't match the ledger, as TopicStatsDrift tuples.
+    actual_experience is None where the ledger has XP but there's no row.
+    """
+    ledger_table, stats_table = _tables()
+    ladder = ranks.get_ladder()
+    rank_case, rank_params = ladder.rank_case_sql('l.experience')
+    base_rank_id = ladder.rank_id_for(0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT l.user_id, l.topic_id, l.experience, s.experience, {rank_case}, s.rank_id '
+            f'FROM ({_ledger_sums(ledger_table)}) l '
+            f'LEFT JOIN {stats_table} s ON s.user_id = l.user_id AND s.topic_id = l.topic_id '
+            f'WHERE s.id IS NULL OR s.experience <> l.experience OR s.rank_id <> {rank_case} '
+            f'UNION ALL '
+            f'SELECT s.user_id, s.topic_id, 0, s.experience, %s, s.rank_id FROM {stats_table} s '
+            f'WHERE s.user_id >= %s AND s.user_id <= %s AND (s.experience <> 0 OR s.rank_id <> %s) '
+            f'AND NOT EXISTS (SELECT 1 FROM {ledger_table} x WHERE x.user_id = s.user_id AND x.topic_id = s.topic_id) '
+            f'ORDER BY 1, 2',
+            rank_params + [first_user_id, last_user_id] + rank_params
+            + [base_rank_id, first_user_id, last_user_id, base_rank_id],
+        )
+        return [TopicStatsDrift(*row) for row in cursor.fetchall()]
+
+
+@transaction.atomic
+def recompute_topic_stats(first_user_id, last_user_id):
+    """
+    Set the experience and rank of users `first_user_id` to `last_user_id`'s
+    UserTopicStats from the ledger: missing rows are inserted, drifted rows
+    updated and rows without ledger XP zeroed. Returns the repaired
+    TopicStatsDrift tuples. The materialized leaderboard isn't touched; run
+    leaderboard.rebuild() once every range is done.
+    """
+    drift = topic_stats_drift(first_user_id, last_user_id)
+    if not drift:
+        return drift
+
+    ledger_table, stats_table = _tables()
+    ladder = ranks.get_ladder()
+    base_rank_id = ladder.rank_id_for(0)
+    user_range = [first_user_id, last_user_id]
+
+    with connection.cursor() as cursor:
+        rank_case, rank_params = ladder.rank_case_sql('l.experience')
+        cursor.execute(
+            f'INSERT INTO {stats_table} (user_id, topic_id, experience, rank_id) '
+            f'SELECT l.user_id, l.topic_id, l.experience, {rank_case} '
+            f'FROM ({_ledger_sums(ledger_table)}) l '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {stats_table} s WHERE s.user_id = l.user_id AND s.topic_id = l.topic_id) '
+            f'ON CONFLICT (user_id, topic_id) DO NOTHING',
+            rank_params + user_range,
+        )
+        cursor.execute(
+            f'UPDATE {stats_table} SET experience = l.experience, rank_id = {rank_case} '
+            f'FROM ({_ledger_sums(ledger_table)}) AS l '
+            f'WHERE {stats_table}.user_id = l.user_id AND {stats_table}.topic_id = l.topic_id '
+            f'AND ({stats_table}.experience <> l.experience OR {stats_table}.rank_id <> {rank_case})',
+            rank_params + user_range + rank_params,
+        )
+        cursor.execute(
+            f'UPDATE {stats_table} SET experience = 0, rank_id = %s '
+            f'WHERE user_id >= %s AND user_id <= %s AND (experience <> 0 OR rank_id <> %s) '
+            f'AND NOT EXISTS (SELECT 1 FROM {ledger_table} x '
+            f'WHERE x.user_id = {stats_table}.user_id AND x.topic_id = {stats_table}.topic_id)',
+            [base_rank_id] + user_range + [base_rank_id],
+        )
+
+    for user_id in {row.user_id for row in drift}:
+        stats.invalidate_user_summary(user_id)
+    return drift
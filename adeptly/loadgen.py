@@ -0,0 +1,365 @@
+"""
+Synthetic data for benchmarks and capacity planning.
+
+generate() adds users, topics, problems, training sessions and their XP
+history on top of whatever is already in the database. The shapes are
+meant to look like real use:
+
+- topic popularity and user activity follow Zipf distributions, so a few
+  topics and a few trainees account for most of the sessions;
+- difficulties are centred on Medium and most problems cover one topic;
+- each trainee sticks to a handful of favourite topics, and their chance
+  of a correct answer rises with their skill and falls with difficulty;
+- sessions are spread over the last `days` days and most are completed,
+  with a stored TrainingSessionSummary like the ones real sessions get;
+- every answer, right or wrong, is in the attempt log with its time.
+
+The same seed always produces the same rows, with timestamps relative to
+`now`. Rows get explicit ids after
+the current maximum and are streamed to dataio's loader (COPY on
+PostgreSQL, multi-row INSERTs elsewhere) one chunk of sessions per
+transaction, so millions of rows load in minutes with flat memory use.
+UserTopicStats, solved problems, the leaderboard tables, the search index
+and the adaptive problem queues are derived from the generated history at
+the end.
+
+Every generated user can log in with the password PASSWORD.
+"""
+
+import itertools
+import random
+import time
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (
+    AnswerAttempt, Problem, SessionProblem, Topic, TopicExperienceEarned, TrainingSession, User, UserTopicStats,
+)
+from . import dataio, leaderboard, ledger, ranks, sampling, search, selection, solved, stats
+
+PASSWORD = 'loadtest'
+
+USERS = 1000
+TOPICS = 20
+PROBLEMS = 5000
+SESSIONS = 20000
+PROBLEMS_PER_SESSION = 8
+DAYS = 365
+SEED = 42
+
+# Sessions generated per transaction
+SESSION_CHUNK = 2000
+
+ZIPF_EXPONENT = 1.1
+
+# Relative frequency of difficulties 1 (Very Easy) to 5 (Very Hard)
+DIFFICULTY_WEIGHTS = [10, 25, 35, 20, 10]
+
+# Relative frequency of problems covering 1, 2 and 3 topics
+TOPICS_PER_PROBLEM_WEIGHTS = [55, 35, 10]
+
+COMPLETION_RATE = 0.9
+
+AREAS = [
+    'Load Calculations', 'Psychrometrics', 'Duct Design', 'Hydronic Systems', 'Refrigeration Cycles',
+    'Building Envelope', 'Control Sequences', 'Energy Code', 'Ventilation', 'Heat Transfer',
+    'Fluid Mechanics', 'Chillers', 'Boilers', 'Cooling Towers', 'Air Distribution',
+    'Electrical Systems', 'Plumbing', 'Fire Protection', 'Acoustics', 'Thermodynamics',
+]
+
+LoadResult = namedtuple('LoadResult', ['counts', 'elapsed'])
+
+
+def _cumulative_zipf(count):
+    return list(itertools.accumulate(1 / rank ** ZIPF_EXPONENT for rank in range(1, count + 1)))
+
+
+def _weighted_sample(rng, population, cum_weights, k):
+    """k distinct items of `population`, drawn by weight."""
+    k = min(k, len(population))
+    chosen = []
+    while len(chosen) < k:
+        item = rng.choices(population, cum_weights=cum_weights)[0]
+        if item not in chosen:
+            chosen.append(item)
+    return chosen
+
+
+def _next_id(model):
+    return (model.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+
+
+def _field_names(model, with_pk):
+    # File fields are left empty, and auto ids to the database when not set
+    return tuple(
+        field.attname for field in model._meta.concrete_fields
+        if not isinstance(field, models.FileField) and (with_pk or field is not model._meta.pk)
+    )
+
+
+def correct_probability(skill, difficulty):
+    """Chance that a trainee of `skill` (0-1) answers a problem of `difficulty` correctly."""
+    return min(max(skill - (difficulty - 3) * 0.12, 0.05), 0.97)
+
+
+class _Generator:
+
+    def __init__(self, rng, loader, days, now):
+        self.rng = rng
+        self.loader = loader
+        self.days = days
+        self.now = now
+        self.names = {}
+
+    def add(self, obj):
+        key = (type(obj), obj.pk is not None)
+        if key not in self.names:
+            self.names[key] = _field_names(*key)
+        names = self.names[key]
+        self.loader.add(type(obj), names, [getattr(obj, name) for name in names])
+
+    def random_time(self):
+        return self.now - timedelta(seconds=self.rng.uniform(0, self.days * 86400))
+
+    def topics(self, count):
+        start = _next_id(Topic)
+        self.topic_ids = list(range(start, start + count))
+        self.topic_names = {}
+        for topic_id in self.topic_ids:
+            self.topic_names[topic_id] = f'{AREAS[topic_id % len(AREAS)]} {topic_id}'
+            self.add(Topic(id=topic_id, name=self.topic_names[topic_id]))
+        self.topic_weights = _cumulative_zipf(count)
+
+    def problems(self, count):
+        rng = self.rng
+        start = _next_id(Problem)
+        Through = Problem.topics.through
+        self.problem_info = {}
+        self.correct_answers = {}
+        self.problems_by_topic = {topic_id: [] for topic_id in self.topic_ids}
+
+        for problem_id in range(start, start + count):
+            difficulty = rng.choices(range(1, 6), weights=DIFFICULTY_WEIGHTS)[0]
+            minutes = difficulty * 2 + rng.randint(0, 3)
+            k = rng.choices(range(1, 4), weights=TOPICS_PER_PROBLEM_WEIGHTS)[0]
+            topic_ids = _weighted_sample(rng, self.topic_ids, self.topic_weights, k)
+            name = f'{self.topic_names[topic_ids[0]].rsplit(" ", 1)[0]} problem {problem_id}'
+
+            correct_answer = self.correct_answers[problem_id] = rng.choice('ABCD')
+            self.add(Problem(
+                id=problem_id,
+                slug=f'load-problem-{problem_id}',
+                name=name,
+                prompt=f'{name}: determine the design value for the system described.',
+                choice_a='12.5', choice_b='25', choice_c='37.5', choice_d='50',
+                correct_answer=correct_answer,
+                estimated_time_to_complete=minutes,
+                difficulty=difficulty,
+            ))
+            for topic_id in topic_ids:
+                self.loader.add(Through, ('problem_id', 'topic_id'), [problem_id, topic_id])
+                self.problems_by_topic[topic_id].append(problem_id)
+            self.problem_info[problem_id] = (name, difficulty, minutes, topic_ids)
+
+    def users(self, count):
+        rng = self.rng
+        start = _next_id(User)
+        password = make_password(PASSWORD)
+        self.user_ids = list(range(start, start + count))
+        self.user_weights = _cumulative_zipf(count)
+        self.skill = {}
+        self.favourites = {}
+
+        topics_with_problems = [topic_id for topic_id in self.topic_ids if self.problems_by_topic[topic_id]]
+        weights = list(itertools.accumulate(
+            1 / (self.topic_ids.index(topic_id) + 1) ** ZIPF_EXPONENT for topic_id in topics_with_problems
+        ))
+        for user_id in self.user_ids:
+            self.add(User(id=user_id, username=f'loaduser{user_id}', password=password,
+                          date_joined=self.now - timedelta(days=self.days)))
+            self.skill[user_id] = rng.betavariate(4, 2)
+            self.favourites[user_id] = _weighted_sample(rng, topics_with_problems, weights, rng.randint(1, 4))
+        self.experience = {}
+        self.first_session_id = _next_id(TrainingSession)
+        self.session_ids = itertools.count(self.first_session_id)
+        self.attempts = Counter()
+
+    def session(self, problems_per_session):
+        rng = self.rng
+        user_id = rng.choices(self.user_ids, cum_weights=self.user_weights)[0]
+        favourites = self.favourites[user_id]
+        covered = rng.sample(favourites, rng.randint(1, min(2, len(favourites))))
+
+        # Distinct problems from the covered topics
+        wanted = rng.randint(max(problems_per_session // 2, 1), problems_per_session * 3 // 2 or 1)
+        problem_ids = []
+        for _ in range(wanted * 5):
+            problem_id = rng.choice(self.problems_by_topic[rng.choice(covered)])
+            if problem_id not in problem_ids:
+                problem_ids.append(problem_id)
+                if len(problem_ids) == wanted:
+                    break
+
+        was_completed = rng.random() < COMPLETION_RATE
+        answered = len(problem_ids) if was_completed else rng.randint(0, len(problem_ids) - 1)
+        created_at = self.random_time()
+        session = TrainingSession(
+            id=next(self.session_ids),
+            user_id=user_id,
+            estimated_time_to_complete=sum(self.problem_info[problem_id][2] for problem_id in problem_ids),
+            was_completed=was_completed,
+            created_at=created_at,
+            total_problems=len(problem_ids),
+        )
+
+        elapsed = timedelta()
+        completed = set()
+        ledger = []
+        answers = []
+        experience = {}
+        for problem_id in problem_ids[:answered]:
+            name, difficulty, minutes, topic_ids = self.problem_info[problem_id]
+            spent = timedelta(minutes=minutes * rng.uniform(0.5, 1.5))
+            elapsed += spent
+            self.attempts[problem_id] += 1
+            is_correct = rng.random() < correct_probability(self.skill[user_id], difficulty)
+            correct_answer = self.correct_answers[problem_id]
+            answers.append(AnswerAttempt(
+                user_id=user_id, problem_id=problem_id, training_session_id=session.id,
+                selected_answer=correct_answer if is_correct else 'ABCD'['ABCD'.index(correct_answer) - 1],
+                is_correct=is_correct, elapsed_ms=spent // timedelta(milliseconds=1), answered_at=created_at + elapsed,
+            ))
+            if not is_correct:
+                session.incorrect_attempts += 1
+                continue
+            session.correct_attempts += 1
+            completed.add(problem_id)
+            earned = difficulty * 10
+            for topic_id in topic_ids:
+                ledger.append(TopicExperienceEarned(
+                    user_id=user_id, topic_id=topic_id, experience_earned=earned,
+                    training_session_id=session.id, problem_id=problem_id, earned_at=created_at + elapsed,
+                ))
+                key = (user_id, topic_id)
+                self.experience[key] = self.experience.get(key, 0) + earned
+                topic_name = self.topic_names[topic_id]
+                experience[topic_name] = experience.get(topic_name, 0) + earned
+        if was_completed:
+            session.completed_at = created_at + elapsed
+
+        # The session goes first so its rows are written before the rows pointing at it
+        self.add(session)
+        for topic_id in covered:
+            self.loader.add(TrainingSession.topics_covered.through, ('trainingsession_id', 'topic_id'),
+                            [session.id, topic_id])
+        for position, problem_id in enumerate(problem_ids):
+            self.add(SessionProblem(session_id=session.id, problem_id=problem_id, position=position))
+            self.loader.add(TrainingSession.problems.through, ('trainingsession_id', 'problem_id'),
+                            [session.id, problem_id])
+        for problem_id in completed:
+            self.loader.add(TrainingSession.problems_completed.through, ('trainingsession_id', 'problem_id'),
+                            [session.id, problem_id])
+        for row in ledger:
+            self.add(row)
+        for attempt in answers:
+            self.add(attempt)
+
+        if was_completed:
+            problems = [
+                (problem_id, self.problem_info[problem_id][0],
+                 [self.topic_names[topic_id] for topic_id in self.problem_info[problem_id][3]])
+                for problem_id in problem_ids
+            ]
+            summary = stats.summarize_session(session, problems, completed, experience, len(covered))
+            summary.updated_at = session.completed_at
+            self.add(summary)
+
+    def user_topic_stats(self):
+        ladder = ranks.get_ladder()
+        for (user_id, topic_id), experience in self.experience.items():
+            self.add(UserTopicStats(user_id=user_id, topic_id=topic_id, experience=experience,
+                                    rank_id=ladder.rank_id_for(experience)))
+
+    def solved_problems(self):
+        """Mark every problem solved in a generated session as solved by its trainee."""
+        SolvedBy = Problem.solved_by.through
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {SolvedBy._meta.db_table} (problem_id, user_id) '
+                f'SELECT DISTINCT c.problem_id, s.user_id '
+                f'FROM {TrainingSession.problems_completed.through._meta.db_table} c '
+                f'JOIN {TrainingSession._meta.db_table} s ON s.id = c.trainingsession_id '
+                f'WHERE s.id >= %s',
+                [self.first_session_id],
+            )
+            return cursor.rowcount
+
+    def problem_counts(self):
+        """Add the generated answers to attempt_count and recount solve_count."""
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {Problem._meta.db_table} SET attempt_count = attempt_count + %s WHERE id = %s',
+                [(attempts, problem_id) for problem_id, attempts in self.attempts.items()],
+            )
+        solved.recount()
+
+
+def generate(users=USERS, topics=TOPICS, problems=PROBLEMS, sessions=SESSIONS,
+             problems_per_session=PROBLEMS_PER_SESSION, days=DAYS, seed=SEED,
+             batch_size=dataio.BATCH_SIZE, method='auto', now=None, on_progress=None):
+    """
+    Generate a synthetic dataset and return a LoadResult with the rows
+    written per model. Sessions end at `now` (default: the current time).
+    `on_progress` is called with the number of sessions written after each
+    committed chunk.
+    """
+    if min(users, topics, problems) < 1:
+        raise ValueError('At least one user, topic and problem is needed')
+    if method == 'auto':
+        method = 'copy' if connection.vendor == 'postgresql' else 'insert'
+    if method == 'copy' and connection.vendor != 'postgresql':
+        raise ValueError('COPY is only available on PostgreSQL')
+
+    start = time.perf_counter()
+    loader = dataio._Loader('default', method, batch_size, None, strict=True, check_foreign_keys=False)
+    generator = _Generator(random.Random(seed), loader, days, now or timezone.now())
+
+    with transaction.atomic():
+        generator.topics(topics)
+        generator.problems(problems)
+        generator.users(users)
+        loader.flush()
+
+    done = 0
+    while done < sessions:
+        count = min(SESSION_CHUNK, sessions - done)
+        with transaction.atomic():
+            for _ in range(count):
+                generator.session(problems_per_session)
+            loader.flush()
+        done += count
+        if on_progress:
+            on_progress(done)
+
+    with transaction.atomic():
+        # Ranks may have been bulk loaded or flushed without signals
+        ranks.invalidate()
+        generator.user_topic_stats()
+        loader.flush()
+        solved_rows = generator.solved_problems()
+        generator.problem_counts()
+        dataio.reset_sequences()
+        leaderboard.rebuild()
+    ledger.rebuild()
+    search.rebuild()
+    sampling.invalidate()
+    selection.rebuild(rng=random.Random(seed))
+
+    counts = dict(loader.written)
+    counts[Problem.solved_by.through._meta.label_lower] = solved_rows
+    return LoadResult(counts, time.perf_counter() - start)
@@ -0,0 +1,250 @@
+"""
+HTTP load tests for the training flow, using only the standard library.
+
+run() starts `concurrency` virtual trainees against a running server
+(runserver, gunicorn, ...) and has each walk the real URL routes:
+
+    login -> training_setup -> N x training_problem (GET + POST answer)
+    -> training_results -> leaderboard
+
+Each virtual trainee keeps its own cookie jar, reads CSRF tokens from the
+forms it is served and follows redirects itself, so every request is timed
+on its own and reported under its route name (e.g. "POST training_problem").
+The report gives throughput, latency percentiles and error rates per
+endpoint. Trainees log in as existing users, such as the ones
+generate_load_data creates.
+"""
+
+import http.cookiejar
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from html.parser import HTMLParser
+
+from django.urls import Resolver404, resolve, reverse
+
+CONCURRENCY = 4
+JOURNEYS = 20
+PROBLEMS = 5
+TIMEOUT = 30
+
+# Past any real session length; requesting it completes the session
+END_OF_SESSION = 100000
+
+EndpointStats = namedtuple('EndpointStats', [
+    'endpoint', 'requests', 'errors', 'error_rate', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms',
+])
+
+Report = namedtuple('Report', ['journeys', 'failed_journeys', 'elapsed', 'endpoints', 'errors'])
+
+
+class JourneyError(Exception):
+    pass
+
+
+def _route(path):
+    """The URL name and kwargs `path` resolves to, or (None, {})."""
+    try:
+        match = resolve(path or '')
+    except Resolver404:
+        return None, {}
+    return match.url_name, match.kwargs
+
+
+class _FormParser(HTMLParser):
+    """The named inputs on a page, as (name, type, value) tuples."""
+
+    def __init__(self):
+        super().__init__()
+        self.inputs = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'input' and attrs.get('name'):
+            self.inputs.append((attrs['name'], attrs.get('type', 'text'), attrs.get('value', '')))
+
+
+class _NoRedirects(urllib.request.HTTPRedirectHandler):
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return 0
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+class _Recorder:
+    """Latencies and errors per endpoint, shared by every virtual trainee."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.messages = []
+
+    def record(self, endpoint, elapsed, error=None):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            if error:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+                if len(self.messages) < 20:
+                    self.messages.append(f'{endpoint}: {error}')
+
+    def report(self, journeys, failed, elapsed):
+        endpoints = []
+        for endpoint, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            errors = self.errors.get(endpoint, 0)
+            endpoints.append(EndpointStats(
+                endpoint,
+                len(latencies),
+                errors,
+                errors / len(latencies),
+                len(latencies) / elapsed if elapsed else 0,
+                *(round(percentile(latencies, p) * 1000, 2) for p in (50, 95, 99)),
+                round(latencies[-1] * 1000, 2),
+            ))
+        return Report(journeys, failed, elapsed, endpoints, self.messages)
+
+
+class _Trainee:
+    """One virtual trainee with its own cookies."""
+
+    def __init__(self, base_url, recorder, rng, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.rng = rng
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirects,
+        )
+
+    def request(self, method, path, data=None, expect=200):
+        """(status, location, body) of one timed request."""
+        endpoint = f'{method} {_route(path)[0] or path}'
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if method == 'POST':
+            # Django checks the referer of secure POSTs
+            request.add_header('Referer', self.base_url + path)
+
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status, location, content = response.status, response.headers.get('Location'), response.read()
+        except urllib.error.HTTPError as e:
+            status, location, content = e.code, e.headers.get('Location'), e.read()
+        except OSError as e:
+            self.recorder.record(endpoint, time.perf_counter() - start, str(e))
+            raise JourneyError(f'{endpoint}: {e}')
+        elapsed = time.perf_counter() - start
+
+        if status != expect:
+            error = f'expected {expect}, got {status}'
+            self.recorder.record(endpoint, elapsed, error)
+            raise JourneyError(f'{endpoint}: {error}')
+        self.recorder.record(endpoint, elapsed)
+        return status, urllib.parse.urlsplit(location).path if location else None, content.decode('utf-8', 'replace')
+
+    def form(self, path):
+        """The form inputs on `path`, and its CSRF token."""
+        body = self.request('GET', path)[2]
+        parser = _FormParser()
+        parser.feed(body)
+        token = next((value for name, kind, value in parser.inputs if name == 'csrfmiddlewaretoken'), None)
+        if token is None:
+            raise JourneyError(f'GET {path}: no CSRF token in the form')
+        return parser.inputs, token
+
+    def journey(self, username, password, problems):
+        login_path = reverse('login')
+        inputs, token = self.form(login_path)
+        self.request('POST', login_path, {
+            'csrfmiddlewaretoken': token, 'username': username, 'password': password,
+        }, expect=302)
+
+        setup_path = reverse('training_setup')
+        inputs, token = self.form(setup_path)
+        topics = [value for name, kind, value in inputs if name == 'topics']
+        if not topics:
+            raise JourneyError('GET training_setup: no topics to train')
+        location = self.request('POST', setup_path, {
+            'csrfmiddlewaretoken': token,
+            'topics': self.rng.sample(topics, min(len(topics), self.rng.randint(1, 2))),
+            'difficulty_levels': ['1', '2', '3', '4', '5'],
+            'time_available': 60,
+        }, expect=302)[1]
+
+        answered = 0
+        while _route(location)[0] == 'training_problem' and answered < problems:
+            inputs, token = self.form(location)
+            shown = next((value for name, kind, value in inputs if name == 'shown'), '')
+            location = self.request('POST', location, {
+                'csrfmiddlewaretoken': token, 'shown': shown, 'answer': self.rng.choice('ABCD'),
+            }, expect=302)[1]
+            answered += 1
+
+        name, kwargs = _route(location)
+        if name == 'training_problem':
+            # Stop after `problems` answers; going past the end completes the session
+            end = reverse('training_problem', kwargs={
+                'session_id': kwargs['session_id'], 'problem_index': END_OF_SESSION,
+            })
+            location = self.request('GET', end, expect=302)[1]
+        self.request('GET', location)
+        self.request('GET', reverse('leaderboard'))
+        self.cookies.clear()
+
+
+def run(base_url, credentials, concurrency=CONCURRENCY, journeys=JOURNEYS, problems=PROBLEMS,
+        timeout=TIMEOUT, seed=None, on_journey=None):
+    """
+    Run `journeys` training journeys against `base_url`, `concurrency` at a
+    time, logging in with (username, password) pairs from `credentials` in
+    turn. `on_journey` is called with the number of journeys finished.
+    Returns a Report.
+    """
+    recorder = _Recorder()
+    lock = threading.Lock()
+    state = {'next': 0, 'finished': 0, 'failed': 0}
+
+    def worker(number):
+        trainee = _Trainee(base_url, recorder, random.Random(None if seed is None else seed + number), timeout)
+        while True:
+            with lock:
+                if state['next'] >= journeys:
+                    return
+                index = state['next']
+                state['next'] += 1
+            username, password = credentials[index % len(credentials)]
+            try:
+                trainee.journey(username, password, problems)
+                failed = 0
+            except JourneyError:
+                trainee.cookies.clear()
+                failed = 1
+            with lock:
+                state['finished'] += 1
+                state['failed'] += failed
+                finished = state['finished']
+            if on_journey:
+                on_journey(finished)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return recorder.report(state['finished'], state['failed'], time.perf_counter() - start)
@@ -0,0 +1,98 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+
+from adeptly.models import Problem, Topic
+from adeptly.sampling import ProblemIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the problem sampler against ORDER BY RANDOM() on synthetic problem banks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000],
+                            help='Problem bank sizes to benchmark')
+        parser.add_argument('--topics', type=int, default=10, help='Number of topics in the synthetic bank')
+        parser.add_argument('--repeat', type=int, default=5, help='Selections to time per size')
+        parser.add_argument('--time-budget', type=int, default=30, help='Session length in minutes')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+
+        # Work in a throwaway test database so real data is never touched
+        old_name = connection.settings_dict['NAME']
+        self.stdout.write('Creating benchmark database...')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            topics = Topic.objects.bulk_create([Topic(name=f'Benchmark Topic {i}') for i in range(options['topics'])])
+            topic_ids = [topic.id for topic in topics]
+            # A typical session: a few topics, the default difficulty levels
+            selected_topics = topic_ids[:3]
+            difficulties = [2, 3, 4]
+
+            self.stdout.write(f'{"problems":>10} {"order_by(?) ms":>16} {"index build ms":>16} {"sampler ms":>12} {"speedup":>9}')
+
+            for size in sorted(options['sizes']):
+                self.populate(size, topic_ids)
+
+                baseline = self.time_it(options['repeat'], lambda: self.order_by_random(
+                    selected_topics, difficulties, options['time_budget']))
+
+                start = time.perf_counter()
+                index = ProblemIndex.build()
+                build_ms = (time.perf_counter() - start) * 1000
+
+                sampled = self.time_it(options['repeat'], lambda: index.sample(
+                    selected_topics, difficulties, options['time_budget'], rng=self.rng))
+
+                speedup = baseline / sampled if sampled else float('inf')
+                self.stdout.write(f'{size:>10} {baseline:>16.2f} {build_ms:>16.2f} {sampled:>12.3f} {speedup:>8.0f}x')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def populate(self, size, topic_ids):
+        """Top the problem bank up to `size` problems with 1-3 topics each."""
+        ProblemTopics = Problem.topics.through
+        existing = Problem.objects.count()
+        batch_size = 10000
+
+        for start in range(existing, size, batch_size):
+            count = min(batch_size, size - start)
+            problems = Problem.objects.bulk_create([
+                Problem(
+                    name=f'Benchmark Problem {start + i}',
+                    prompt='Benchmark prompt',
+                    choice_a='A', choice_b='B', choice_c='C', choice_d='D',
+                    correct_answer='A',
+                    estimated_time_to_complete=self.rng.randint(2, 10),
+                    difficulty=self.rng.randint(1, 5),
+                )
+                for i in range(count)
+            ])
+            ProblemTopics.objects.bulk_create([
+                ProblemTopics(problem_id=problem.id, topic_id=topic_id)
+                for problem in problems
+                for topic_id in self.rng.sample(topic_ids, self.rng.randint(1, 3))
+            ])
+
+    def order_by_random(self, topic_ids, difficulties, time_budget):
+        """The selection training_setup used to run."""
+        problems = Problem.objects.filter(
+            topics__in=topic_ids,
+            difficulty__in=difficulties
+        ).distinct()
+        avg_time_per_problem = problems.aggregate(avg=Sum('estimated_time_to_complete') / Count('id'))['avg'] or 5
+        max_problems = int(time_budget / avg_time_per_problem)
+        return list(problems.order_by('?')[:max_problems].values_list('id', flat=True))
+
+    def time_it(self, repeat, func):
+        """Average wall-clock milliseconds per call."""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) * 1000 / repeat
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from adeptly import leaderboard
+
+class Command(BaseCommand):
+    help = 'Compare the materialized leaderboard against the raw UserTopicStats aggregates'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Rebuild the materialized tables if they are out of sync')
+        parser.add_argument('--limit', type=int, default=20, help='Maximum number of discrepancies to print')
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Checking leaderboard consistency...')
+        
+        discrepancies = leaderboard.find_discrepancies()
+        
+        if not discrepancies:
+            self.stdout.write(self.style.SUCCESS('Leaderboard is consistent with UserTopicStats.'))
+            return
+        
+        for kind, object_id, expected, actual in discrepancies[:options['limit']]:
+            self.stdout.write(f'{kind} {object_id}: expected {expected}, found {actual}')
+        if len(discrepancies) > options['limit']:
+            self.stdout.write(f'... and {len(discrepancies) - options["limit"]} more')
+        
+        if options['repair']:
+            users, topics = leaderboard.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt leaderboard: {users} user rows, {topics} topic rows.'))
+        else:
+            raise CommandError(f'Found {len(discrepancies)} leaderboard discrepancies. Run with --repair to rebuild.')
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from adeptly import dataio, loadgen
+
+class Command(BaseCommand):
+    help = 'Bulk-generate synthetic users, problems, training sessions and XP history for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=loadgen.USERS)
+        parser.add_argument('--topics', type=int, default=loadgen.TOPICS)
+        parser.add_argument('--problems', type=int, default=loadgen.PROBLEMS)
+        parser.add_argument('--sessions', type=int, default=loadgen.SESSIONS)
+        parser.add_argument('--problems-per-session', type=int, default=loadgen.PROBLEMS_PER_SESSION,
+                            help='Average number of problems in a session')
+        parser.add_argument('--days', type=int, default=loadgen.DAYS, help='Spread sessions over this many past days')
+        parser.add_argument('--seed', type=int, default=loadgen.SEED,
+                            help='Random seed; the same seed generates the same data')
+        parser.add_argument('--batch-size', type=int, default=dataio.BATCH_SIZE, help='Rows written per statement')
+        parser.add_argument('--method', choices=['auto', 'copy', 'insert'], default='auto',
+                            help='COPY FROM STDIN (PostgreSQL only) or bulk INSERTs; auto picks COPY when available')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Generating {options["users"]} users, {options["topics"]} topics, {options["problems"]} problems '
+            f'and {options["sessions"]} sessions (seed {options["seed"]})...'
+        )
+
+        def on_progress(sessions):
+            self.stdout.write(f'  {sessions} sessions')
+
+        try:
+            result = loadgen.generate(
+                users=options['users'],
+                topics=options['topics'],
+                problems=options['problems'],
+                sessions=options['sessions'],
+                problems_per_session=options['problems_per_session'],
+                days=options['days'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                method=options['method'],
+                on_progress=on_progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for label, count in result.counts.items():
+            self.stdout.write(f'  {label}: {count} rows')
+
+        rows = sum(result.counts.values())
+        rate = rows / result.elapsed if result.elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {rows} rows in {result.elapsed:.2f}s ({rate:.0f} rows/s). '
+            f'Every generated user logs in with the password "{loadgen.PASSWORD}".'
+        ))
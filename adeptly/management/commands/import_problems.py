@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from adeptly import importer
+
+class Command(BaseCommand):
+    help = 'Import training problems from JSONL, CSV or YAML files, updating problems that already exist'
+    
+    # Problem-bank files imported when no paths are given (see adeptly/problem_bank)
+    bank_files = []
+    label = 'problems'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*' if self.bank_files else '+',
+                            help='Problem files (.jsonl, .csv, .yaml)')
+        parser.add_argument('--create-topics', action='store_true',
+                            help='Create topics that do not exist yet instead of failing')
+        parser.add_argument('--batch-size', type=int, default=importer.BATCH_SIZE,
+                            help='Problems written per batch')
+    
+    def handle(self, *args, **options):
+        paths = options['paths'] or [importer.bank_path(filename) for filename in self.bank_files]
+        
+        self.stdout.write(f'Importing {self.label} into Adeptly...')
+        
+        def on_problem(problem):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'Imported problem: {problem.name}')
+        
+        try:
+            result = importer.import_files(
+                paths,
+                create_topics=options['create_topics'],
+                batch_size=options['batch_size'],
+                on_problem=on_problem,
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        
+        rate = result.rows / result.elapsed if result.elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported {result.rows} {self.label} to Adeptly '
+            f'({result.created} added, {result.updated} updated) in {result.elapsed:.2f}s, {rate:.0f} problems/s'
+        ))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from adeptly.models import Topic, Rank
+from adeptly.ranks import DEFAULT_LADDER
 from django.db import transaction
 
 class Command(BaseCommand):
@@ -31,15 +32,8 @@ class Command(BaseCommand):
                     self.stdout.write(f'Topic already exists: {topic_name}')
             
             # Create ranks if they don't exist
-            rank_names = [
-                'Beginner',
-                'Intermediate',
-                'Advanced',
-                'Expert',
-            ]
-            
-            for rank_name in rank_names:
-                rank, created = Rank.objects.get_or_create(name=rank_name)
+            for rank_name, threshold in DEFAULT_LADDER:
+                rank, created = Rank.objects.get_or_create(name=rank_name, defaults={'threshold': threshold})
                 if created:
                     self.stdout.write(f'Created rank: {rank_name}')
                 else:
@@ -0,0 +1,81 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from adeptly import loadgen, loadtest
+
+class Command(BaseCommand):
+    help = 'Load-test the training flow of a running server with concurrent scripted trainees'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', nargs='?', default='http://127.0.0.1:8000',
+                            help='Server to test, e.g. a local runserver or gunicorn')
+        parser.add_argument('--concurrency', type=int, default=loadtest.CONCURRENCY,
+                            help='Trainees running journeys at the same time')
+        parser.add_argument('--journeys', type=int, default=loadtest.JOURNEYS, help='Journeys to run in total')
+        parser.add_argument('--problems', type=int, default=loadtest.PROBLEMS,
+                            help='Problems answered per journey')
+        parser.add_argument('--username', action='append', default=[],
+                            help='Log in as this user (can be repeated; default: users from generate_load_data)')
+        parser.add_argument('--password', default=loadgen.PASSWORD, help='Password of every test user')
+        parser.add_argument('--timeout', type=float, default=loadtest.TIMEOUT, help='Seconds to wait per request')
+        parser.add_argument('--seed', type=int, help='Random seed for topic and answer choices')
+        parser.add_argument('--json', metavar='PATH', help='Also write the report to this JSON file')
+    
+    def handle(self, *args, **options):
+        usernames = options['username'] or list(
+            User.objects.filter(username__startswith='loaduser').order_by('id')
+            .values_list('username', flat=True)[:max(options['journeys'], 1)]
+        )
+        if not usernames:
+            raise CommandError('No test users found. Run generate_load_data first or pass --username.')
+        credentials = [(username, options['password']) for username in usernames]
+        
+        self.stdout.write(
+            f'Running {options["journeys"]} journeys against {options["base_url"]} '
+            f'with {options["concurrency"]} concurrent trainees...'
+        )
+        
+        def on_journey(finished):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  {finished} journeys finished')
+        
+        report = loadtest.run(
+            options['base_url'],
+            credentials,
+            concurrency=options['concurrency'],
+            journeys=options['journeys'],
+            problems=options['problems'],
+            timeout=options['timeout'],
+            seed=options['seed'],
+            on_journey=on_journey,
+        )
+        
+        self.stdout.write(
+            f'{"Endpoint":<26} {"Requests":>8} {"Errors":>7} {"Req/s":>8} '
+            f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}'
+        )
+        for stats in report.endpoints:
+            self.stdout.write(
+                f'{stats.endpoint:<26} {stats.requests:>8} {stats.error_rate:>7.1%} {stats.throughput:>8.1f} '
+                f'{stats.p50_ms:>8.1f} {stats.p95_ms:>8.1f} {stats.p99_ms:>8.1f} {stats.max_ms:>8.1f}'
+            )
+        for message in report.errors:
+            self.stdout.write(self.style.ERROR(f'  {message}'))
+        
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    'journeys': report.journeys,
+                    'failed_journeys': report.failed_journeys,
+                    'elapsed': report.elapsed,
+                    'endpoints': [stats._asdict() for stats in report.endpoints],
+                }, f, indent=2)
+        
+        rate = report.journeys / report.elapsed if report.elapsed else 0
+        style = self.style.ERROR if report.failed_journeys else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{report.journeys} journeys in {report.elapsed:.2f}s ({rate:.2f} journeys/s), '
+            f'{report.failed_journeys} failed.'
+        ))
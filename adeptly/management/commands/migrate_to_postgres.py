@@ -0,0 +1,87 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from adeptly import dbcopy, search
+
+class Command(BaseCommand):
+    help = (
+        'Copy the SQLite database into PostgreSQL in resumable batches, then verify the copy. '
+        'The default sqlite and postgres aliases are only defined when DATABASE_URL is set '
+        '(or MIGRATE_FROM_SQLITE, for the sqlite alias alone); SQLITE_PATH picks the SQLite file.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='sqlite', help='Database alias to copy from')
+        parser.add_argument('--target', default='postgres', help='Database alias to copy into')
+        parser.add_argument('--batch-size', type=int, default=dbcopy.BATCH_SIZE,
+                            help='Rows read and committed per batch')
+        parser.add_argument('--method', choices=['auto', 'copy', 'insert'], default='auto',
+                            help='COPY FROM STDIN (PostgreSQL only) or bulk INSERTs; auto picks COPY when available')
+        parser.add_argument('--exclude', action='append', default=[], metavar='APP_LABEL.MODEL',
+                            help='Skip a model (can be repeated)')
+        parser.add_argument('--migrate', action='store_true', help='Run migrate on the target database first')
+        parser.add_argument('--flush', action='store_true',
+                            help='Empty the target tables and start over instead of resuming')
+        parser.add_argument('--verify-only', action='store_true', help='Only compare the two databases')
+        parser.add_argument('--no-verify', action='store_true', help='Skip comparing the databases after copying')
+    
+    def handle(self, *args, **options):
+        source, target = options['source'], options['target']
+        for alias in (source, target):
+            if alias not in connections:
+                raise CommandError(
+                    f'No "{alias}" database is configured. Set DATABASE_URL to the PostgreSQL database '
+                    'to define the sqlite and postgres aliases.'
+                )
+        
+        try:
+            if options['migrate']:
+                call_command('migrate', database=target, verbosity=0)
+            
+            if not options['verify_only']:
+                if options['flush']:
+                    self.stdout.write(f'Emptying the {target} database...')
+                    dbcopy.flush_target(target, options['exclude'])
+                
+                self.stdout.write(f'Copying {source} into {target}...')
+                
+                def on_batch(label, rows):
+                    self.stdout.write(f'  {label}: {rows} rows')
+                
+                result = dbcopy.copy_database(
+                    source,
+                    target,
+                    batch_size=options['batch_size'],
+                    method=options['method'],
+                    exclude=options['exclude'],
+                    on_batch=on_batch,
+                )
+                
+                # The copy bypasses the signals that maintain the search index
+                search.rebuild(using=target)
+                
+                rate = result.rows / result.elapsed if result.elapsed else 0
+                self.stdout.write(self.style.SUCCESS(
+                    f'Copied {result.rows} new rows in {result.elapsed:.2f}s ({rate:.0f} rows/s).'
+                ))
+            
+            if options['no_verify']:
+                return
+            
+            self.stdout.write('Verifying...')
+            checks = dbcopy.verify(source, target, options['exclude'])
+        except dbcopy.CopyError as e:
+            raise CommandError(str(e))
+        
+        mismatched = [check for check in checks if not check.matches]
+        for check in mismatched:
+            self.stdout.write(self.style.ERROR(
+                f'  {check.model}: {check.source_count} rows in {source}, {check.target_count} in {target}, contents differ'
+            ))
+        if mismatched:
+            raise CommandError(
+                f'{len(mismatched)} of {len(checks)} tables differ. '
+                'Run the command again to copy new rows, or with --flush to start over.'
+            )
+        self.stdout.write(self.style.SUCCESS(f'All {len(checks)} tables match.'))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from adeptly import selection
+
+class Command(BaseCommand):
+    help = 'Recompute topic mastery and adaptive problem queues from the answer log'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', metavar='USER_ID',
+                            help='Only rebuild this user (can be repeated)')
+    
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = selection.rebuild(options['user_ids'])
+        elapsed = time.perf_counter() - start
+        
+        self.stdout.write(self.style.SUCCESS(f'Queued {written} problems in {elapsed:.2f}s.'))
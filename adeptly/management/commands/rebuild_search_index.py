@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from adeptly import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for training problems'
+    
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.ERROR('This database has no full-text index; searches use icontains lookups.'))
+            return
+        
+        self.stdout.write('Rebuilding problem search index...')
+        start = time.perf_counter()
+        with transaction.atomic():
+            count = search.rebuild()
+        elapsed = time.perf_counter() - start
+        
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} problems in {elapsed:.2f}s.'))
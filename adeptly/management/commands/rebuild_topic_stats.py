@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from adeptly import leaderboard, ledger, ranks
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s per-topic XP and rank from the XP ledger'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the rows that would change')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Recompute this many user ids per transaction (default: all at once)')
+        parser.add_argument('--limit', type=int, default=20, help='Maximum number of changes to print')
+    
+    def handle(self, *args, **options):
+        recompute = ledger.topic_stats_drift if options['dry_run'] else ledger.recompute_topic_stats
+        ladder = ranks.get_ladder()
+        rank_names = dict(zip(ladder.ids, ladder.names))
+        
+        start = time.perf_counter()
+        changed = 0
+        for first, last in ledger.user_id_ranges(options['chunk_size']):
+            drift = recompute(first, last)
+            for row in drift[:max(options['limit'] - changed, 0)]:
+                actual = 'missing' if row.actual_experience is None else (
+                    f'{row.actual_experience} XP ({rank_names.get(row.actual_rank_id, row.actual_rank_id)})'
+                )
+                self.stdout.write(
+                    f'user {row.user_id} topic {row.topic_id}: {actual} -> '
+                    f'{row.expected_experience} XP ({rank_names.get(row.expected_rank_id, row.expected_rank_id)})'
+                )
+            changed += len(drift)
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  users {first}-{last}: {len(drift)} rows')
+        if changed > options['limit']:
+            self.stdout.write(f'... and {changed - options["limit"]} more')
+        
+        if options['dry_run']:
+            self.stdout.write(f'{changed} topic stats differ from the ledger. Run without --dry-run to repair them.')
+            return
+        
+        if changed:
+            leaderboard.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Recomputed topic stats from the ledger: {changed} rows changed in {elapsed:.2f}s.'))
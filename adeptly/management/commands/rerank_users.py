@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from adeptly import ranks
+
+class Command(BaseCommand):
+    help = 'Reassign every user topic rank to match the current rank thresholds'
+    
+    def handle(self, *args, **options):
+        ladder = ranks.get_ladder()
+        self.stdout.write('Rank ladder: ' + ', '.join(
+            f'{name} ({threshold} XP)' for name, threshold in zip(ladder.names, ladder.thresholds)
+        ))
+        
+        start = time.perf_counter()
+        changed = ranks.rerank_all()
+        elapsed = time.perf_counter() - start
+        
+        self.stdout.write(self.style.SUCCESS(f'Re-ranked {changed} topic stats in {elapsed:.2f}s.'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from adeptly import ledger
+
+class Command(BaseCommand):
+    help = 'Fold new XP ledger rows into the per-user, per-topic, per-day rollups behind the windowed leaderboards'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ledger.BATCH_SIZE,
+                            help='Ledger rows folded in per transaction')
+        parser.add_argument('--settle', type=int, default=ledger.SETTLE,
+                            help='Leave ledger rows younger than this many seconds for the next run')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute every rollup from the whole ledger (stop writes first)')
+    
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['rebuild']:
+            self.stdout.write('Rebuilding XP rollups from the whole ledger...')
+            result = ledger.rebuild(options['batch_size'])
+        else:
+            def on_batch(batch):
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'  {batch.entries} ledger rows, up to id {batch.last_id}')
+            
+            result = ledger.roll_up(options['batch_size'], options['settle'], on_batch=on_batch)
+        elapsed = time.perf_counter() - start
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {result.entries} ledger rows into {result.rollups} rollups in {elapsed:.2f}s '
+            f'(watermark at id {result.last_id}).'
+        ))
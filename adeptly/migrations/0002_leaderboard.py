@@ -0,0 +1,66 @@
+# Generated by Django 4.2.10 on 2026-10-18 14:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def populate_leaderboard(apps, schema_editor):
+    UserTopicStats = apps.get_model('adeptly', 'UserTopicStats')
+    UserTotalStats = apps.get_model('adeptly', 'UserTotalStats')
+    Topic = apps.get_model('adeptly', 'Topic')
+    TopicStats = apps.get_model('adeptly', 'TopicStats')
+
+    user_totals = UserTopicStats.objects.values('user_id').annotate(
+        total_experience=Sum('experience'),
+        topics_trained=Count('topic', distinct=True),
+    ).order_by()
+    UserTotalStats.objects.bulk_create(
+        [UserTotalStats(**row) for row in user_totals],
+        batch_size=1000,
+    )
+
+    topic_counts = Topic.objects.annotate(
+        users_count=Count('usertopicstats__user', distinct=True)
+    ).values_list('id', 'users_count')
+    TopicStats.objects.bulk_create(
+        [TopicStats(topic_id=topic_id, users_count=count) for topic_id, count in topic_counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('adeptly', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTotalStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_experience', models.IntegerField(default=0)),
+                ('topics_trained', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='total_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_experience'], name='usertotal_exp_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TopicStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('users_count', models.IntegerField(default=0)),
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='adeptly.topic')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-users_count'], name='topicstats_users_idx')],
+            },
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
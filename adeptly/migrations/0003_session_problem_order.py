@@ -0,0 +1,59 @@
+# Generated by Django 4.2.10 on 2026-10-18 14:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_session_problems(apps, schema_editor):
+    TrainingSession = apps.get_model('adeptly', 'TrainingSession')
+    SessionProblem = apps.get_model('adeptly', 'SessionProblem')
+    ProblemsThrough = TrainingSession.problems.through
+
+    # Number each session's problems in the order they were added
+    items = []
+    positions = {}
+    for session_id, problem_id in ProblemsThrough.objects.order_by('trainingsession_id', 'id').values_list(
+        'trainingsession_id', 'problem_id'
+    ).iterator():
+        position = positions.get(session_id, 0)
+        positions[session_id] = position + 1
+        items.append(SessionProblem(session_id=session_id, problem_id=problem_id, position=position))
+        if len(items) >= 1000:
+            SessionProblem.objects.bulk_create(items)
+            items = []
+    SessionProblem.objects.bulk_create(items)
+
+    for session_id, total in positions.items():
+        TrainingSession.objects.filter(id=session_id).update(total_problems=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0002_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingsession',
+            name='total_problems',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='SessionProblem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_items', to='adeptly.problem')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='adeptly.trainingsession')),
+            ],
+            options={
+                'ordering': ['session', 'position'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sessionproblem',
+            constraint=models.UniqueConstraint(fields=('session', 'position'), name='unique_session_position'),
+        ),
+        migrations.RunPython(populate_session_problems, migrations.RunPython.noop),
+    ]
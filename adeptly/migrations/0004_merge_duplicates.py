@@ -0,0 +1,106 @@
+# Merges duplicate rows ahead of the unique constraints added in 0005_index_plan.
+# Kept in its own migration so PostgreSQL commits the data changes before the
+# schema changes run.
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_topics(apps):
+    Topic = apps.get_model('adeptly', 'Topic')
+    Problem = apps.get_model('adeptly', 'Problem')
+    TrainingSession = apps.get_model('adeptly', 'TrainingSession')
+    UserTopicStats = apps.get_model('adeptly', 'UserTopicStats')
+    TopicExperienceEarned = apps.get_model('adeptly', 'TopicExperienceEarned')
+    TopicStats = apps.get_model('adeptly', 'TopicStats')
+
+    duplicates = Topic.objects.values('name').annotate(count=Count('id'), keep_id=Min('id')).filter(count__gt=1)
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        duplicate_ids = list(
+            Topic.objects.filter(name=duplicate['name']).exclude(id=keep_id).values_list('id', flat=True)
+        )
+
+        # Re-point M2M rows, dropping those that would duplicate a row of the kept topic
+        for through, owner in (
+            (Problem.topics.through, 'problem_id'),
+            (TrainingSession.topics_covered.through, 'trainingsession_id'),
+        ):
+            kept_owners = through.objects.filter(topic_id=keep_id).values_list(owner, flat=True)
+            through.objects.filter(topic_id__in=duplicate_ids, **{f'{owner}__in': kept_owners}).delete()
+            through.objects.filter(topic_id__in=duplicate_ids).update(topic_id=keep_id)
+
+        TopicExperienceEarned.objects.filter(topic_id__in=duplicate_ids).update(topic_id=keep_id)
+        UserTopicStats.objects.filter(topic_id__in=duplicate_ids).update(topic_id=keep_id)
+        TopicStats.objects.filter(topic_id__in=duplicate_ids).delete()
+        Topic.objects.filter(id__in=duplicate_ids).delete()
+
+
+def merge_duplicate_ranks(apps):
+    Rank = apps.get_model('adeptly', 'Rank')
+    UserTopicStats = apps.get_model('adeptly', 'UserTopicStats')
+
+    duplicates = Rank.objects.values('name').annotate(count=Count('id'), keep_id=Min('id')).filter(count__gt=1)
+    for duplicate in duplicates:
+        duplicate_ids = list(
+            Rank.objects.filter(name=duplicate['name']).exclude(id=duplicate['keep_id']).values_list('id', flat=True)
+        )
+        UserTopicStats.objects.filter(rank_id__in=duplicate_ids).update(rank_id=duplicate['keep_id'])
+        Rank.objects.filter(id__in=duplicate_ids).delete()
+
+
+def merge_duplicate_user_topic_stats(apps):
+    UserTopicStats = apps.get_model('adeptly', 'UserTopicStats')
+
+    # Duplicates come from racing get_or_create calls, each of which
+    # accumulated part of the user's XP, so the experience is summed
+    duplicates = UserTopicStats.objects.values('user_id', 'topic_id').annotate(
+        count=Count('id'), keep_id=Min('id'), experience_sum=Sum('experience')
+    ).filter(count__gt=1)
+    for duplicate in duplicates:
+        UserTopicStats.objects.filter(id=duplicate['keep_id']).update(experience=duplicate['experience_sum'])
+        UserTopicStats.objects.filter(
+            user_id=duplicate['user_id'], topic_id=duplicate['topic_id']
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+def rebuild_leaderboard(apps):
+    UserTopicStats = apps.get_model('adeptly', 'UserTopicStats')
+    UserTotalStats = apps.get_model('adeptly', 'UserTotalStats')
+    Topic = apps.get_model('adeptly', 'Topic')
+    TopicStats = apps.get_model('adeptly', 'TopicStats')
+
+    UserTotalStats.objects.all().delete()
+    TopicStats.objects.all().delete()
+
+    user_totals = UserTopicStats.objects.values('user_id').annotate(
+        total_experience=Sum('experience'),
+        topics_trained=Count('topic', distinct=True),
+    ).order_by()
+    UserTotalStats.objects.bulk_create([UserTotalStats(**row) for row in user_totals], batch_size=1000)
+
+    topic_counts = Topic.objects.annotate(
+        users_count=Count('usertopicstats__user', distinct=True)
+    ).values_list('id', 'users_count')
+    TopicStats.objects.bulk_create(
+        [TopicStats(topic_id=topic_id, users_count=count) for topic_id, count in topic_counts],
+        batch_size=1000,
+    )
+
+
+def merge_duplicates(apps, schema_editor):
+    merge_duplicate_topics(apps)
+    merge_duplicate_ranks(apps)
+    merge_duplicate_user_topic_stats(apps)
+    rebuild_leaderboard(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0003_session_problem_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.10 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0004_merge_duplicates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rank',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='topic',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['difficulty', 'id'], name='problem_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topicexperienceearned',
+            index=models.Index(fields=['training_session', 'topic', 'experience_earned'], name='xp_session_topic_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingsession',
+            index=models.Index(fields=['user', '-created_at'], name='session_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertopicstats',
+            index=models.Index(fields=['topic', '-experience'], name='usertopic_topic_exp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertopicstats',
+            index=models.Index(fields=['user', '-experience'], name='usertopic_user_exp_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='usertopicstats',
+            constraint=models.UniqueConstraint(fields=('user', 'topic'), name='unique_user_topic_stats'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index the problem/topic through table by (topic_id, problem_id) so the
+    problem list can seek straight to a page of one topic's problems.
+    The auto-created through table can't declare Meta.indexes, hence SQL.
+    """
+
+    dependencies = [
+        ('adeptly', '0005_index_plan'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX problem_topics_topic_problem_idx ON adeptly_problem_topics (topic_id, problem_id)',
+            'DROP INDEX problem_topics_topic_problem_idx',
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE adeptly_problem_search USING fts5(
+    name, prompt, choices, tokenize = 'porter unicode61', prefix = '2 3'
+)
+"""
+
+SQLITE_POPULATE = """
+INSERT INTO adeptly_problem_search (rowid, name, prompt, choices)
+SELECT id, name, prompt, choice_a || ' ' || choice_b || ' ' || choice_c || ' ' || choice_d
+FROM adeptly_problem
+"""
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE adeptly_problem_search (
+        problem_id bigint PRIMARY KEY REFERENCES adeptly_problem (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL
+    )
+    """,
+    'CREATE INDEX adeptly_problem_search_document_idx ON adeptly_problem_search USING GIN (document)',
+]
+
+POSTGRES_POPULATE = """
+INSERT INTO adeptly_problem_search (problem_id, document)
+SELECT id,
+    setweight(to_tsvector('english', name), 'A') ||
+    setweight(to_tsvector('english', prompt), 'B') ||
+    setweight(to_tsvector('english', choice_a || ' ' || choice_b || ' ' || choice_c || ' ' || choice_d), 'C')
+FROM adeptly_problem
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [SQLITE_CREATE, SQLITE_POPULATE]
+    elif vendor == 'postgresql':
+        statements = POSTGRES_CREATE + [POSTGRES_POPULATE]
+    else:
+        # Other databases fall back to icontains searches
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS adeptly_problem_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0006_problem_topics_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
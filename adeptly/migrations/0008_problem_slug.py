@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-18 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0007_problem_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='slug',
+            field=models.SlugField(blank=True, help_text='Natural key used by problem-bank imports', max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Gives existing problems the slug the importer derives from their name, so
+# re-running a problem-bank import updates them instead of adding copies.
+# Kept separate from 0008_problem_slug so PostgreSQL doesn't mix the schema
+# change and the data change in one transaction.
+
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def backfill_slugs(apps, schema_editor):
+    Problem = apps.get_model('adeptly', 'Problem')
+
+    taken = set(Problem.objects.exclude(slug=None).values_list('slug', flat=True))
+    updated = []
+    for problem in Problem.objects.filter(slug=None).order_by('id').only('id', 'name'):
+        base = slugify(problem.name)[:240] or 'problem'
+        slug = base
+        suffix = 2
+        # Problems imported more than once keep their copies, told apart by suffix
+        while slug in taken:
+            slug = f'{base}-{suffix}'
+            suffix += 1
+        taken.add(slug)
+        problem.slug = slug
+        updated.append(problem)
+    Problem.objects.bulk_update(updated, ['slug'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0008_problem_slug'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_slugs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-18 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0009_backfill_problem_slugs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MigrationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=255, unique=True)),
+                ('last_pk', models.CharField(blank=True, max_length=255, null=True)),
+                ('rows_copied', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.10 on 2026-10-18 15:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0010_migration_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingSessionSummary',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='adeptly.trainingsession')),
+                ('total_problems', models.IntegerField(default=0)),
+                ('problems_completed', models.IntegerField(default=0)),
+                ('correct_attempts', models.IntegerField(default=0)),
+                ('incorrect_attempts', models.IntegerField(default=0)),
+                ('accuracy', models.FloatField(default=0, help_text="Percentage of the session's problems solved")),
+                ('total_experience', models.IntegerField(default=0)),
+                ('time_spent', models.IntegerField(default=0, help_text='Seconds from start to completion')),
+                ('topics_covered', models.IntegerField(default=0)),
+                ('topics', models.JSONField(default=list)),
+                ('problems', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
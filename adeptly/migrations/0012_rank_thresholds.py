@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0011_training_session_summary'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='rank',
+            options={'ordering': ['threshold', 'id']},
+        ),
+        migrations.AddField(
+            model_name='rank',
+            name='threshold',
+            field=models.IntegerField(default=0, help_text='Topic experience needed to reach this rank'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Gives the built-in ranks the thresholds that used to be hard-coded in the
+# grading code, so existing ladders keep promoting at 100/500/1000 XP.
+
+from django.db import migrations
+
+THRESHOLDS = {
+    'Intermediate': 100,
+    'Advanced': 500,
+    'Expert': 1000,
+}
+
+
+def backfill_thresholds(apps, schema_editor):
+    Rank = apps.get_model('adeptly', 'Rank')
+
+    for name, threshold in THRESHOLDS.items():
+        Rank.objects.filter(name=name).update(threshold=threshold)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0012_rank_thresholds'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_thresholds, migrations.RunPython.noop),
+    ]
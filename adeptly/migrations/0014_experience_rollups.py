@@ -0,0 +1,56 @@
+# Generated by Django 4.2.10 on 2026-10-18 16:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('adeptly', '0013_backfill_rank_thresholds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExperienceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('experience', models.IntegerField(default=0)),
+                ('entries', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='topicexperienceearned',
+            index=models.Index(fields=['earned_at'], name='xp_earned_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='experiencerollup',
+            name='topic',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='adeptly.topic'),
+        ),
+        migrations.AddField(
+            model_name='experiencerollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='experience_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='experiencerollup',
+            index=models.Index(fields=['day', 'user', 'experience'], name='rollup_day_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='experiencerollup',
+            constraint=models.UniqueConstraint(fields=('user', 'topic', 'day'), name='unique_experience_rollup'),
+        ),
+    ]
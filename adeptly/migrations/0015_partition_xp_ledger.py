@@ -0,0 +1,97 @@
+# Turns the XP ledger into a table partitioned by month of earned_at on
+# PostgreSQL. Other databases keep the plain table and its earned_at index.
+#
+# PostgreSQL can't partition a table in place, so the ledger is renamed,
+# recreated as a partitioned table with the same columns, filled from the
+# old one and the old one dropped. Partitioned tables need the partition key
+# in their primary key, so it becomes (id, earned_at); id keeps its own
+# sequence and stays unique. The renamed table's id sequence (identity or
+# serial) would still hold the name the new one needs, so it is detached and
+# dropped first; its position carries over through setval() after the copy.
+# The old table's indexes and foreign keys are recreated under their
+# original names. Rows outside the monthly partitions go to a default
+# partition.
+
+from datetime import date
+
+from django.db import migrations
+
+TABLE = 'adeptly_topicexperienceearned'
+OLD_TABLE = 'adeptly_topicexperienceearned_unpartitioned'
+
+# Months of partitions to create past the current one
+MONTHS_AHEAD = 2
+
+
+def _month_start(day, months=0):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_ledger(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}')
+
+        cursor.execute(
+            'SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN ('
+            '  SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = %s)',
+            [OLD_TABLE, OLD_TABLE, 'p'],
+        )
+        indexes = [indexdef.replace(OLD_TABLE, TABLE) for indexdef, in cursor.fetchall()]
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = %s',
+            [OLD_TABLE, 'f'],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f'ALTER TABLE {OLD_TABLE} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        cursor.execute(f'ALTER TABLE {OLD_TABLE} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'DROP SEQUENCE IF EXISTS {TABLE}_id_seq')
+
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (earned_at)'
+        )
+        cursor.execute(f'ALTER TABLE {TABLE} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+
+        cursor.execute(f"SELECT date_trunc('month', MIN(earned_at))::date FROM {OLD_TABLE}")
+        first = cursor.fetchone()[0]
+        today = date.today()
+        month = _month_start(min(first, today) if first else today)
+        last = _month_start(today, MONTHS_AHEAD)
+        while month <= last:
+            end = _month_start(month, 1)
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_p{month:%Y%m} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            month = end
+        cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}')
+        cursor.execute(
+            f"SELECT setval('{TABLE}_id_seq', COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false)"
+        )
+        cursor.execute(f'DROP TABLE {OLD_TABLE}')
+
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, earned_at)')
+        for indexdef in indexes:
+            cursor.execute(indexdef)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0014_experience_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_ledger, migrations.RunPython.noop),
+    ]
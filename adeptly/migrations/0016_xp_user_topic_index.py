@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0015_partition_xp_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='topicexperienceearned',
+            index=models.Index(fields=['user', 'topic', 'experience_earned'], name='xp_user_topic_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0016_xp_user_topic_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='attempt_count',
+            field=models.IntegerField(default=0, help_text='Answers submitted for this problem'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='solve_count',
+            field=models.IntegerField(default=0, help_text='Distinct users who solved this problem'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Fills in the new Problem counters from existing rows. solve_count is
+# exact: it's the number of solved-by rows. Wrong answers were only ever
+# counted per session, not per problem, so attempt_count starts from the
+# correct answers recorded in sessions' completed problems and is a lower
+# bound until new answers are graded.
+
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(through, column):
+    return Coalesce(Subquery(
+        through.objects.filter(problem_id=OuterRef('pk'))
+        .order_by().values('problem_id').annotate(count=Count(column)).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def backfill_counts(apps, schema_editor):
+    Problem = apps.get_model('adeptly', 'Problem')
+    TrainingSession = apps.get_model('adeptly', 'TrainingSession')
+
+    Problem.objects.update(
+        solve_count=_count(Problem.solved_by.through, 'user_id'),
+        attempt_count=_count(TrainingSession.problems_completed.through, 'trainingsession_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adeptly', '0017_problem_solve_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-18 16:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('adeptly', '0018_backfill_problem_solve_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selected_answer', models.CharField(max_length=1)),
+                ('is_correct', models.BooleanField()),
+                ('elapsed_ms', models.IntegerField(blank=True, help_text='Time from showing the problem to the answer', null=True)),
+                ('answered_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='adeptly.problem')),
+                ('training_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='adeptly.trainingsession')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['problem', 'is_correct', 'elapsed_ms'], name='attempt_problem_idx'), models.Index(fields=['user', 'answered_at'], name='attempt_user_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.10 on 2026-10-18 16:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('adeptly', '0019_answer_attempts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicMastery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.IntegerField(default=0)),
+                ('misses', models.IntegerField(default=0)),
+                ('weakness', models.IntegerField(default=50)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mastery', to='adeptly.topic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_mastery', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'topic mastery',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProblemQueueEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField(default=0)),
+                ('base_score', models.IntegerField(default=0, help_text='Score before the topic weakness bonus')),
+                ('streak', models.IntegerField(default=0, help_text='Correct answers in a row')),
+                ('solved', models.BooleanField(default=False)),
+                ('due_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_answered_at', models.DateTimeField(blank=True, null=True)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_entries', to='adeptly.problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='problem_queue', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'problem queue entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='topicmastery',
+            constraint=models.UniqueConstraint(fields=('user', 'topic'), name='unique_topic_mastery'),
+        ),
+        migrations.AddIndex(
+            model_name='problemqueueentry',
+            index=models.Index(fields=['user', '-score'], name='queue_user_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='problemqueueentry',
+            constraint=models.UniqueConstraint(fields=('user', 'problem'), name='unique_problem_queue_entry'),
+        ),
+    ]
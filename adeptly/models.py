@@ -1,14 +1,19 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Rank(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
+    threshold = models.IntegerField(default=0, help_text="Topic experience needed to reach this rank")
+    
+    class Meta:
+        ordering = ['threshold', 'id']
     
     def __str__(self):
         return self.name
 
 class Topic(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
     
     def __str__(self):
         return self.name
@@ -19,6 +24,17 @@ class UserTopicStats(models.Model):
     experience = models.IntegerField(default=0)
     rank = models.ForeignKey(Rank, on_delete=models.CASCADE)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'topic'], name='unique_user_topic_stats'),
+        ]
+        indexes = [
+            # Topic leaderboards and topic rank counts
+            models.Index(fields=['topic', '-experience'], name='usertopic_topic_exp_idx'),
+            # A user's top topics
+            models.Index(fields=['user', '-experience'], name='usertopic_user_exp_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} - {self.topic.name} Stats"
 
@@ -32,6 +48,8 @@ class Problem(models.Model):
     ]
     
     name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=255, unique=True, null=True, blank=True,
+                            help_text="Natural key used by problem-bank imports")
     topics = models.ManyToManyField(Topic, related_name='problems')
     prompt = models.TextField()
     choice_a = models.CharField(max_length=255)
@@ -46,6 +64,14 @@ class Problem(models.Model):
     estimated_time_to_complete = models.IntegerField(help_text="Estimated time in minutes")
     difficulty = models.IntegerField(choices=DIFFICULTY_CHOICES, default=3)
     solved_by = models.ManyToManyField(User, related_name='solved_problems', blank=True)
+    # Denormalized counters, incremented in the database by grading
+    solve_count = models.IntegerField(default=0, help_text="Distinct users who solved this problem")
+    attempt_count = models.IntegerField(default=0, help_text="Answers submitted for this problem")
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['difficulty', 'id'], name='problem_difficulty_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -61,11 +87,95 @@ class TrainingSession(models.Model):
     topics_covered = models.ManyToManyField(Topic, related_name='covered_in_sessions')
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    total_problems = models.IntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            # Recent sessions on the dashboard
+            models.Index(fields=['user', '-created_at'], name='session_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"Training Session for {self.user.username} on {self.created_at.strftime('%Y-%m-%d')}"
+    
+    def set_problems(self, problems):
+        """
+        Replace the session's problems with `problems`, keeping their order.
+        Writes the ordered SessionProblem rows and the `problems` M2M rows in bulk.
+        """
+        problem_ids = []
+        for problem in problems:
+            problem_id = getattr(problem, 'pk', problem)
+            if problem_id not in problem_ids:
+                problem_ids.append(problem_id)
+        
+        ProblemsThrough = TrainingSession.problems.through
+        with transaction.atomic():
+            self.items.all().delete()
+            ProblemsThrough.objects.filter(trainingsession_id=self.pk).delete()
+            SessionProblem.objects.bulk_create([
+                SessionProblem(session=self, problem_id=problem_id, position=position)
+                for position, problem_id in enumerate(problem_ids)
+            ])
+            ProblemsThrough.objects.bulk_create([
+                ProblemsThrough(trainingsession_id=self.pk, problem_id=problem_id)
+                for problem_id in problem_ids
+            ])
+            self.total_problems = len(problem_ids)
+            self.save(update_fields=['total_problems'])
+
+class SessionProblem(models.Model):
+    """
+    A problem at a fixed position within a training session.
+    Gives sessions a stable order and lets problem N be fetched by index.
+    """
+    session = models.ForeignKey(TrainingSession, on_delete=models.CASCADE, related_name='items')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='session_items')
+    position = models.PositiveIntegerField()
+    
+    class Meta:
+        ordering = ['session', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'position'], name='unique_session_position'),
+        ]
+    
+    def __str__(self):
+        return f"{self.session} - #{self.position + 1} {self.problem.name}"
+
+class TrainingSessionSummary(models.Model):
+    """
+    Results of a training session, computed once when it completes so the
+    results page and session lists render from one row instead of
+    re-aggregating the XP ledger.
+    """
+    session = models.OneToOneField(TrainingSession, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    total_problems = models.IntegerField(default=0)
+    problems_completed = models.IntegerField(default=0)
+    correct_attempts = models.IntegerField(default=0)
+    incorrect_attempts = models.IntegerField(default=0)
+    accuracy = models.FloatField(default=0, help_text="Percentage of the session's problems solved")
+    total_experience = models.IntegerField(default=0)
+    time_spent = models.IntegerField(default=0, help_text="Seconds from start to completion")
+    topics_covered = models.IntegerField(default=0)
+    # [{name, experience, problems, solved, accuracy}], most XP first
+    topics = models.JSONField(default=list)
+    # [{name, correct, topics}], in session order
+    problems = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Summary of {self.session}"
+    
+    @property
+    def time_spent_minutes(self):
+        return round(self.time_spent / 60)
 
 class TopicExperienceEarned(models.Model):
+    """
+    The append-only XP ledger: one row per topic per correct answer.
+    Rows are never updated; ledger.roll_up() folds new rows into
+    ExperienceRollup. On PostgreSQL the table is partitioned by month.
+    """
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE)
     experience_earned = models.IntegerField()
@@ -73,5 +183,178 @@ class TopicExperienceEarned(models.Model):
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
     earned_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Per-session breakdowns; experience_earned is included so the
+            # aggregation is answered from the index alone
+            models.Index(fields=['training_session', 'topic', 'experience_earned'], name='xp_session_topic_idx'),
+            # Month-sized range scans where the table isn't partitioned
+            models.Index(fields=['earned_at'], name='xp_earned_at_idx'),
+            # Per-user, per-topic sums for recomputing UserTopicStats
+            models.Index(fields=['user', 'topic', 'experience_earned'], name='xp_user_topic_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} earned {self.experience_earned} in {self.topic.name}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("XP ledger entries can't be changed once recorded")
+        super().save(*args, **kwargs)
+
+class AnswerAttempt(models.Model):
+    """
+    The append-only answer log: one row per submitted answer, right or
+    wrong, with the time spent on the problem. Rows are written in batches
+    by attempts.AttemptBuffer and never updated.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='answer_attempts')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='attempts')
+    training_session = models.ForeignKey(TrainingSession, on_delete=models.CASCADE, related_name='attempts')
+    selected_answer = models.CharField(max_length=1)
+    is_correct = models.BooleanField()
+    elapsed_ms = models.IntegerField(null=True, blank=True, help_text="Time from showing the problem to the answer")
+    answered_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            # Per-problem calibration, answered from the index alone
+            models.Index(fields=['problem', 'is_correct', 'elapsed_ms'], name='attempt_problem_idx'),
+            # A user's recent answers, for weak-topic detection
+            models.Index(fields=['user', 'answered_at'], name='attempt_user_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} answered {self.selected_answer} to {self.problem.name}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Answer attempts can't be changed once recorded")
+        super().save(*args, **kwargs)
+
+class TopicMastery(models.Model):
+    """
+    A user's running answer record in a topic, kept by
+    selection.record_outcome(). weakness is the smoothed miss rate
+    (misses + 1) / (attempts + 2) as a percentage.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='topic_mastery')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='mastery')
+    attempts = models.IntegerField(default=0)
+    misses = models.IntegerField(default=0)
+    weakness = models.IntegerField(default=50)
+    
+    class Meta:
+        verbose_name_plural = 'topic mastery'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'topic'], name='unique_topic_mastery'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.topic.name} mastery"
+
+class ProblemQueueEntry(models.Model):
+    """
+    A candidate problem in a user's adaptive training queue. score is
+    precomputed by selection.record_outcome() after each answer; sessions
+    take the highest-scoring entries that are due.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='problem_queue')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='queue_entries')
+    score = models.IntegerField(default=0)
+    base_score = models.IntegerField(default=0, help_text="Score before the topic weakness bonus")
+    streak = models.IntegerField(default=0, help_text="Correct answers in a row")
+    solved = models.BooleanField(default=False)
+    due_at = models.DateTimeField(default=timezone.now)
+    last_answered_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name_plural = 'problem queue entries'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'problem'], name='unique_problem_queue_entry'),
+        ]
+        indexes = [
+            # Session start reads a user's entries best first
+            models.Index(fields=['user', '-score'], name='queue_user_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.problem.name} ({self.score})"
+
+class ExperienceRollup(models.Model):
+    """
+    XP earned per user, topic and day, summed from the ledger by
+    ledger.roll_up(). Time-windowed leaderboards read only these rows.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='experience_rollups')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE)
+    day = models.DateField()
+    experience = models.IntegerField(default=0)
+    entries = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'topic', 'day'], name='unique_experience_rollup'),
+        ]
+        indexes = [
+            # Leaderboards for a window of days; covers the per-user sums
+            models.Index(fields=['day', 'user', 'experience'], name='rollup_day_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.topic.name} on {self.day}: {self.experience}"
+
+class RollupWatermark(models.Model):
+    """The last ledger id folded into ExperienceRollup, per rollup job."""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} - up to {self.last_id}"
+
+class UserTotalStats(models.Model):
+    """
+    Denormalized per-user XP total backing the leaderboard.
+    A row exists for every user with at least one UserTopicStats entry.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='total_stats')
+    total_experience = models.IntegerField(default=0)
+    topics_trained = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_experience'], name='usertotal_exp_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.total_experience} XP"
+
+class TopicStats(models.Model):
+    """
+    Denormalized per-topic counters backing the leaderboard.
+    """
+    topic = models.OneToOneField(Topic, on_delete=models.CASCADE, related_name='stats')
+    users_count = models.IntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-users_count'], name='topicstats_users_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.topic.name} - {self.users_count} users"
+
+class MigrationCheckpoint(models.Model):
+    """
+    How far migrate_to_postgres has copied a table. Rows live in the target
+    database and are written in the same transaction as each copied batch.
+    """
+    model = models.CharField(max_length=255, unique=True)
+    last_pk = models.CharField(max_length=255, null=True, blank=True)
+    rows_copied = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.model} - {self.rows_copied} rows"
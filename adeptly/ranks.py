@@ -0,0 +1,163 @@
+"""
+The rank ladder for topic experience.
+
+Each Rank row carries the minimum experience it needs. The whole ladder is
+loaded once into process memory as parallel threshold/id lists, so finding
+the rank for an experience total is a binary search with no queries. Like
+the sampling index, the cached ladder is tied to a version stamp in Django's
+cache; invalidate() bumps it whenever a Rank is saved or deleted.
+
+Changing thresholds doesn't move anyone by itself: rerank_all() (the
+rerank_users command) reassigns every UserTopicStats row to match.
+"""
+
+import bisect
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Rank, UserTopicStats
+from . import stats
+
+VERSION_CACHE_KEY = 'adeptly:rank-ladder-version'
+
+# (rank name, minimum experience) created when the ladder is missing them
+DEFAULT_LADDER = [
+    ('Beginner', 0),
+    ('Intermediate', 100),
+    ('Advanced', 500),
+    ('Expert', 1000),
+]
+
+_ladder = None
+_ladder_version = None
+_lock = threading.Lock()
+
+
+class Ladder:
+    """Ranks sorted by threshold, as parallel lists of thresholds, ids and names."""
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row[2], row[0]))
+        self.ids = [rank_id for rank_id, name, threshold in rows]
+        self.names = [name for rank_id, name, threshold in rows]
+        self.thresholds = [threshold for rank_id, name, threshold in rows]
+
+    @classmethod
+    def build(cls):
+        """Load the ladder, first creating any default ranks that are missing."""
+        rows = list(Rank.objects.values_list('id', 'name', 'threshold'))
+        names = {name for rank_id, name, threshold in rows}
+        missing = [Rank(name=name, threshold=threshold) for name, threshold in DEFAULT_LADDER if name not in names]
+        if missing:
+            # Another process may create the same ranks concurrently
+            Rank.objects.bulk_create(missing, ignore_conflicts=True)
+            rows = list(Rank.objects.values_list('id', 'name', 'threshold'))
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position_for(self, experience):
+        """Index of the highest rank `experience` reaches (the lowest rank if none)."""
+        return max(bisect.bisect_right(self.thresholds, experience) - 1, 0)
+
+    def rank_id_for(self, experience):
+        return self.ids[self.position_for(experience)]
+
+    def rank_name_for(self, experience):
+        return self.names[self.position_for(experience)]
+
+    def rank_case(self, experience_field, earned=0):
+        """
+        A CASE expression giving the rank id for the experience in
+        `experience_field` plus `earned`, for use in UPDATE statements.
+        """
+        return Case(
+            *[
+                When(**{f'{experience_field}__gte': threshold - earned}, then=Value(rank_id))
+                for threshold, rank_id in reversed(list(zip(self.thresholds, self.ids))[1:])
+            ],
+            default=Value(self.ids[0]),
+            output_field=IntegerField(),
+        )
+
+    def rank_case_sql(self, column):
+        """The same CASE as raw SQL over the experience in `column`, with its params."""
+        whens = []
+        params = []
+        for threshold, rank_id in reversed(list(zip(self.thresholds, self.ids))[1:]):
+            whens.append(f'WHEN {column} >= %s THEN %s')
+            params += [threshold, rank_id]
+        if not whens:
+            return '%s', [self.ids[0]]
+        return f'CASE {" ".join(whens)} ELSE %s END', params + [self.ids[0]]
+
+
+def _current_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY, 1)
+    return version
+
+
+def get_ladder():
+    """The process-local Ladder, reloaded if it has been invalidated."""
+    global _ladder, _ladder_version
+
+    version = _current_version()
+    if _ladder is not None and _ladder_version == version:
+        return _ladder
+
+    with _lock:
+        if _ladder is None or _ladder_version != version:
+            _ladder = Ladder.build()
+            _ladder_version = version
+        return _ladder
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, timeout=None)
+
+
+def invalidate():
+    """
+    Mark every process's ladder as stale.
+    The stamp is bumped immediately for readers in this transaction and
+    again on commit, so other processes can't cache pre-commit data.
+    """
+    global _ladder
+    _ladder = None
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+@transaction.atomic
+def rerank_all():
+    """
+    Move every UserTopicStats row to the rank its experience reaches, one
+    UPDATE per rank band, touching only rows whose rank changes.
+    Returns the number of rows updated.
+    """
+    ladder = get_ladder()
+    bounds = ladder.thresholds[1:] + [None]
+    changed = 0
+    user_ids = set()
+
+    for position, (rank_id, upper) in enumerate(zip(ladder.ids, bounds)):
+        rows = UserTopicStats.objects.exclude(rank_id=rank_id)
+        if position:
+            rows = rows.filter(experience__gte=ladder.thresholds[position])
+        if upper is not None:
+            rows = rows.filter(experience__lt=upper)
+        user_ids.update(rows.values_list('user_id', flat=True).distinct())
+        changed += rows.update(rank_id=rank_id)
+
+    stats.invalidate_user_summaries(user_ids)
+    return changed
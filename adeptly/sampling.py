@@ -0,0 +1,189 @@
+"""
+Random problem selection for training sessions.
+
+ProblemIndex buckets every problem id by (topic, difficulty) together with
+its estimated time to complete. Sampling draws k problems from the buckets
+matching a session's preferences in expected O(k), instead of sorting the
+whole matching set with ORDER BY RANDOM(). Each bucket is weighted by its
+size, so every (topic, problem) pair is equally likely to be drawn.
+
+The index lives in process memory and is rebuilt lazily when the version
+stamp in Django's cache changes; invalidate() bumps that stamp whenever
+problems or their topics change. Other processes only see the bump if the
+cache is shared between them (Redis or the database cache, see CACHES in
+the settings); with the local-memory cache each process has its own stamp.
+"""
+
+import bisect
+import itertools
+import random
+import threading
+from array import array
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Problem
+
+VERSION_CACHE_KEY = 'adeptly:problem-index-version'
+
+# Below this many candidate entries it's cheaper to shuffle the whole pool
+SHUFFLE_THRESHOLD = 1000
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+
+class ProblemIndex:
+    """
+    Problem ids grouped by (topic_id, difficulty).
+    Each bucket is a pair of parallel arrays: problem ids and estimated times.
+    """
+
+    def __init__(self, rows):
+        buckets = {}
+        for topic_id, difficulty, problem_id, estimated_time in rows:
+            ids, times = buckets.setdefault((topic_id, difficulty), (array('q'), array('l')))
+            ids.append(problem_id)
+            times.append(estimated_time)
+        self.buckets = buckets
+
+    @classmethod
+    def build(cls):
+        """Build the index from the problem/topic through table in one query."""
+        rows = Problem.topics.through.objects.values_list(
+            'topic_id', 'problem__difficulty', 'problem_id', 'problem__estimated_time_to_complete'
+        ).order_by('problem_id')
+        return cls(rows.iterator(chunk_size=10000))
+
+    def __len__(self):
+        return sum(len(ids) for ids, times in self.buckets.values())
+
+    def problem_ids(self, topic_ids):
+        """The set of problem ids covering any of `topic_ids`."""
+        topic_ids = set(topic_ids)
+        return {
+            problem_id
+            for (topic_id, difficulty), (ids, times) in self.buckets.items() if topic_id in topic_ids
+            for problem_id in ids
+        }
+
+    def sample(self, topic_ids, difficulties, time_budget, rng=random, exclude=()):
+        """
+        Pick random problems matching any of `topic_ids` and `difficulties`
+        whose estimated times add up to at most `time_budget` minutes,
+        skipping those in `exclude`. Returns a list of problem ids in the
+        order they should be served.
+        """
+        buckets = [
+            self.buckets[key]
+            for key in itertools.product(topic_ids, difficulties)
+            if key in self.buckets
+        ]
+        if not buckets:
+            return []
+
+        shortest = min(min(times) for ids, times in buckets)
+        cumulative = list(itertools.accumulate(len(ids) for ids, times in buckets))
+        total = cumulative[-1]
+
+        if total <= SHUFFLE_THRESHOLD or time_budget / max(shortest, 1) * 2 >= total:
+            return self._shuffle_pack(buckets, time_budget, rng, exclude)
+
+        selected = []
+        seen = set(exclude)
+        remaining = time_budget
+        misses = 0
+        # Give up once draws stop finding problems that fit the remaining time
+        max_misses = 50 + 4 * int(time_budget / max(shortest, 1))
+
+        while remaining >= shortest and misses < max_misses:
+            draw = rng.randrange(total)
+            bucket_number = bisect.bisect_right(cumulative, draw)
+            offset = draw - (cumulative[bucket_number - 1] if bucket_number else 0)
+            ids, times = buckets[bucket_number]
+            problem_id = ids[offset]
+
+            if problem_id in seen or times[offset] > remaining:
+                misses += 1
+                continue
+
+            seen.add(problem_id)
+            selected.append(problem_id)
+            remaining -= times[offset]
+
+        return selected
+
+    def _shuffle_pack(self, buckets, time_budget, rng, exclude=()):
+        """Shuffle the (small) candidate pool and pack it greedily."""
+        candidates = {}
+        for ids, times in buckets:
+            for problem_id, estimated_time in zip(ids, times):
+                candidates[problem_id] = estimated_time
+        for problem_id in exclude:
+            candidates.pop(problem_id, None)
+
+        problem_ids = list(candidates)
+        rng.shuffle(problem_ids)
+
+        selected = []
+        remaining = time_budget
+        for problem_id in problem_ids:
+            if candidates[problem_id] <= remaining:
+                selected.append(problem_id)
+                remaining -= candidates[problem_id]
+        return selected
+
+
+def _current_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY, 1)
+    return version
+
+
+def get_index():
+    """The process-local ProblemIndex, rebuilt if it has been invalidated."""
+    global _index, _index_version
+
+    version = _current_version()
+    if _index is not None and _index_version == version:
+        return _index
+
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = ProblemIndex.build()
+            _index_version = version
+        return _index
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, timeout=None)
+
+
+def invalidate():
+    """
+    Mark every process's index as stale.
+    The stamp is bumped immediately for readers in this transaction and
+    again on commit, so other processes can't cache pre-commit data.
+    """
+    global _index
+    _index = None
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+def select_problems(topic_ids, difficulties, time_budget, rng=random, exclude=()):
+    """Pick random problem ids for a new training session."""
+    return get_index().sample(
+        [int(topic_id) for topic_id in topic_ids],
+        [int(difficulty) for difficulty in difficulties],
+        time_budget,
+        rng=rng,
+        exclude=exclude,
+    )
@@ -0,0 +1,163 @@
+"""
+Full-text search over the problem bank.
+
+Problem names, prompts and answer choices are indexed in a side table,
+adeptly_problem_search, created by migration 0007:
+
+- on SQLite it is an FTS5 virtual table keyed by the problem id (rowid)
+  and ranked with bm25();
+- on PostgreSQL it holds a weighted tsvector per problem with a GIN index
+  and is ranked with ts_rank().
+
+Other databases fall back to icontains lookups. The signal handlers in
+signals.py keep the index current for ORM saves and deletes; code that
+writes problems in bulk should call index_problems() itself, and the
+rebuild_search_index command rebuilds it from scratch.
+"""
+
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Q
+
+from .models import Problem
+
+TABLE = 'adeptly_problem_search'
+
+# Most matches a single search returns
+MAX_RESULTS = 1000
+
+# Relative weight of the name, prompt and choices columns
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+
+FIELDS = ('id', 'name', 'prompt', 'choice_a', 'choice_b', 'choice_c', 'choice_d')
+
+BATCH_SIZE = 1000
+
+_word_re = re.compile(r'\w+')
+
+
+def is_supported(using=DEFAULT_DB_ALIAS):
+    """Whether the database has a full-text index for problems."""
+    return connections[using].vendor in ('sqlite', 'postgresql')
+
+
+def _documents(rows):
+    """(id, name, prompt, choices) tuples from Problem values_list rows."""
+    for problem_id, name, prompt, *choices in rows:
+        yield problem_id, name, prompt, ' '.join(choices)
+
+
+def _write(cursor, documents, replace=True):
+    if cursor.db.vendor == 'sqlite':
+        # FTS5 tables have no upsert, so replace rows explicitly
+        if replace:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(doc[0],) for doc in documents])
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, name, prompt, choices) VALUES (%s, %s, %s, %s)',
+            documents,
+        )
+    else:
+        cursor.executemany(
+            f"""
+            INSERT INTO {TABLE} (problem_id, document) VALUES (
+                %s,
+                setweight(to_tsvector('english', %s), 'A') ||
+                setweight(to_tsvector('english', %s), 'B') ||
+                setweight(to_tsvector('english', %s), 'C')
+            )
+            ON CONFLICT (problem_id) DO UPDATE SET document = EXCLUDED.document
+            """,
+            documents,
+        )
+
+
+def index_problems(problems):
+    """Add or refresh the index entries for `problems` (instances or ids)."""
+    if not is_supported():
+        return
+    problem_ids = [getattr(problem, 'pk', problem) for problem in problems]
+    rows = Problem.objects.filter(id__in=problem_ids).values_list(*FIELDS)
+    documents = list(_documents(rows))
+    if documents:
+        with connection.cursor() as cursor:
+            _write(cursor, documents)
+
+
+def remove_problems(problem_ids):
+    """Drop the index entries for `problem_ids`."""
+    if not is_supported():
+        return
+    column = 'rowid' if connection.vendor == 'sqlite' else 'problem_id'
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE {column} = %s', [(pk,) for pk in problem_ids])
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    """Rebuild the whole index from the problem table. Returns the row count."""
+    if not is_supported(using):
+        return 0
+    count = 0
+    batch = []
+    rows = Problem.objects.using(using).values_list(*FIELDS).order_by('id').iterator(chunk_size=BATCH_SIZE)
+    # One transaction, so SQLite doesn't commit every inserted document
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for document in _documents(rows):
+            batch.append(document)
+            if len(batch) >= BATCH_SIZE:
+                _write(cursor, batch, replace=False)
+                count += len(batch)
+                batch = []
+        if batch:
+            _write(cursor, batch, replace=False)
+            count += len(batch)
+        if connections[using].vendor == 'sqlite':
+            cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return count
+
+
+def _terms(query):
+    return _word_re.findall(query.lower())
+
+
+def search_ids(query, limit=MAX_RESULTS, within=None):
+    """
+    Ids of the problems matching every word of `query`, best match first.
+    Each word also matches as a prefix, so partial words find results.
+    `within`, a Problem queryset, restricts the matches to its rows before
+    they are ranked and cut off at `limit`.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    restrict, restrict_params = '', []
+    if within is not None and connection.vendor in ('sqlite', 'postgresql'):
+        subquery, restrict_params = within.order_by().values('id').query.sql_with_params()
+        column = 'rowid' if connection.vendor == 'sqlite' else 'problem_id'
+        restrict = f'AND {column} IN ({subquery}) '
+
+    if connection.vendor == 'sqlite':
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+        sql = (
+            f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s {restrict}'
+            f'ORDER BY bm25({TABLE}, {weights}), rowid LIMIT %s'
+        )
+    elif connection.vendor == 'postgresql':
+        match = ' & '.join(f'{term}:*' for term in terms)
+        sql = (
+            f"SELECT problem_id FROM {TABLE}, to_tsquery('english', %s) query "
+            f"WHERE document @@ query {restrict}ORDER BY ts_rank(document, query) DESC, problem_id LIMIT %s"
+        )
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(prompt__icontains=term)
+        problems = Problem.objects.all() if within is None else within
+        return list(problems.filter(condition).order_by('id').values_list('id', flat=True)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *restrict_params, limit])
+        return [row[0] for row in cursor.fetchall()]
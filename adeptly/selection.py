@@ -0,0 +1,300 @@
+"""
+Adaptive problem selection for training sessions.
+
+Every user has a queue of candidate problems (ProblemQueueEntry), each with
+a precomputed score:
+
+- UNSOLVED_BONUS for problems the user hasn't solved, REVIEW_BONUS for
+  solved ones, plus MISS_BONUS if the last answer was wrong;
+- the weakness (smoothed miss rate, 0-100) of the problem's weakest topic
+  for the user, from TopicMastery.
+
+Each entry also has a spaced-repetition due date. A correct answer pushes
+it out by FIRST_INTERVAL, doubling with every correct answer in a row up to
+MAX_INTERVAL; a wrong answer brings it back after RETRY_DELAY.
+
+record_outcome() keeps all of this up to date as part of grading, in a fixed
+number of statements: the topic counters are bumped in place, the answered
+entry is upserted and the scores of the user's entries in the answered
+topics are recomputed with one UPDATE. The first answer in a topic queues
+SEED_PER_TOPIC of its problems, picked from the sampling index.
+
+select_problems() then only reads: the best due entries matching the
+session's topics and difficulties come from one query on the (user, -score)
+index and are packed into the time available. Any time left over is filled
+by the random sampler, so new users and new problems still get served; a
+second query on the same index lists the entries that aren't due yet so the
+sampler skips them. Entries stay queued after they're served; answering
+them is what moves them.
+"""
+
+import random
+from collections import namedtuple
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connection, transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AnswerAttempt, Problem, ProblemQueueEntry, TopicMastery
+from . import attempts, sampling, solved
+
+# Score of a problem the user hasn't solved yet
+UNSOLVED_BONUS = 100
+
+# Score of a solved problem that has come due for review
+REVIEW_BONUS = 40
+
+# Added when the last answer to a problem was wrong
+MISS_BONUS = 50
+
+# Review intervals double with each correct answer in a row
+FIRST_INTERVAL = timedelta(days=1)
+MAX_INTERVAL = timedelta(days=60)
+
+# A missed problem comes back after this long
+RETRY_DELAY = timedelta(hours=1)
+
+# Problems queued from a topic when the user first answers in it
+SEED_PER_TOPIC = 20
+
+# Queue entries read when a session starts
+CANDIDATES = 100
+
+BATCH_SIZE = 1000
+
+Schedule = namedtuple('Schedule', ['streak', 'solved', 'due_at', 'base_score'])
+
+
+def weakness(attempts, misses):
+    """The smoothed miss rate as a percentage, as stored on TopicMastery."""
+    return (misses + 1) * 100 // (attempts + 2)
+
+
+def schedule(streak, was_solved, is_correct, answered_at):
+    """The Schedule of a queue entry after an answer."""
+    if is_correct:
+        interval = min(FIRST_INTERVAL * 2 ** min(streak, 16), MAX_INTERVAL)
+        return Schedule(streak + 1, True, answered_at + interval, REVIEW_BONUS)
+    base_score = (REVIEW_BONUS if was_solved else UNSOLVED_BONUS) + MISS_BONUS
+    return Schedule(0, was_solved, answered_at + RETRY_DELAY, base_score)
+
+
+def _seed_entry(user_id, problem_id, is_solved, now):
+    base_score = REVIEW_BONUS if is_solved else UNSOLVED_BONUS
+    return ProblemQueueEntry(
+        user_id=user_id, problem_id=problem_id, score=base_score, base_score=base_score,
+        solved=is_solved, due_at=now,
+    )
+
+
+def _seed_ids(index, topic_ids, exclude, rng):
+    candidates = sorted(index.problem_ids(topic_ids) - set(exclude))
+    return rng.sample(candidates, min(SEED_PER_TOPIC * len(topic_ids), len(candidates)))
+
+
+def _count_topics(user_id, topic_ids, is_correct):
+    """Count an answer in each of `topic_ids`. Returns the topics answered for the first time."""
+    TopicMastery.objects.bulk_create(
+        [TopicMastery(user_id=user_id, topic_id=topic_id) for topic_id in topic_ids], ignore_conflicts=True
+    )
+    miss = 0 if is_correct else 1
+    table = connection.ops.quote_name(TopicMastery._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET attempts = attempts + 1, misses = misses + %s, '
+            f'weakness = (misses + %s + 1) * 100 / (attempts + 3) '
+            f'WHERE user_id = %s AND topic_id IN ({", ".join(["%s"] * len(topic_ids))}) '
+            f'RETURNING topic_id, attempts',
+            [miss, miss, user_id, *topic_ids],
+        )
+        return [topic_id for topic_id, count in cursor.fetchall() if count == 1]
+
+
+def rescore(user_ids=None, topic_ids=None):
+    """
+    Recompute the score of the queue entries of `user_ids` for problems in
+    `topic_ids` (default: all of them) in one UPDATE. Returns the number of
+    entries updated.
+    """
+    problem_topics = Problem.topics.through.objects.filter(problem_id=OuterRef(OuterRef('problem_id')))
+    weakest = (
+        TopicMastery.objects.filter(user_id=OuterRef('user_id'), topic_id__in=problem_topics.values('topic_id'))
+        .order_by().values('user_id').annotate(weakest=Max('weakness')).values('weakest')
+    )
+    entries = ProblemQueueEntry.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    if topic_ids is not None:
+        entries = entries.filter(
+            problem_id__in=Problem.topics.through.objects.filter(topic_id__in=topic_ids).values('problem_id')
+        )
+    return entries.update(score=F('base_score') + Coalesce(Subquery(weakest, output_field=IntegerField()), 0))
+
+
+def record_outcome(user, problem, topic_ids, is_correct, now=None, rng=random):
+    """Update `user`'s mastery and queue after an answer to `problem`."""
+    now = now or timezone.now()
+
+    new_topic_ids = _count_topics(user.pk, topic_ids, is_correct) if topic_ids else []
+    if new_topic_ids:
+        solved_set = solved.get_solved_set(user.pk)
+        ProblemQueueEntry.objects.bulk_create([
+            _seed_entry(user.pk, problem_id, problem_id in solved_set, now)
+            for problem_id in _seed_ids(sampling.get_index(), new_topic_ids, [problem.pk], rng)
+        ], ignore_conflicts=True, batch_size=BATCH_SIZE)
+
+    previous = ProblemQueueEntry.objects.filter(user=user, problem=problem).values_list('streak', 'solved').first()
+    if previous is None:
+        previous = (0, not is_correct and problem.pk in solved.get_solved_set(user.pk))
+    plan = schedule(*previous, is_correct, now)
+    ProblemQueueEntry.objects.bulk_create(
+        [ProblemQueueEntry(
+            user_id=user.pk, problem_id=problem.pk, score=plan.base_score, base_score=plan.base_score,
+            streak=plan.streak, solved=plan.solved, due_at=plan.due_at, last_answered_at=now,
+        )],
+        update_conflicts=True, unique_fields=['user', 'problem'],
+        update_fields=['score', 'base_score', 'streak', 'solved', 'due_at', 'last_answered_at'],
+    )
+
+    if topic_ids:
+        rescore([user.pk], topic_ids)
+
+
+def select_problems(user, topic_ids, difficulties, time_budget, rng=random, now=None):
+    """
+    Pick problem ids for a new training session for `user`: their best due
+    queue entries first, topped up at random to fill `time_budget` minutes.
+    """
+    topic_ids = [int(topic_id) for topic_id in topic_ids]
+    difficulties = [int(difficulty) for difficulty in difficulties]
+    now = now or timezone.now()
+
+    entries = ProblemQueueEntry.objects.filter(
+        user=user,
+        problem__difficulty__in=difficulties,
+        problem_id__in=Problem.topics.through.objects.filter(topic_id__in=topic_ids).values('problem_id'),
+    )
+    candidates = (
+        entries.filter(due_at__lte=now)
+        .order_by('-score', 'due_at')
+        .values_list('problem_id', 'problem__estimated_time_to_complete')[:CANDIDATES]
+    )
+
+    selected = []
+    remaining = time_budget
+    for problem_id, estimated_time in candidates:
+        if estimated_time <= remaining:
+            selected.append(problem_id)
+            remaining -= estimated_time
+    if not remaining:
+        return selected
+
+    # The random top-up mustn't serve problems still waiting for their review date
+    not_due = list(entries.filter(due_at__gt=now).values_list('problem_id', flat=True))
+    return selected + sampling.select_problems(
+        topic_ids, difficulties, remaining, rng=rng, exclude=selected + not_due,
+    )
+
+
+def _user_entries(user_id, answers, solved_ids, topic_ids, index, rng, now):
+    """Queue entries for one user, from their answers in order."""
+    plans = {}
+    for problem_id, answer_group in groupby(answers, key=itemgetter(0)):
+        plan = answered_at = None
+        for problem_id, is_correct, answered_at in answer_group:
+            previous = (plan.streak, plan.solved) if plan else (0, problem_id in solved_ids)
+            plan = schedule(*previous, is_correct, answered_at)
+        plans[problem_id] = (plan, answered_at)
+
+    entries = [
+        ProblemQueueEntry(
+            user_id=user_id, problem_id=problem_id, score=plan.base_score, base_score=plan.base_score,
+            streak=plan.streak, solved=plan.solved, due_at=plan.due_at, last_answered_at=answered_at,
+        )
+        for problem_id, (plan, answered_at) in plans.items()
+    ]
+    unanswered_solved = solved_ids - plans.keys()
+    entries += [_seed_entry(user_id, problem_id, True, now) for problem_id in sorted(unanswered_solved)]
+    entries += [
+        _seed_entry(user_id, problem_id, problem_id in solved_ids, now)
+        for problem_id in _seed_ids(index, topic_ids, plans.keys() | unanswered_solved, rng)
+    ]
+    return entries
+
+
+@transaction.atomic
+def rebuild(user_ids=None, now=None, rng=random):
+    """
+    Recompute the topic mastery and queues of `user_ids` (default: every
+    user) from the attempt log and solved problems, e.g. after a bulk load.
+    Returns the number of queue entries written.
+    """
+    now = now or timezone.now()
+    attempts.buffer.flush()
+
+    log = AnswerAttempt.objects.all()
+    solved_by = Problem.solved_by.through.objects.all()
+    mastery = TopicMastery.objects.all()
+    queue = ProblemQueueEntry.objects.all()
+    if user_ids is not None:
+        log, solved_by, mastery, queue = (
+            rows.filter(user_id__in=user_ids) for rows in (log, solved_by, mastery, queue)
+        )
+    mastery.delete()
+    queue.delete()
+
+    topics_by_user = {}
+    rows = (
+        log.filter(problem__topics__isnull=False)
+        .values('user_id', topic_id=F('problem__topics'))
+        .annotate(attempts=Count('id'), misses=Count('id', filter=Q(is_correct=False)))
+        .order_by()
+    )
+    new_mastery = []
+    for row in rows:
+        topics_by_user.setdefault(row['user_id'], []).append(row['topic_id'])
+        new_mastery.append(TopicMastery(
+            user_id=row['user_id'], topic_id=row['topic_id'], attempts=row['attempts'], misses=row['misses'],
+            weakness=weakness(row['attempts'], row['misses']),
+        ))
+    TopicMastery.objects.bulk_create(new_mastery, batch_size=BATCH_SIZE)
+
+    solved_by_user = {}
+    for user_id, problem_id in solved_by.values_list('user_id', 'problem_id').iterator(chunk_size=10000):
+        solved_by_user.setdefault(user_id, set()).add(problem_id)
+
+    index = sampling.get_index()
+    answers = (
+        log.order_by('user_id', 'problem_id', 'answered_at', 'id')
+        .values_list('user_id', 'problem_id', 'is_correct', 'answered_at')
+        .iterator(chunk_size=10000)
+    )
+    pending = []
+    written = 0
+    seen = set()
+
+    def write(entries):
+        nonlocal pending, written
+        pending += entries
+        if len(pending) >= BATCH_SIZE:
+            ProblemQueueEntry.objects.bulk_create(pending, batch_size=BATCH_SIZE)
+            written += len(pending)
+            pending = []
+
+    for user_id, rows in groupby(answers, key=itemgetter(0)):
+        seen.add(user_id)
+        write(_user_entries(
+            user_id, (row[1:] for row in rows), solved_by_user.get(user_id, set()),
+            topics_by_user.get(user_id, []), index, rng, now,
+        ))
+    for user_id in sorted(solved_by_user.keys() - seen):
+        write(_user_entries(user_id, [], solved_by_user[user_id], [], index, rng, now))
+
+    ProblemQueueEntry.objects.bulk_create(pending, batch_size=BATCH_SIZE)
+    written += len(pending)
+    rescore(user_ids)
+    return written
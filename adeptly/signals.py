@@ -0,0 +1,160 @@
+"""
+Signal handlers that keep Adeptly's denormalized tables in sync.
+"""
+
+from django.core.signals import request_finished
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Rank, Topic, TopicStats, UserTopicStats, TrainingSession, SessionProblem, Problem
+from . import attempts, leaderboard, ranks, sampling, search, solved, stats
+
+
+@receiver(post_save, sender=UserTopicStats)
+def user_topic_stats_saved(sender, instance, created, raw=False, **kwargs):
+    """Refresh the leaderboard rows affected by a saved UserTopicStats."""
+    if raw:
+        # Fixture loading; the leaderboard is rebuilt separately
+        return
+    leaderboard.refresh_user(instance.user_id)
+    if created:
+        leaderboard.refresh_topics([instance.topic_id])
+    stats.invalidate_user_summary(instance.user_id)
+
+
+@receiver(post_delete, sender=UserTopicStats)
+def user_topic_stats_deleted(sender, instance, **kwargs):
+    """Refresh the leaderboard rows affected by a deleted UserTopicStats."""
+    leaderboard.refresh_user(instance.user_id)
+    leaderboard.refresh_topics([instance.topic_id], create=False)
+    stats.invalidate_user_summary(instance.user_id)
+
+
+@receiver(post_save, sender=Topic)
+def topic_saved(sender, instance, created, raw=False, **kwargs):
+    """Give new topics an empty leaderboard row so later updates are increments."""
+    if created and not raw:
+        TopicStats.objects.get_or_create(topic_id=instance.pk)
+
+
+def sync_session_items(session_ids):
+    """
+    Rebuild SessionProblem rows so they match the sessions' `problems` M2M.
+    Problems that are still present keep their relative order and newly
+    added ones are appended in the order they were added.
+    """
+    ProblemsThrough = TrainingSession.problems.through
+    
+    for session_id in session_ids:
+        ordered = list(
+            SessionProblem.objects.filter(session_id=session_id)
+            .order_by('position').values_list('problem_id', flat=True)
+        )
+        current = list(
+            ProblemsThrough.objects.filter(trainingsession_id=session_id)
+            .order_by('id').values_list('problem_id', flat=True)
+        )
+        current_set = set(current)
+        problem_ids = [problem_id for problem_id in ordered if problem_id in current_set]
+        kept = set(problem_ids)
+        problem_ids += [problem_id for problem_id in current if problem_id not in kept]
+        
+        SessionProblem.objects.filter(session_id=session_id).delete()
+        SessionProblem.objects.bulk_create([
+            SessionProblem(session_id=session_id, problem_id=problem_id, position=position)
+            for position, problem_id in enumerate(problem_ids)
+        ])
+        TrainingSession.objects.filter(id=session_id).update(total_problems=len(problem_ids))
+
+
+@receiver(m2m_changed, sender=TrainingSession.problems.through)
+def session_problems_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the ordered SessionProblem rows in step with `session.problems` edits."""
+    if reverse:
+        # instance is a Problem; work out which sessions are affected
+        if action == 'pre_clear':
+            instance._cleared_session_ids = list(
+                sender.objects.filter(problem_id=instance.pk).values_list('trainingsession_id', flat=True)
+            )
+            return
+        if action == 'post_clear':
+            session_ids = getattr(instance, '_cleared_session_ids', [])
+        elif action in ('post_add', 'post_remove'):
+            session_ids = pk_set
+        else:
+            return
+    else:
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        session_ids = [instance.pk]
+    
+    sync_session_items(session_ids)
+    
+    if not reverse:
+        instance.total_problems = sender.objects.filter(trainingsession_id=instance.pk).count()
+
+
+@receiver(post_save, sender=Rank)
+@receiver(post_delete, sender=Rank)
+def rank_changed(sender, **kwargs):
+    """Reload the cached rank ladder after any rank edit."""
+    ranks.invalidate()
+
+
+@receiver(post_save, sender=Problem)
+@receiver(post_delete, sender=Problem)
+def problem_changed(sender, raw=False, **kwargs):
+    """Problems feed the sampling index; rebuild it on the next session start."""
+    if not raw:
+        sampling.invalidate()
+
+
+@receiver(post_save, sender=Problem)
+def problem_saved_search(sender, instance, raw=False, **kwargs):
+    """Re-index a saved problem's text for full-text search."""
+    if raw:
+        # Fixture loading; the index is rebuilt separately
+        return
+    search.index_problems([instance])
+
+
+@receiver(post_delete, sender=Problem)
+def problem_deleted_search(sender, instance, **kwargs):
+    """Drop a deleted problem from the search index."""
+    search.remove_problems([instance.pk])
+
+
+@receiver(m2m_changed, sender=Problem.topics.through)
+def problem_topics_changed(sender, action, **kwargs):
+    """Topic assignments feed the sampling index too."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        sampling.invalidate()
+
+
+@receiver(m2m_changed, sender=Problem.solved_by.through)
+def problem_solvers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep solve counts and cached solved sets in step with `solved_by` edits."""
+    if action == 'pre_clear':
+        owner, other = ('user_id', 'problem_id') if reverse else ('problem_id', 'user_id')
+        instance._cleared_solver_ids = list(
+            sender.objects.filter(**{owner: instance.pk}).values_list(other, flat=True)
+        )
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_solver_ids', [])
+    elif action not in ('post_add', 'post_remove'):
+        return
+    
+    if reverse:
+        # instance is a User and pk_set holds problem ids
+        problem_ids, user_ids = pk_set, [instance.pk]
+    else:
+        problem_ids, user_ids = [instance.pk], pk_set
+    solved.recount(problem_ids)
+    solved.invalidate_solved_sets(user_ids)
+
+
+@receiver(request_finished)
+def request_finished_flush_attempts(sender, **kwargs):
+    """Write queued answer attempts that have waited long enough, even if no new answer arrives."""
+    attempts.buffer.flush_if_old()
@@ -0,0 +1,92 @@
+"""
+Which problems each user has solved, and how often each problem is solved.
+
+Problem.solve_count (distinct users who solved it) and attempt_count
+(answers submitted) are denormalized counters bumped in the database by the
+grading code, so listings can show solve rates without counting rows.
+
+A user's solved problems are kept as a SolvedSet: a sorted array of problem
+ids, built in one indexed query and cached in Django's cache. Membership is
+a binary search and the size is the array length, so a page of problems can
+show its solved badges with at most one query, and none once cached. The
+cached set is dropped whenever the user solves something new.
+"""
+
+import bisect
+from array import array
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Problem
+
+SOLVED_SET_CACHE_KEY = 'adeptly:solved-set:{user_id}'
+SOLVED_SET_TIMEOUT = 60 * 60
+
+
+class SolvedSet:
+    """An immutable set of problem ids backed by a sorted array."""
+
+    def __init__(self, problem_ids=()):
+        self.ids = array('q', sorted(set(problem_ids)))
+
+    def __contains__(self, problem_id):
+        index = bisect.bisect_left(self.ids, problem_id)
+        return index < len(self.ids) and self.ids[index] == problem_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def count_in(self, problem_ids):
+        """How many of `problem_ids` are in the set."""
+        return sum(problem_id in self for problem_id in set(problem_ids))
+
+
+def build_solved_set(user_id):
+    """A user's SolvedSet, read from the (user_id, problem_id) index."""
+    return SolvedSet(
+        Problem.solved_by.through.objects.filter(user_id=user_id)
+        .order_by('problem_id').values_list('problem_id', flat=True)
+    )
+
+
+def get_solved_set(user_id):
+    """A user's SolvedSet, from the cache when possible."""
+    key = SOLVED_SET_CACHE_KEY.format(user_id=user_id)
+    solved = cache.get(key)
+    if solved is None:
+        solved = build_solved_set(user_id)
+        cache.set(key, solved, SOLVED_SET_TIMEOUT)
+    return solved
+
+
+def _drop(user_ids):
+    cache.delete_many([SOLVED_SET_CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+def invalidate_solved_sets(user_ids):
+    """
+    Drop users' cached solved sets after they change. They are dropped
+    again on commit, so a set rebuilt from pre-commit data doesn't stick.
+    """
+    user_ids = list(user_ids)
+    _drop(user_ids)
+    transaction.on_commit(lambda: _drop(user_ids))
+
+
+def recount(problem_ids=None):
+    """
+    Recompute solve_count from the solved-by table, for `problem_ids` or
+    every problem, in one UPDATE. Returns the number of problems updated.
+    """
+    problems = Problem.objects.all() if problem_ids is None else Problem.objects.filter(id__in=problem_ids)
+    solvers = (
+        Problem.solved_by.through.objects.filter(problem_id=OuterRef('pk'))
+        .order_by().values('problem_id').annotate(count=Count('user_id')).values('count')
+    )
+    return problems.update(solve_count=Coalesce(Subquery(solvers, output_field=IntegerField()), 0))
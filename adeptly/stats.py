@@ -0,0 +1,209 @@
+"""
+Per-user and per-session statistics shown across Adeptly pages.
+
+User summaries are cached in Django's cache framework and invalidated
+whenever a user's XP changes, so pages that show them don't re-query on
+every render. Session results are computed once when a session completes
+and stored as a TrainingSessionSummary row.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Func, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    User, Problem, SessionProblem, TopicExperienceEarned, TrainingSession, TrainingSessionSummary,
+    UserTopicStats, UserTotalStats,
+)
+
+USER_SUMMARY_CACHE_KEY = 'adeptly:user-summary:{user_id}'
+USER_SUMMARY_TIMEOUT = 60 * 15
+
+# Cached summaries dropped per cache call
+INVALIDATE_BATCH_SIZE = 1000
+
+
+def build_user_summary(user_id):
+    """Build a user's summary with a single joined query."""
+    top_topics = list(
+        UserTopicStats.objects.filter(user_id=user_id)
+        .select_related('topic', 'rank')
+        .order_by('-experience')[:3]
+    )
+    return {
+        'top_topics': top_topics,
+    }
+
+
+def get_user_summary(user_id):
+    """A user's summary, from the cache when possible."""
+    key = USER_SUMMARY_CACHE_KEY.format(user_id=user_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_user_summary(user_id)
+        cache.set(key, summary, USER_SUMMARY_TIMEOUT)
+    return summary
+
+
+def _drop_user_summaries(user_ids):
+    for start in range(0, len(user_ids), INVALIDATE_BATCH_SIZE):
+        cache.delete_many([
+            USER_SUMMARY_CACHE_KEY.format(user_id=user_id)
+            for user_id in user_ids[start:start + INVALIDATE_BATCH_SIZE]
+        ])
+
+
+def invalidate_user_summaries(user_ids):
+    """
+    Drop users' cached summaries after their XP changes, in one cache call
+    per INVALIDATE_BATCH_SIZE users. They are dropped again on commit, so a
+    summary rebuilt from pre-commit data doesn't stick.
+    """
+    user_ids = list(user_ids)
+    _drop_user_summaries(user_ids)
+    transaction.on_commit(lambda: _drop_user_summaries(user_ids))
+
+
+def invalidate_user_summary(user_id):
+    """Drop a user's cached summary after their XP changes."""
+    invalidate_user_summaries([user_id])
+
+
+def _count(queryset):
+    """A correlated COUNT(*) subquery over `queryset`."""
+    return Subquery(
+        queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count'),
+        output_field=IntegerField(),
+    )
+
+
+def get_dashboard_stats(user):
+    """
+    The headline numbers on a user's dashboard.
+
+    Totals come from the materialized UserTotalStats row and the overall rank
+    is the number of users with a higher indexed total, so the whole snapshot
+    is one query regardless of how many users there are. Recent sessions are
+    fetched separately.
+    """
+    totals = UserTotalStats.objects.filter(user_id=OuterRef('pk'))
+    snapshot = User.objects.filter(pk=user.pk).annotate(
+        total_experience=Coalesce(Subquery(totals.values('total_experience')[:1]), 0),
+        topics_trained=Coalesce(Subquery(totals.values('topics_trained')[:1]), 0),
+        problems_solved=_count(Problem.solved_by.through.objects.filter(user_id=OuterRef('pk'))),
+        users_above=_count(UserTotalStats.objects.filter(total_experience__gt=OuterRef('total_experience'))),
+    ).values('total_experience', 'topics_trained', 'problems_solved', 'users_above').get()
+
+    return {
+        'total_experience': snapshot['total_experience'],
+        'topics_trained': snapshot['topics_trained'],
+        'problems_solved': snapshot['problems_solved'],
+        'rank': snapshot['users_above'] + 1,
+        'recent_sessions': recent_sessions(user),
+    }
+
+
+def recent_sessions(user, limit=5):
+    """A user's latest sessions, each with its summary loaded."""
+    sessions = list(user.training_sessions.select_related('summary').order_by('-created_at')[:limit])
+    for session in sessions:
+        # Sessions completed before summaries existed get one on first view
+        if session.was_completed and not hasattr(session, 'summary'):
+            save_session_summary(session)
+    return sessions
+
+
+def _percentage(part, whole):
+    return part / whole * 100 if whole else 0
+
+
+def summarize_session(session, problems, completed, experience, topics_covered):
+    """
+    An unsaved TrainingSessionSummary from already fetched data: `problems`
+    are (id, name, topic names) in session order, `completed` the ids solved
+    and `experience` the XP earned per topic name.
+    """
+    topics = {}
+    problem_rows = []
+    for problem_id, name, topic_names in problems:
+        topic_names = sorted(topic_names)
+        correct = problem_id in completed
+        problem_rows.append({'name': name, 'correct': correct, 'topics': topic_names})
+        for topic_name in topic_names:
+            topic = topics.setdefault(topic_name, {'name': topic_name, 'experience': 0, 'problems': 0, 'solved': 0})
+            topic['problems'] += 1
+            topic['solved'] += correct
+    for topic_name, total in experience.items():
+        topics.setdefault(topic_name, {'name': topic_name, 'experience': 0, 'problems': 0, 'solved': 0})['experience'] = total
+    for topic in topics.values():
+        topic['accuracy'] = _percentage(topic['solved'], topic['problems'])
+
+    time_spent = session.completed_at - session.created_at if session.completed_at else None
+    return TrainingSessionSummary(
+        session=session,
+        total_problems=session.total_problems,
+        problems_completed=len(completed),
+        correct_attempts=session.correct_attempts,
+        incorrect_attempts=session.incorrect_attempts,
+        accuracy=_percentage(session.correct_attempts, session.total_problems),
+        total_experience=sum(experience.values()),
+        time_spent=int(time_spent.total_seconds()) if time_spent else 0,
+        topics_covered=topics_covered,
+        topics=sorted(topics.values(), key=lambda topic: (-topic['experience'], topic['name'])),
+        problems=problem_rows,
+    )
+
+
+def build_session_summary(session):
+    """An unsaved TrainingSessionSummary for `session`."""
+    items = (
+        SessionProblem.objects.filter(session=session).order_by('position')
+        .select_related('problem').prefetch_related('problem__topics')
+    )
+    completed = set(
+        TrainingSession.problems_completed.through.objects.filter(trainingsession_id=session.pk)
+        .values_list('problem_id', flat=True)
+    )
+    experience = dict(
+        TopicExperienceEarned.objects.filter(training_session=session)
+        .values('topic__name').annotate(total=Sum('experience_earned'))
+        .values_list('topic__name', 'total')
+    )
+    problems = [
+        (item.problem_id, item.problem.name, [topic.name for topic in item.problem.topics.all()])
+        for item in items
+    ]
+    return summarize_session(session, problems, completed, experience, session.topics_covered.count())
+
+
+def save_session_summary(session):
+    """Build and store the summary of `session`, replacing any earlier one."""
+    summary = build_session_summary(session)
+    summary.save()
+    return summary
+
+
+@transaction.atomic
+def complete_session(session):
+    """Mark `session` completed and store its summary."""
+    session.was_completed = True
+    session.completed_at = timezone.now()
+    # Only write the completion fields so concurrent counter updates aren't overwritten
+    session.save(update_fields=['was_completed', 'completed_at'])
+    return save_session_summary(session)
+
+
+def get_session_summary(session):
+    """
+    The stored summary of `session`. Completed sessions without one get it
+    stored now; sessions still in progress get an unsaved, current summary.
+    """
+    try:
+        return session.summary
+    except TrainingSessionSummary.DoesNotExist:
+        pass
+    if session.was_completed:
+        return save_session_summary(session)
+    return build_session_summary(session)
@@ -1,12 +1,26 @@
-from django.test import TestCase, Client
+import logging
+
+from django.test import TestCase, TransactionTestCase, Client, LiveServerTestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 
-from adeptly.models import Topic, Rank, Problem, UserTopicStats, TrainingSession, TopicExperienceEarned
+from adeptly.models import Topic, Rank, Problem, UserTopicStats, TrainingSession, TopicExperienceEarned, UserTotalStats, TopicStats, SessionProblem
 from adeptly.forms import ProblemForm, TrainingPreferencesForm, RegistrationForm
 
+# Several tests make deliberately slow or repetitive requests; keep their
+# request_metrics warnings out of the test output. assertLogs() still sees them.
+metrics_logger = logging.getLogger('request_metrics')
+
+def setUpModule():
+    global metrics_level
+    metrics_level = metrics_logger.level
+    metrics_logger.setLevel(logging.CRITICAL)
+
+def tearDownModule():
+    metrics_logger.setLevel(metrics_level)
+
 class ModelTests(TestCase):
     """Tests for the Adeptly data models"""
     
@@ -285,6 +299,335 @@ class LeaderboardTests(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class MaterializedLeaderboardTests(TestCase):
+    """Tests for the materialized leaderboard tables"""
+    
+    def setUp(self):
+        """Set up users with topic stats across two topics"""
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.user2 = User.objects.create_user(username='user2', password='password2')
+        self.rank = Rank.objects.create(name='Beginner')
+        self.topic_hvac = Topic.objects.create(name='HVAC Design')
+        self.topic_electrical = Topic.objects.create(name='Electrical Design')
+        
+        self.user1_hvac = UserTopicStats.objects.create(
+            user=self.user1, topic=self.topic_hvac, experience=200, rank=self.rank
+        )
+        UserTopicStats.objects.create(
+            user=self.user1, topic=self.topic_electrical, experience=150, rank=self.rank
+        )
+        UserTopicStats.objects.create(
+            user=self.user2, topic=self.topic_hvac, experience=100, rank=self.rank
+        )
+        
+        self.client = Client()
+    
+    def test_totals_follow_topic_stats(self):
+        """Test that saving and deleting UserTopicStats updates the totals"""
+        self.assertEqual(UserTotalStats.objects.get(user=self.user1).total_experience, 350)
+        self.assertEqual(UserTotalStats.objects.get(user=self.user1).topics_trained, 2)
+        self.assertEqual(TopicStats.objects.get(topic=self.topic_hvac).users_count, 2)
+        self.assertEqual(TopicStats.objects.get(topic=self.topic_electrical).users_count, 1)
+        
+        self.user1_hvac.experience = 50
+        self.user1_hvac.save()
+        self.assertEqual(UserTotalStats.objects.get(user=self.user1).total_experience, 200)
+        
+        self.user1_hvac.delete()
+        self.assertEqual(UserTotalStats.objects.get(user=self.user1).topics_trained, 1)
+        self.assertEqual(TopicStats.objects.get(topic=self.topic_hvac).users_count, 1)
+        
+        UserTopicStats.objects.filter(user=self.user2).delete()
+        self.assertFalse(UserTotalStats.objects.filter(user=self.user2).exists())
+    
+    def test_leaderboard_context(self):
+        """Test that the leaderboard view reads its stats from the materialized tables"""
+        self.client.login(username='user2', password='password2')
+        response = self.client.get(reverse('leaderboard'), {'topic': self.topic_hvac.id})
+        
+        self.assertEqual([u.username for u in response.context['overall_leaderboard']], ['user1', 'user2'])
+        self.assertEqual(response.context['overall_leaderboard'][0].total_experience, 350)
+        self.assertEqual(response.context['user_rank'], 2)
+        self.assertEqual(response.context['user_topic_rank'], 2)
+        self.assertEqual(response.context['total_users_with_exp'], 2)
+        self.assertEqual(response.context['most_popular_topic'], 'HVAC Design')
+        self.assertEqual(response.context['top_exp'], 350)
+    
+    def test_leaderboard_query_count_is_constant(self):
+        """Test that adding users doesn't add queries to the leaderboard"""
+        self.client.login(username='user1', password='password1')
+        url = reverse('leaderboard')
+        self.client.get(url)
+        
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        
+        for i in range(10):
+            user = User.objects.create_user(username=f'extra{i}', password='password')
+            UserTopicStats.objects.create(user=user, topic=self.topic_hvac, experience=i * 10, rank=self.rank)
+        
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        
+        self.assertEqual(len(before), len(after))
+    
+    def test_check_leaderboard_command(self):
+        """Test that the consistency check detects and repairs drift"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        
+        out = StringIO()
+        call_command('check_leaderboard', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+        
+        # Simulate drift by bypassing the signal handlers
+        UserTopicStats.objects.filter(user=self.user2).update(experience=999)
+        with self.assertRaises(CommandError):
+            call_command('check_leaderboard', stdout=StringIO())
+        
+        call_command('check_leaderboard', '--repair', stdout=StringIO())
+        self.assertEqual(UserTotalStats.objects.get(user=self.user2).total_experience, 999)
+        call_command('check_leaderboard', stdout=StringIO())
+
+
+class ExperienceRollupTests(TestCase):
+    """Tests for the XP ledger rollups and the windowed leaderboards"""
+    
+    def setUp(self):
+        """Set up two users with ledger entries spread over a few weeks"""
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.user2 = User.objects.create_user(username='user2', password='password2')
+        self.topic = Topic.objects.create(name='HVAC Design')
+        self.problem = Problem.objects.create(
+            name="Problem", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+            correct_answer="A", estimated_time_to_complete=5, difficulty=2,
+        )
+        self.session = TrainingSession.objects.create(user=self.user1, estimated_time_to_complete=30)
+        self.now = timezone.now()
+        
+        # user2 leads all time, user1 leads this week
+        for user, days_ago, experience in [
+            (self.user1, 0, 30), (self.user1, 0, 20), (self.user2, 0, 10),
+            (self.user2, 40, 500), (self.user1, 40, 5),
+        ]:
+            self.earn(user, experience, self.now - timedelta(days=days_ago))
+    
+    def earn(self, user, experience, earned_at):
+        entry = TopicExperienceEarned.objects.create(
+            user=user, topic=self.topic, experience_earned=experience,
+            training_session=self.session, problem=self.problem,
+        )
+        # auto_now_add ignores the value passed in
+        TopicExperienceEarned.objects.filter(pk=entry.pk).update(earned_at=earned_at)
+    
+    def test_roll_up(self):
+        """Test that ledger rows are summed per user, topic and day"""
+        from adeptly import ledger
+        from adeptly.models import ExperienceRollup
+        
+        result = ledger.roll_up(settle=0)
+        
+        self.assertEqual((result.entries, result.rollups), (5, 4))
+        today = ExperienceRollup.objects.get(user=self.user1, day=self.now.date())
+        self.assertEqual((today.experience, today.entries), (50, 2))
+    
+    def test_roll_up_is_incremental_and_idempotent(self):
+        """Test that a re-run only folds in rows past the watermark"""
+        from django.db.models import Sum
+        from adeptly import ledger
+        from adeptly.models import ExperienceRollup
+        
+        ledger.roll_up(settle=0)
+        self.assertEqual(ledger.roll_up(settle=0).entries, 0)
+        
+        self.earn(self.user1, 7, self.now)
+        result = ledger.roll_up(settle=0)
+        
+        self.assertEqual((result.entries, result.rollups), (1, 1))
+        self.assertEqual(ExperienceRollup.objects.get(user=self.user1, day=self.now.date()).experience, 57)
+        self.assertEqual(
+            ExperienceRollup.objects.aggregate(total=Sum('experience'))['total'],
+            TopicExperienceEarned.objects.aggregate(total=Sum('experience_earned'))['total'],
+        )
+    
+    def test_unsettled_rows_wait(self):
+        """Test that recent rows, and every row after them, wait for the next run"""
+        from adeptly import ledger
+        
+        entries = TopicExperienceEarned.objects.order_by('id')
+        entries.update(earned_at=self.now - timedelta(days=1))
+        TopicExperienceEarned.objects.filter(pk=entries[3].pk).update(earned_at=self.now)
+        
+        self.assertEqual(ledger.roll_up(settle=60).entries, 3)
+        self.assertEqual(ledger.roll_up(settle=None).entries, 2)
+    
+    def test_ledger_is_append_only(self):
+        """Test that a recorded ledger entry can't be saved again"""
+        entry = TopicExperienceEarned.objects.first()
+        entry.experience_earned = 1000
+        
+        with self.assertRaises(ValueError):
+            entry.save()
+    
+    def test_windowed_leaderboards(self):
+        """Test that this week's leaderboard reads the rollups of this week only"""
+        from adeptly import leaderboard, ledger
+        
+        ledger.roll_up(settle=0)
+        start = leaderboard.period_start('week', self.now.date())
+        
+        with self.assertNumQueries(2):
+            leaders = leaderboard.top_users_since(start)
+        self.assertEqual([(user, user.total_experience) for user in leaders], [(self.user1, 50), (self.user2, 10)])
+        self.assertEqual(leaderboard.user_rank_since(self.user2, start), 2)
+        self.assertIsNone(leaderboard.user_rank_since(self.user2, self.now.date() + timedelta(days=1)))
+    
+    def test_period_start(self):
+        """Test the first day of each leaderboard period"""
+        from datetime import date
+        from adeptly import leaderboard
+        
+        today = date(2026, 10, 15)  # a Thursday
+        self.assertEqual(leaderboard.period_start('week', today), date(2026, 10, 12))
+        self.assertEqual(leaderboard.period_start('month', today), date(2026, 10, 1))
+        self.assertIsNone(leaderboard.period_start('all', today))
+    
+    def test_leaderboard_view_period(self):
+        """Test that ?period= switches the overall leaderboard"""
+        from adeptly import ledger
+        
+        ledger.roll_up(settle=0)
+        client = Client()
+        client.login(username='user1', password='password1')
+        
+        response = client.get(reverse('leaderboard'), {'period': 'week'})
+        self.assertEqual(list(response.context['overall_leaderboard']), [self.user1, self.user2])
+        self.assertEqual(response.context['user_rank'], 1)
+        
+        response = client.get(reverse('leaderboard'), {'period': 'bogus'})
+        self.assertEqual(response.context['period'], 'all')
+    
+    def test_command(self):
+        """Test that the command reports what it rolled up and can rebuild"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        out = StringIO()
+        call_command('rollup_experience', settle=0, stdout=out)
+        self.assertIn('Rolled up 5 ledger rows into 4 rollups', out.getvalue())
+        
+        out = StringIO()
+        call_command('rollup_experience', rebuild=True, stdout=out)
+        self.assertIn('Rolled up 5 ledger rows into 4 rollups', out.getvalue())
+
+
+class RecomputeTopicStatsTests(TestCase):
+    """Tests for recomputing UserTopicStats from the XP ledger"""
+    
+    def setUp(self):
+        """Set up a ledger and topic stats that have drifted from it"""
+        from adeptly import ranks
+        ranks.invalidate()
+        self.ladder = ranks.get_ladder()
+        self.users = [User.objects.create_user(username=f'user{i}', password='password') for i in range(3)]
+        self.topics = [Topic.objects.create(name=f'Topic {i}') for i in range(2)]
+        problem = Problem.objects.create(
+            name="Problem", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+            correct_answer="A", estimated_time_to_complete=5, difficulty=2,
+        )
+        session = TrainingSession.objects.create(user=self.users[0], estimated_time_to_complete=30)
+        for user, topic, experience in [
+            (self.users[0], self.topics[0], 60), (self.users[0], self.topics[0], 60),
+            (self.users[0], self.topics[1], 20), (self.users[1], self.topics[0], 500),
+        ]:
+            TopicExperienceEarned.objects.create(
+                user=user, topic=topic, experience_earned=experience, training_session=session, problem=problem,
+            )
+        
+        beginner = self.ladder.rank_id_for(0)
+        # In sync
+        UserTopicStats.objects.create(user=self.users[0], topic=self.topics[1], experience=20, rank_id=beginner)
+        # Lost an update, and with it a promotion
+        UserTopicStats.objects.create(user=self.users[0], topic=self.topics[0], experience=60, rank_id=beginner)
+        # users[1] has no row for its ledger XP; users[2] has XP the ledger doesn't
+        UserTopicStats.objects.create(user=self.users[2], topic=self.topics[1], experience=300, rank_id=beginner)
+    
+    def stats(self):
+        return set(UserTopicStats.objects.values_list('user__username', 'topic__name', 'experience', 'rank__name'))
+    
+    def test_drift(self):
+        """Test that drift lists every row that disagrees with the ledger"""
+        from adeptly import ledger
+        
+        drift = ledger.topic_stats_drift(self.users[0].id, self.users[2].id)
+        
+        self.assertEqual(
+            [(row.user_id, row.topic_id, row.expected_experience, row.actual_experience) for row in drift],
+            [
+                (self.users[0].id, self.topics[0].id, 120, 60),
+                (self.users[1].id, self.topics[0].id, 500, None),
+                (self.users[2].id, self.topics[1].id, 0, 300),
+            ],
+        )
+        self.assertEqual(drift[1].expected_rank_id, self.ladder.rank_id_for(500))
+    
+    def test_recompute_in_chunks(self):
+        """Test that chunked recomputes repair every user and leave a consistent leaderboard"""
+        from io import StringIO
+        from django.core.management import call_command
+        from adeptly import leaderboard
+        
+        out = StringIO()
+        call_command('rebuild_topic_stats', chunk_size=1, stdout=out)
+        
+        self.assertIn('3 rows changed', out.getvalue())
+        self.assertEqual(self.stats(), {
+            ('user0', 'Topic 0', 120, 'Intermediate'),
+            ('user0', 'Topic 1', 20, 'Beginner'),
+            ('user1', 'Topic 0', 500, 'Advanced'),
+            ('user2', 'Topic 1', 0, 'Beginner'),
+        })
+        self.assertEqual(leaderboard.find_discrepancies(), [])
+        
+        out = StringIO()
+        call_command('rebuild_topic_stats', stdout=out)
+        self.assertIn('0 rows changed', out.getvalue())
+    
+    def test_dry_run(self):
+        """Test that a dry run prints the changes without making them"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        before = self.stats()
+        out = StringIO()
+        call_command('rebuild_topic_stats', dry_run=True, stdout=out)
+        
+        self.assertIn(f'user {self.users[1].id} topic {self.topics[0].id}: missing -> 500 XP (Advanced)', out.getvalue())
+        self.assertIn('3 topic stats differ', out.getvalue())
+        self.assertEqual(self.stats(), before)
+    
+    def test_dry_run_with_a_rank_missing_from_the_ladder(self):
+        """Test that a drift row whose rank isn't on the loaded ladder is listed by id rather than crashing"""
+        from io import StringIO
+        from unittest import mock
+        from django.core.management import call_command
+        from adeptly import ledger
+        
+        drift = ledger.topic_stats_drift
+        def drift_with_unknown_rank(first, last):
+            return [row._replace(expected_rank_id=None) for row in drift(first, last)]
+        
+        UserTopicStats.objects.filter(user=self.users[0], topic=self.topics[1]).update(experience=10)
+        out = StringIO()
+        with mock.patch.object(ledger, 'topic_stats_drift', drift_with_unknown_rank):
+            call_command('rebuild_topic_stats', dry_run=True, stdout=out)
+        
+        self.assertIn(f'user {self.users[0].id} topic {self.topics[1].id}: 10 XP (Beginner) -> 20 XP (None)', out.getvalue())
+
+
 class ViewTests(TestCase):
     """Tests for the Adeptly views"""
     
@@ -466,6 +809,2326 @@ class TrainingFlowTests(TestCase):
         self.assertTrue(self.problem1 in self.user.solved_problems.all())
 
 
+class GradingServiceTests(TestCase):
+    """Tests for the answer grading service"""
+    
+    def setUp(self):
+        """Set up a user, a session and problems with one and many topics"""
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.rank_beginner = Rank.objects.create(name='Beginner')
+        self.topics = [Topic.objects.create(name=f'Topic {i}') for i in range(5)]
+        
+        self.single_topic_problem = self.create_problem('Single Topic', self.topics[:1])
+        self.multi_topic_problem = self.create_problem('Multi Topic', self.topics)
+        
+        self.session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=15)
+        self.session.problems.add(self.single_topic_problem, self.multi_topic_problem)
+    
+    def create_problem(self, name, topics, difficulty=2):
+        problem = Problem.objects.create(
+            name=name,
+            prompt="What is the correct answer?",
+            choice_a="Wrong", choice_b="Right", choice_c="Wrong", choice_d="Wrong",
+            correct_answer="B",
+            estimated_time_to_complete=5,
+            difficulty=difficulty
+        )
+        problem.topics.add(*topics)
+        return problem
+    
+    def test_correct_answer_awards_experience(self):
+        """Test that a correct answer updates the ledger, stats and solved state"""
+        from adeptly.grading import record_answer
+        
+        result = record_answer(self.user, self.session, self.multi_topic_problem, 'B')
+        
+        self.assertTrue(result.is_correct)
+        self.assertTrue(result.newly_solved)
+        self.assertEqual(result.experience_earned, 100)
+        self.assertEqual(TopicExperienceEarned.objects.filter(training_session=self.session).count(), 5)
+        self.assertEqual(UserTopicStats.objects.filter(user=self.user, experience=20).count(), 5)
+        self.assertTrue(self.user.solved_problems.filter(id=self.multi_topic_problem.id).exists())
+        self.assertTrue(self.session.problems_completed.filter(id=self.multi_topic_problem.id).exists())
+        self.assertEqual(UserTotalStats.objects.get(user=self.user).total_experience, 100)
+        self.assertEqual(UserTotalStats.objects.get(user=self.user).topics_trained, 5)
+        
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.correct_attempts, 1)
+        
+        # Solving it again doesn't mark it newly solved but still awards XP
+        result = record_answer(self.user, self.session, self.multi_topic_problem, 'B')
+        self.assertFalse(result.newly_solved)
+        self.assertEqual(UserTopicStats.objects.filter(user=self.user, experience=40).count(), 5)
+    
+    def test_incorrect_answer(self):
+        """Test that an incorrect answer only bumps the session counter"""
+        from adeptly.grading import record_answer
+        
+        result = record_answer(self.user, self.session, self.single_topic_problem, 'A')
+        
+        self.assertFalse(result.is_correct)
+        self.assertEqual(result.experience_earned, 0)
+        self.assertFalse(TopicExperienceEarned.objects.exists())
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.incorrect_attempts, 1)
+        self.assertEqual(self.session.correct_attempts, 0)
+    
+    def test_rank_promotion(self):
+        """Test that crossing a threshold promotes the rank in the same update"""
+        from adeptly.grading import record_answer
+        
+        UserTopicStats.objects.create(user=self.user, topic=self.topics[0], experience=490, rank=self.rank_beginner)
+        record_answer(self.user, self.session, self.single_topic_problem, 'B')
+        
+        stat = UserTopicStats.objects.get(user=self.user, topic=self.topics[0])
+        self.assertEqual(stat.experience, 510)
+        self.assertEqual(stat.rank.name, 'Advanced')
+        self.assertEqual(UserTotalStats.objects.get(user=self.user).total_experience, 510)
+    
+    def test_query_count_independent_of_topic_count(self):
+        """Test that grading a five-topic problem costs the same queries as a one-topic problem"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from adeptly import ranks, sampling
+        from adeptly.grading import record_answer
+        
+        # Load the rank ladder and sampling index up front so neither answer pays for loading them
+        ranks.get_ladder()
+        sampling.get_index()
+        other_user = User.objects.create_user(username='otheruser', password='otherpassword')
+        
+        with CaptureQueriesContext(connection) as single:
+            record_answer(self.user, self.session, self.single_topic_problem, 'B')
+        with CaptureQueriesContext(connection) as multi:
+            record_answer(other_user, self.session, self.multi_topic_problem, 'B')
+        
+        self.assertEqual(len(single), len(multi))
+
+
+class RankLadderTests(TestCase):
+    """Tests for the cached, data-driven rank ladder"""
+    
+    def setUp(self):
+        from adeptly import ranks
+        ranks.invalidate()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.topic = Topic.objects.create(name='HVAC Design')
+    
+    def test_default_ladder(self):
+        """Test that missing default ranks are created and looked up by binary search"""
+        from adeptly import ranks
+        
+        ladder = ranks.get_ladder()
+        
+        self.assertEqual(ladder.names, ['Beginner', 'Intermediate', 'Advanced', 'Expert'])
+        self.assertEqual(
+            [ladder.rank_name_for(experience) for experience in (-5, 0, 99, 100, 499, 500, 999, 1000, 10 ** 6)],
+            ['Beginner', 'Beginner', 'Beginner', 'Intermediate', 'Intermediate', 'Advanced', 'Advanced',
+             'Expert', 'Expert'],
+        )
+    
+    def test_cached_until_a_rank_changes(self):
+        """Test that the ladder costs no queries once loaded and reloads after an edit"""
+        from adeptly import ranks
+        
+        ranks.get_ladder()
+        with self.assertNumQueries(0):
+            ranks.get_ladder()
+        
+        Rank.objects.create(name='Master', threshold=5000)
+        
+        self.assertEqual(ranks.get_ladder().rank_name_for(6000), 'Master')
+    
+    def test_grading_uses_edited_thresholds(self):
+        """Test that answers promote against the thresholds stored on Rank"""
+        from adeptly.grading import award_experience
+        
+        Rank.objects.create(name='Intermediate', threshold=10)
+        session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=30)
+        problem = Problem.objects.create(
+            name="Problem", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+            correct_answer="A", estimated_time_to_complete=5, difficulty=2,
+        )
+        
+        award_experience(self.user, session, problem, [self.topic.id], 20)
+        
+        self.assertEqual(UserTopicStats.objects.get(user=self.user).rank.name, 'Intermediate')
+    
+    def test_rerank_users_command(self):
+        """Test that the command moves stats to the ranks their experience reaches"""
+        from io import StringIO
+        from django.core.management import call_command
+        from adeptly import ranks
+        
+        ladder = ranks.get_ladder()
+        topics = [self.topic] + [Topic.objects.create(name=f'Topic {i}') for i in range(3)]
+        for topic, experience in zip(topics, (50, 150, 600, 2000)):
+            UserTopicStats.objects.create(
+                user=self.user, topic=topic, experience=experience, rank_id=ladder.rank_id_for(0)
+            )
+        Rank.objects.filter(name='Advanced').update(threshold=140)
+        ranks.invalidate()
+        
+        out = StringIO()
+        call_command('rerank_users', stdout=out)
+        
+        self.assertIn('Re-ranked 3 topic stats', out.getvalue())
+        self.assertEqual(
+            list(UserTopicStats.objects.filter(user=self.user).order_by('experience').values_list('rank__name', flat=True)),
+            ['Beginner', 'Advanced', 'Advanced', 'Expert'],
+        )
+        
+        out = StringIO()
+        call_command('rerank_users', stdout=out)
+        self.assertIn('Re-ranked 0 topic stats', out.getvalue())
+    
+    def test_rerank_drops_changed_summaries(self):
+        """Test that re-ranking drops the cached summaries of the users it moved, and only theirs"""
+        from django.core.cache import cache
+        from adeptly import ranks, stats
+        
+        ladder = ranks.get_ladder()
+        users = [self.user] + [User.objects.create_user(username=f'user{i}', password='x') for i in range(3)]
+        for user, experience in zip(users, (50, 150, 600, 2000)):
+            UserTopicStats.objects.create(user=user, topic=self.topic, experience=experience, rank_id=ladder.rank_id_for(0))
+            stats.get_user_summary(user.pk)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            ranks.rerank_all()
+        
+        cached = [cache.get(stats.USER_SUMMARY_CACHE_KEY.format(user_id=user.pk)) is not None for user in users]
+        self.assertEqual(cached, [True, False, False, False])
+
+
+class ConcurrentGradingTests(TransactionTestCase):
+    """Stress tests that fire answers from several threads at once"""
+    
+    THREADS = 8
+    ANSWERS = 10
+    
+    def setUp(self):
+        from adeptly import ranks
+        ranks.invalidate()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.topics = [Topic.objects.create(name=f'Topic {i}') for i in range(3)]
+        self.problem = Problem.objects.create(
+            name="Problem", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+            correct_answer="A", estimated_time_to_complete=5, difficulty=2,
+        )
+        self.problem.topics.add(*self.topics)
+        self.session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=30)
+    
+    def tearDown(self):
+        # Write the queued attempts before the tables are flushed
+        from adeptly import attempts
+        attempts.buffer.flush()
+    
+    def submit_in_parallel(self, answers):
+        """Record each answer in `answers` from THREADS threads, each with its own connection"""
+        import threading
+        from django.db import OperationalError, connection
+        from adeptly.grading import record_answer
+        
+        errors = []
+        results = []
+        start = threading.Barrier(self.THREADS)
+        
+        def worker(number):
+            session = TrainingSession.objects.get(pk=self.session.pk)
+            start.wait()
+            try:
+                for answer in answers[number::self.THREADS]:
+                    while True:
+                        try:
+                            results.append(record_answer(self.user, session, self.problem, answer))
+                            break
+                        except OperationalError as e:
+                            # SQLite allows one writer at a time; retry the whole transaction
+                            if 'locked' not in str(e):
+                                raise
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        return results
+    
+    def test_no_lost_experience(self):
+        """Test that parallel correct answers each add their XP exactly once"""
+        results = self.submit_in_parallel(['A'] * self.THREADS * self.ANSWERS)
+        
+        answers = self.THREADS * self.ANSWERS
+        self.assertEqual(len(results), answers)
+        self.assertEqual(sum(result.newly_solved for result in results), 1)
+        self.assertEqual(UserTopicStats.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            set(UserTopicStats.objects.filter(user=self.user).values_list('experience', flat=True)),
+            {answers * 20},
+        )
+        self.assertEqual(TopicExperienceEarned.objects.filter(user=self.user).count(), answers * 3)
+        total = UserTotalStats.objects.get(user=self.user)
+        self.assertEqual((total.total_experience, total.topics_trained), (answers * 60, 3))
+        self.assertEqual(
+            list(TopicStats.objects.filter(topic__in=self.topics).values_list('users_count', flat=True)),
+            [1, 1, 1],
+        )
+    
+    def test_no_lost_attempts(self):
+        """Test that parallel right and wrong answers are all counted on the session"""
+        self.submit_in_parallel(['A', 'B'] * (self.THREADS * self.ANSWERS // 2))
+        
+        self.session.refresh_from_db()
+        half = self.THREADS * self.ANSWERS // 2
+        self.assertEqual((self.session.correct_attempts, self.session.incorrect_attempts), (half, half))
+        self.problem.refresh_from_db()
+        self.assertEqual((self.problem.solve_count, self.problem.attempt_count), (1, half * 2))
+
+
+class SolvedSetTests(TestCase):
+    """Tests for problem solve counters and per-user solved sets"""
+    
+    def setUp(self):
+        """Set up two users, a session and a handful of problems"""
+        from django.core.cache import cache
+        from adeptly import ranks
+        cache.clear()
+        ranks.invalidate()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.other_user = User.objects.create_user(username='otheruser', password='otherpassword')
+        self.topic = Topic.objects.create(name='Topic')
+        self.problems = []
+        for i in range(5):
+            problem = Problem.objects.create(
+                name=f'Problem {i}', prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+                correct_answer="A", estimated_time_to_complete=5, difficulty=2,
+            )
+            problem.topics.add(self.topic)
+            self.problems.append(problem)
+        self.session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=30)
+    
+    def test_solved_set_membership(self):
+        """Test membership, size and iteration order of a solved set"""
+        from adeptly.solved import SolvedSet
+        
+        solved_set = SolvedSet([9, 3, 7, 3])
+        self.assertEqual(len(solved_set), 3)
+        self.assertEqual(list(solved_set), [3, 7, 9])
+        self.assertIn(7, solved_set)
+        self.assertNotIn(8, solved_set)
+        self.assertNotIn(10, solved_set)
+        self.assertEqual(solved_set.count_in([3, 4, 9, 9]), 2)
+        self.assertEqual(len(SolvedSet()), 0)
+    
+    def test_grading_maintains_counters(self):
+        """Test that answers bump attempt_count and first solves bump solve_count"""
+        from adeptly.grading import record_answer
+        
+        problem = self.problems[0]
+        other_session = TrainingSession.objects.create(user=self.other_user, estimated_time_to_complete=30)
+        record_answer(self.user, self.session, problem, 'B')
+        record_answer(self.user, self.session, problem, 'A')
+        record_answer(self.user, self.session, problem, 'A')
+        record_answer(self.other_user, other_session, problem, 'A')
+        
+        problem.refresh_from_db()
+        self.assertEqual((problem.solve_count, problem.attempt_count), (2, 4))
+    
+    def test_cached_set_follows_solves(self):
+        """Test that the cached solved set is rebuilt after the user solves a problem"""
+        from adeptly import solved
+        from adeptly.grading import record_answer
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(len(solved.get_solved_set(self.user.pk)), 0)
+        with self.assertNumQueries(0):
+            solved.get_solved_set(self.user.pk)
+        
+        record_answer(self.user, self.session, self.problems[2], 'A')
+        solved_set = solved.get_solved_set(self.user.pk)
+        self.assertEqual(list(solved_set), [self.problems[2].pk])
+    
+    def test_solved_by_edits_recount(self):
+        """Test that editing solved_by directly keeps counts and cached sets in step"""
+        from adeptly import solved
+        
+        self.assertEqual(len(solved.get_solved_set(self.user.pk)), 0)
+        self.problems[0].solved_by.add(self.user, self.other_user)
+        self.user.solved_problems.add(self.problems[1])
+        self.assertEqual(len(solved.get_solved_set(self.user.pk)), 2)
+        
+        self.problems[0].refresh_from_db()
+        self.assertEqual(self.problems[0].solve_count, 2)
+        
+        self.user.solved_problems.clear()
+        self.assertEqual(len(solved.get_solved_set(self.user.pk)), 0)
+        self.assertEqual(
+            list(Problem.objects.filter(pk__in=[self.problems[0].pk, self.problems[1].pk])
+                 .order_by('pk').values_list('solve_count', flat=True)),
+            [1, 0],
+        )
+    
+    def test_problem_list_marks_solved(self):
+        """Test that the problem list marks the user's solved problems and their counts"""
+        self.problems[1].solved_by.add(self.user)
+        self.client.force_login(self.user)
+        
+        response = self.client.get(reverse('problem-list') + '?format=json')
+        problems = {problem['id']: problem for problem in response.json()['problems']}
+        self.assertTrue(problems[self.problems[1].pk]['is_solved'])
+        self.assertFalse(problems[self.problems[0].pk]['is_solved'])
+        self.assertEqual(problems[self.problems[1].pk]['solve_count'], 1)
+        self.assertEqual(response.json()['solved_total'], 1)
+
+
+class AnswerAttemptTests(TestCase):
+    """Tests for the buffered answer log and the analytics read from it"""
+    
+    def setUp(self):
+        """Set up a user, a session and problems in two topics"""
+        from adeptly import attempts, ranks
+        attempts.buffer.clear()
+        ranks.invalidate()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.topics = [Topic.objects.create(name=f'Topic {i}') for i in range(2)]
+        self.problems = []
+        for i, topic in enumerate(self.topics * 2):
+            problem = Problem.objects.create(
+                name=f'Problem {i}', prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+                correct_answer="A", estimated_time_to_complete=5, difficulty=3,
+            )
+            problem.topics.add(topic)
+            self.problems.append(problem)
+        self.session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=30)
+        self.session.set_problems([problem.id for problem in self.problems])
+    
+    def log(self, problem, *outcomes):
+        """Write an attempt for each of `outcomes` (True for a right answer)"""
+        from adeptly.models import AnswerAttempt
+        AnswerAttempt.objects.bulk_create([
+            AnswerAttempt(
+                user=self.user, problem=problem, training_session=self.session,
+                selected_answer='A' if correct else 'B', is_correct=correct, elapsed_ms=1000,
+            )
+            for correct in outcomes
+        ])
+    
+    def test_attempts_are_queued_until_commit(self):
+        """Test that graded answers are queued on commit and written in one flush"""
+        from adeptly import attempts
+        from adeptly.grading import record_answer
+        from adeptly.models import AnswerAttempt
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            record_answer(self.user, self.session, self.problems[0], 'A', elapsed_ms=1500)
+            record_answer(self.user, self.session, self.problems[1], 'C')
+            self.assertEqual(len(attempts.buffer), 0)
+        
+        self.assertEqual(len(attempts.buffer), 2)
+        self.assertFalse(AnswerAttempt.objects.exists())
+        self.assertEqual(attempts.buffer.flush(), 2)
+        self.assertEqual(
+            list(AnswerAttempt.objects.order_by('id').values_list('problem_id', 'selected_answer', 'is_correct', 'elapsed_ms')),
+            [(self.problems[0].id, 'A', True, 1500), (self.problems[1].id, 'C', False, None)],
+        )
+    
+    def test_full_buffer_flushes(self):
+        """Test that a buffer writes its attempts once it reaches its size"""
+        from adeptly.attempts import AttemptBuffer
+        from adeptly.models import AnswerAttempt
+        
+        buffer = AttemptBuffer(size=3, max_age=60)
+        for problem in self.problems[:3]:
+            buffer.add(AnswerAttempt(
+                user=self.user, problem=problem, training_session=self.session, selected_answer='A', is_correct=True,
+            ))
+        
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(AnswerAttempt.objects.count(), 3)
+    
+    def test_failed_flush_is_logged_not_raised(self):
+        """Test that a batch the database refuses doesn't fail the caller that triggered the write"""
+        from adeptly.attempts import AttemptBuffer
+        from adeptly.models import AnswerAttempt
+        
+        buffer = AttemptBuffer(size=2, max_age=60)
+        buffer.add(AnswerAttempt(
+            user=self.user, problem=self.problems[0], training_session=self.session, selected_answer='A', is_correct=True,
+        ))
+        with self.assertLogs('adeptly.attempts', level='ERROR') as logs:
+            # NOT NULL violation, which the retry without missing parents hits again
+            buffer.add(AnswerAttempt(
+                user=self.user, problem=self.problems[1], training_session=self.session, selected_answer='A', is_correct=None,
+            ))
+        
+        self.assertIn('Could not write 2 queued answer attempts', logs.output[0])
+        self.assertEqual(len(buffer), 0)
+        self.assertFalse(AnswerAttempt.objects.exists())
+        
+    def test_old_buffer_flushes_at_request_end(self):
+        """Test that queued attempts are written after a request once they've waited max_age seconds"""
+        from adeptly import attempts
+        from adeptly.models import AnswerAttempt
+        
+        attempts.buffer.add(AnswerAttempt(
+            user=self.user, problem=self.problems[0], training_session=self.session, selected_answer='A', is_correct=True,
+        ))
+        self.client.get(reverse('login'))
+        self.assertEqual(len(attempts.buffer), 1)
+        
+        attempts.buffer.oldest -= attempts.buffer.max_age
+        self.client.get(reverse('login'))
+        self.assertEqual(len(attempts.buffer), 0)
+        self.assertEqual(AnswerAttempt.objects.count(), 1)
+        
+    def test_shown_token(self):
+        """Test that time on a problem is only measured from a matching, untampered token"""
+        from adeptly import attempts
+        
+        token = attempts.shown_token(self.session.id, self.problems[0].id)
+        self.assertGreaterEqual(attempts.elapsed_ms(token, self.session.id, self.problems[0].id), 0)
+        self.assertIsNone(attempts.elapsed_ms(token, self.session.id, self.problems[1].id))
+        self.assertIsNone(attempts.elapsed_ms(token + 'x', self.session.id, self.problems[0].id))
+        self.assertIsNone(attempts.elapsed_ms('', self.session.id, self.problems[0].id))
+    
+    def test_training_problem_records_time(self):
+        """Test that answering through the view logs the choice and the time taken"""
+        from adeptly import attempts
+        from adeptly.models import AnswerAttempt
+        
+        self.client.force_login(self.user)
+        url = reverse('training_problem', kwargs={'session_id': self.session.id, 'problem_index': 0})
+        shown = self.client.get(url).context['shown_token']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'answer': 'D', 'shown': shown})
+        attempts.buffer.flush()
+        
+        attempt = AnswerAttempt.objects.get()
+        self.assertEqual((attempt.problem_id, attempt.selected_answer, attempt.is_correct), (self.problems[0].id, 'D', False))
+        self.assertIsNotNone(attempt.elapsed_ms)
+    
+    def test_problem_calibration(self):
+        """Test accuracy and suggested difficulty per problem"""
+        from adeptly import attempts
+        
+        self.log(self.problems[0], *[True] * 9, False)
+        self.log(self.problems[1], True, False, False, False, False)
+        self.log(self.problems[2], True, True)
+        
+        with self.assertNumQueries(1):
+            calibrations = attempts.problem_calibration()
+        self.assertEqual(
+            [(c.problem_id, c.attempts, c.correct, c.suggested_difficulty) for c in calibrations],
+            [(self.problems[1].id, 5, 1, 5), (self.problems[0].id, 10, 9, 1)],
+        )
+        self.assertEqual(calibrations[0].difficulty, 3)
+        self.assertEqual(calibrations[0].avg_correct_ms, 1000)
+    
+    def test_weak_topics(self):
+        """Test that a user's topics are ranked by accuracy, weakest first"""
+        from adeptly import attempts
+        
+        # Topic 0 through problems 0 and 2, topic 1 through problems 1 and 3
+        self.log(self.problems[0], True, True, True)
+        self.log(self.problems[2], True, False)
+        self.log(self.problems[1], False, False, True)
+        self.log(self.problems[3], False, True)
+        
+        with self.assertNumQueries(1):
+            weaknesses = attempts.weak_topics(self.user.id)
+        self.assertEqual(
+            [(w.topic_id, w.attempts, w.misses) for w in weaknesses],
+            [(self.topics[1].id, 5, 3), (self.topics[0].id, 5, 1)],
+        )
+        self.assertEqual(attempts.weak_topics(self.user.id, min_attempts=6), [])
+        self.assertEqual(len(attempts.weak_topics(self.user.id, limit=1)), 1)
+
+
+class AdaptiveSelectionTests(TestCase):
+    """Tests for per-user mastery, problem queues and adaptive session selection"""
+    
+    def setUp(self):
+        """Set up a user, a session and two topics of problems"""
+        from django.core.cache import cache
+        from adeptly import attempts, ranks, sampling
+        cache.clear()
+        ranks.invalidate()
+        sampling.invalidate()
+        attempts.buffer.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.topics = [Topic.objects.create(name=f'Topic {i}') for i in range(2)]
+        self.problems = {topic.id: [] for topic in self.topics}
+        for topic in self.topics:
+            for i in range(30):
+                problem = Problem.objects.create(
+                    name=f'{topic.name} problem {i}', prompt="?", choice_a="A", choice_b="B", choice_c="C",
+                    choice_d="D", correct_answer="A", estimated_time_to_complete=5, difficulty=3,
+                )
+                problem.topics.add(topic)
+                self.problems[topic.id].append(problem)
+        self.session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=30)
+    
+    def tearDown(self):
+        # Queued attempts point at rows this test's rollback removes
+        from adeptly import attempts
+        attempts.buffer.clear()
+    
+    def answer(self, problem, answer):
+        from adeptly.grading import record_answer
+        with self.captureOnCommitCallbacks(execute=True):
+            record_answer(self.user, self.session, problem, answer)
+    
+    def test_schedule(self):
+        """Test that review intervals double with each right answer and misses come back soon"""
+        from adeptly import selection
+        
+        now = timezone.now()
+        plan = selection.schedule(0, False, True, now)
+        self.assertEqual((plan.streak, plan.solved, plan.due_at), (1, True, now + selection.FIRST_INTERVAL))
+        plan = selection.schedule(plan.streak, plan.solved, True, now)
+        self.assertEqual(plan.due_at, now + selection.FIRST_INTERVAL * 2)
+        self.assertEqual(selection.schedule(30, True, True, now).due_at, now + selection.MAX_INTERVAL)
+        
+        plan = selection.schedule(3, True, False, now)
+        self.assertEqual((plan.streak, plan.solved, plan.due_at), (0, True, now + selection.RETRY_DELAY))
+        self.assertEqual(plan.base_score, selection.REVIEW_BONUS + selection.MISS_BONUS)
+        self.assertEqual(
+            selection.schedule(0, False, False, now).base_score, selection.UNSOLVED_BONUS + selection.MISS_BONUS
+        )
+    
+    def test_first_answer_seeds_the_queue(self):
+        """Test that answering in a new topic records mastery and queues problems from it"""
+        from adeptly import selection
+        from adeptly.models import ProblemQueueEntry, TopicMastery
+        
+        problem = self.problems[self.topics[0].id][0]
+        self.answer(problem, 'B')
+        
+        mastery = TopicMastery.objects.get(user=self.user)
+        self.assertEqual((mastery.topic_id, mastery.attempts, mastery.misses, mastery.weakness), (self.topics[0].id, 1, 1, 66))
+        queue = ProblemQueueEntry.objects.filter(user=self.user)
+        self.assertEqual(queue.count(), selection.SEED_PER_TOPIC + 1)
+        self.assertFalse(queue.exclude(problem__topics=self.topics[0]).exists())
+        
+        entry = queue.get(problem=problem)
+        self.assertEqual((entry.streak, entry.solved), (0, False))
+        self.assertEqual(entry.score, selection.UNSOLVED_BONUS + selection.MISS_BONUS + 66)
+        self.assertGreater(entry.due_at, timezone.now())
+        self.assertEqual(set(queue.exclude(problem=problem).values_list('score', flat=True)), {selection.UNSOLVED_BONUS + 66})
+    
+    def test_weak_topics_score_higher(self):
+        """Test that misses in one topic lift its queued problems above a stronger topic's"""
+        from adeptly.models import ProblemQueueEntry
+        
+        strong, weak = self.topics
+        for problem in self.problems[strong.id][:3]:
+            self.answer(problem, 'A')
+        for problem in self.problems[weak.id][:3]:
+            self.answer(problem, 'C')
+        
+        queue = ProblemQueueEntry.objects.filter(user=self.user, solved=False, last_answered_at__isnull=True)
+        strong_scores = set(queue.filter(problem__topics=strong).values_list('score', flat=True))
+        weak_scores = set(queue.filter(problem__topics=weak).values_list('score', flat=True))
+        self.assertGreater(min(weak_scores), max(strong_scores))
+    
+    def test_session_start_reads_the_queue(self):
+        """Test that sessions take the best due entries in one query and skip problems not yet due"""
+        from adeptly import sampling, selection
+        
+        topic = self.topics[0]
+        solved_problem, missed_problem = self.problems[topic.id][:2]
+        self.answer(solved_problem, 'A')
+        self.answer(missed_problem, 'B')
+        sampling.get_index()
+        
+        with self.assertNumQueries(1):
+            problem_ids = selection.select_problems(self.user, [topic.id], [3], 20)
+        self.assertEqual(len(problem_ids), 4)
+        self.assertNotIn(solved_problem.id, problem_ids)
+        self.assertNotIn(missed_problem.id, problem_ids)
+        
+        # Once the retry delay has passed the missed problem comes first
+        later = timezone.now() + selection.RETRY_DELAY + timedelta(minutes=1)
+        problem_ids = selection.select_problems(self.user, [topic.id], [3], 20, now=later)
+        self.assertEqual(problem_ids[0], missed_problem.id)
+        self.assertNotIn(solved_problem.id, problem_ids)
+        
+        # Difficulties the user didn't ask for are never served
+        self.assertEqual(selection.select_problems(self.user, [topic.id], [5], 20), [])
+    
+    def test_top_up_skips_problems_not_yet_due(self):
+        """Test that the random top-up doesn't serve a solved problem again before it's due"""
+        from adeptly import sampling, selection
+        
+        topic = self.topics[0]
+        solved_problem = self.problems[topic.id][0]
+        self.answer(solved_problem, 'A')
+        sampling.get_index()
+        
+        # A budget big enough for every problem in the topic forces a top-up
+        problem_ids = selection.select_problems(self.user, [topic.id], [3], 5 * 30)
+        self.assertEqual(len(problem_ids), 29)
+        self.assertNotIn(solved_problem.id, problem_ids)
+        
+        # Once it's due it's served again
+        later = timezone.now() + selection.FIRST_INTERVAL + timedelta(minutes=1)
+        problem_ids = selection.select_problems(self.user, [topic.id], [3], 5 * 30, now=later)
+        self.assertIn(solved_problem.id, problem_ids)
+        
+    def test_new_user_falls_back_to_sampling(self):
+        """Test that a user with no queue still gets a full session"""
+        from adeptly import selection
+        
+        other_user = User.objects.create_user(username='otheruser', password='otherpassword')
+        problem_ids = selection.select_problems(other_user, [topic.id for topic in self.topics], [3], 30)
+        self.assertEqual(len(problem_ids), 6)
+        self.assertEqual(len(set(problem_ids)), 6)
+    
+    def test_rebuild_matches_incremental_updates(self):
+        """Test that rebuilding from the answer log gives the same mastery and answered entries"""
+        from adeptly import attempts, selection
+        from adeptly.models import ProblemQueueEntry, TopicMastery
+        
+        first, second = self.topics
+        for problem, answer in [
+            (self.problems[first.id][0], 'A'), (self.problems[first.id][0], 'A'),
+            (self.problems[first.id][1], 'B'), (self.problems[second.id][0], 'C'),
+            (self.problems[second.id][0], 'A'), (self.problems[first.id][1], 'A'),
+        ]:
+            self.answer(problem, answer)
+        attempts.buffer.flush()
+        
+        def snapshot():
+            return (
+                sorted(TopicMastery.objects.values_list('user_id', 'topic_id', 'attempts', 'misses', 'weakness')),
+                sorted(ProblemQueueEntry.objects.filter(last_answered_at__isnull=False)
+                       .values_list('problem_id', 'score', 'base_score', 'streak', 'solved')),
+            )
+        
+        before = snapshot()
+        written = selection.rebuild()
+        self.assertEqual(snapshot(), before)
+        self.assertEqual(written, ProblemQueueEntry.objects.count())
+        self.assertEqual(
+            ProblemQueueEntry.objects.filter(last_answered_at__isnull=True).count(), selection.SEED_PER_TOPIC * 2,
+        )
+
+
+class SessionProblemOrderTests(TestCase):
+    """Tests for the ordered per-session problem list"""
+    
+    def setUp(self):
+        """Set up a user and a bank of problems"""
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.topic = Topic.objects.create(name='HVAC Design')
+        self.problems = []
+        for i in range(6):
+            problem = Problem.objects.create(
+                name=f"Problem {i}",
+                prompt="What is the correct answer?",
+                choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+                correct_answer="A",
+                estimated_time_to_complete=5,
+                difficulty=2
+            )
+            problem.topics.add(self.topic)
+            self.problems.append(problem)
+        
+        self.session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=30)
+        self.client = Client()
+        self.client.login(username='testuser', password='testpassword')
+    
+    def test_set_problems_keeps_order(self):
+        """Test that set_problems stores positions in the given order"""
+        ordered = list(reversed(self.problems))
+        self.session.set_problems(ordered)
+        
+        self.assertEqual(self.session.total_problems, 6)
+        self.assertEqual(TrainingSession.objects.get(id=self.session.id).total_problems, 6)
+        self.assertEqual([item.problem for item in self.session.items.all()], ordered)
+        self.assertEqual(self.session.problems.count(), 6)
+        
+        for index in (0, 3, 5):
+            url = reverse('training_problem', kwargs={'session_id': self.session.id, 'problem_index': index})
+            response = self.client.get(url)
+            self.assertEqual(response.context['problem'], ordered[index])
+            self.assertEqual(response.context['total_problems'], 6)
+    
+    def test_m2m_edits_are_mirrored(self):
+        """Test that editing session.problems directly keeps the ordered rows in sync"""
+        self.session.problems.add(self.problems[2], self.problems[0])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.total_problems, 2)
+        
+        self.session.problems.remove(self.problems[2])
+        self.assertEqual(list(self.session.items.values_list('problem_id', 'position')), [(self.problems[0].id, 0)])
+        
+        self.problems[0].training_sessions.clear()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.total_problems, 0)
+        self.assertFalse(SessionProblem.objects.filter(session=self.session).exists())
+    
+    def test_problem_page_query_count_independent_of_session_size(self):
+        """Test that rendering problem N doesn't load the whole session"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        small = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=5)
+        small.set_problems(self.problems[:1])
+        self.session.set_problems(self.problems)
+        
+        self.client.get(reverse('training_problem', kwargs={'session_id': small.id, 'problem_index': 0}))
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.get(reverse('training_problem', kwargs={'session_id': small.id, 'problem_index': 0}))
+        with CaptureQueriesContext(connection) as large_queries:
+            self.client.get(reverse('training_problem', kwargs={'session_id': self.session.id, 'problem_index': 5}))
+        
+        self.assertEqual(len(small_queries), len(large_queries))
+    
+    def test_deleted_problem_is_skipped(self):
+        """Test that a problem deleted mid-session is skipped"""
+        self.session.set_problems(self.problems[:2])
+        self.problems[0].delete()
+        
+        url = reverse('training_problem', kwargs={'session_id': self.session.id, 'problem_index': 0})
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('training_problem', kwargs={'session_id': self.session.id, 'problem_index': 1}))
+
+
+class ProblemSamplerTests(TestCase):
+    """Tests for the random problem sampler"""
+    
+    def setUp(self):
+        """Set up problems with varied times, topics and difficulties"""
+        self.topic_hvac = Topic.objects.create(name='HVAC Design')
+        self.topic_electric = Topic.objects.create(name='Electrical Design')
+        
+        self.problems = []
+        for i, (minutes, difficulty, topic) in enumerate([
+            (10, 2, self.topic_hvac),
+            (3, 2, self.topic_hvac),
+            (4, 3, self.topic_hvac),
+            (6, 2, self.topic_electric),
+            (2, 5, self.topic_hvac),
+        ]):
+            problem = Problem.objects.create(
+                name=f"Problem {i}",
+                prompt="What is the correct answer?",
+                choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+                correct_answer="A",
+                estimated_time_to_complete=minutes,
+                difficulty=difficulty
+            )
+            problem.topics.add(topic)
+            self.problems.append(problem)
+    
+    def test_selection_matches_preferences_and_budget(self):
+        """Test that selections match the filters and fit the time budget"""
+        import random
+        from adeptly.sampling import select_problems
+        
+        matching = {self.problems[0].id, self.problems[1].id, self.problems[2].id}
+        times = {p.id: p.estimated_time_to_complete for p in self.problems}
+        for seed in range(20):
+            selected = select_problems([self.topic_hvac.id], ['2', '3'], 8, rng=random.Random(seed))
+            
+            self.assertTrue(set(selected) <= matching)
+            self.assertEqual(len(selected), len(set(selected)))
+            self.assertLessEqual(sum(times[problem_id] for problem_id in selected), 8)
+            # The 3 and 4 minute problems always fit together
+            self.assertTrue(selected)
+    
+    def test_index_is_invalidated_by_new_problems(self):
+        """Test that newly added problems are visible to the next selection"""
+        from adeptly.sampling import select_problems
+        
+        self.assertEqual(select_problems([self.topic_electric.id], [4], 60), [])
+        
+        problem = Problem.objects.create(
+            name="New Problem", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+            correct_answer="A", estimated_time_to_complete=5, difficulty=4
+        )
+        problem.topics.add(self.topic_electric)
+        
+        self.assertEqual(select_problems([self.topic_electric.id], [4], 60), [problem.id])
+    
+    def test_large_pool_sampling(self):
+        """Test the draw-based path on a pool too big to shuffle"""
+        import random
+        from adeptly.sampling import ProblemIndex
+        
+        rows = [(topic_id, 3, problem_id, 5) for problem_id in range(5000) for topic_id in (1, 2) if problem_id % topic_id == 0]
+        index = ProblemIndex(rows)
+        
+        selected = index.sample([1, 2], [3], 60, rng=random.Random(1))
+        self.assertEqual(len(selected), 12)
+        self.assertEqual(len(set(selected)), 12)
+        self.assertEqual(index.sample([3], [3], 60), [])
+        self.assertEqual(index.sample([1], [1], 60), [])
+
+
+class QueryPlanTests(TestCase):
+    """Tests that the hot query paths are served by indexes"""
+    
+    def setUp(self):
+        """Set up one row of each model involved in the hot queries"""
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.rank = Rank.objects.create(name='Beginner')
+        self.topic = Topic.objects.create(name='HVAC Design')
+        self.problem = Problem.objects.create(
+            name="Test Problem", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+            correct_answer="A", estimated_time_to_complete=5, difficulty=2
+        )
+        self.session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=15)
+        UserTopicStats.objects.create(user=self.user, topic=self.topic, experience=50, rank=self.rank)
+    
+    def hot_queries(self):
+        """The query shapes issued by views.py and context_processors.py"""
+        from django.db.models import Sum
+        from adeptly.models import ProblemQueueEntry
+        return {
+            'topic leaderboard': UserTopicStats.objects.filter(topic=self.topic).order_by('-experience')[:10],
+            'topic rank': UserTopicStats.objects.filter(topic=self.topic, experience__gt=10),
+            'user top topics': UserTopicStats.objects.filter(user=self.user).order_by('-experience')[:3],
+            'user topic stats': UserTopicStats.objects.filter(user=self.user, topic=self.topic),
+            'recent sessions': TrainingSession.objects.filter(user=self.user).order_by('-created_at')[:5],
+            'session breakdown': TopicExperienceEarned.objects.filter(
+                training_session=self.session
+            ).values('topic_id').annotate(total_exp=Sum('experience_earned')),
+            'problems by difficulty': Problem.objects.filter(difficulty=2),
+            'overall leaderboard': UserTotalStats.objects.order_by('-total_experience')[:10],
+            'overall rank': UserTotalStats.objects.filter(total_experience__gt=10),
+            'popular topic': TopicStats.objects.order_by('-users_count')[:1],
+            'session problem': SessionProblem.objects.filter(session=self.session, position=0),
+            'problem queue': ProblemQueueEntry.objects.filter(user=self.user).order_by('-score')[:100],
+        }
+    
+    def test_hot_queries_use_indexes(self):
+        """Test via EXPLAIN that no hot query falls back to a table scan"""
+        from django.db import connection
+        
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Tiny test tables would otherwise always be scanned
+                cursor.execute('SET enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f'No plan assertions for {connection.vendor}')
+        
+        for name, queryset in self.hot_queries().items():
+            plan = queryset.explain()
+            if connection.vendor == 'sqlite':
+                self.assertRegex(plan, r'USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY', f'{name}: {plan}')
+                self.assertNotRegex(plan, r'USE TEMP B-TREE FOR ORDER BY', f'{name}: {plan}')
+            else:
+                self.assertIn('Index', plan, f'{name}: {plan}')
+    
+    def test_unique_constraints(self):
+        """Test that duplicate topics, ranks and user topic stats are rejected"""
+        from django.db import IntegrityError, transaction
+        
+        for create in (
+            lambda: Topic.objects.create(name='HVAC Design'),
+            lambda: Rank.objects.create(name='Beginner'),
+            lambda: UserTopicStats.objects.create(user=self.user, topic=self.topic, experience=0, rank=self.rank),
+        ):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                create()
+
+
+class DashboardStatsTests(TestCase):
+    """Tests for the dashboard stats snapshot"""
+    
+    def setUp(self):
+        """Set up a user with some experience, solved problems and sessions"""
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.rank = Rank.objects.create(name='Beginner')
+        self.topics = [Topic.objects.create(name=f"Topic {i}") for i in range(2)]
+        UserTopicStats.objects.create(user=self.user, topic=self.topics[0], experience=100, rank=self.rank)
+        UserTopicStats.objects.create(user=self.user, topic=self.topics[1], experience=50, rank=self.rank)
+        problem = Problem.objects.create(
+            name="Test Problem", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+            correct_answer="A", estimated_time_to_complete=5, difficulty=2
+        )
+        problem.solved_by.add(self.user)
+        for _ in range(6):
+            TrainingSession.objects.create(user=self.user, estimated_time_to_complete=15)
+        self.client.login(username='testuser', password='testpassword')
+    
+    def add_users(self, count, experience):
+        """Create `count` users who each have `experience` XP in the first topic"""
+        start = User.objects.count()
+        for i in range(start, start + count):
+            other = User.objects.create_user(username=f'other{i}', password='testpassword')
+            UserTopicStats.objects.create(user=other, topic=self.topics[0], experience=experience, rank=self.rank)
+    
+    def test_dashboard_stats(self):
+        """Test the values in the dashboard snapshot"""
+        from adeptly.stats import get_dashboard_stats
+        
+        self.add_users(2, 200)
+        self.add_users(1, 150)
+        self.add_users(1, 10)
+        
+        stats = get_dashboard_stats(self.user)
+        self.assertEqual(stats['total_experience'], 150)
+        self.assertEqual(stats['topics_trained'], 2)
+        self.assertEqual(stats['problems_solved'], 1)
+        self.assertEqual(stats['rank'], 3)
+        self.assertEqual(len(stats['recent_sessions']), 5)
+    
+    def test_dashboard_stats_without_experience(self):
+        """Test the snapshot for a user who hasn't earned any XP"""
+        from adeptly.stats import get_dashboard_stats
+        
+        newcomer = User.objects.create_user(username='newcomer', password='testpassword')
+        stats = get_dashboard_stats(newcomer)
+        self.assertEqual(stats['total_experience'], 0)
+        self.assertEqual(stats['topics_trained'], 0)
+        self.assertEqual(stats['problems_solved'], 0)
+        self.assertEqual(stats['rank'], 2)
+        self.assertEqual(stats['recent_sessions'], [])
+    
+    def test_dashboard_query_count_is_constant(self):
+        """Test that the dashboard issues the same number of queries as users grow"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        def dashboard_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('dashboard'))
+            self.assertEqual(response.status_code, 200)
+            return len(queries.captured_queries)
+        
+        self.add_users(1, 200)
+        baseline = dashboard_queries()
+        self.add_users(25, 200)
+        self.assertEqual(dashboard_queries(), baseline)
+        self.assertContains(self.client.get(reverse('dashboard')), '#27')
+
+
+class TrainingSessionSummaryTests(TestCase):
+    """Tests for the stored per-session results summary"""
+    
+    def setUp(self):
+        """Set up a session over problems in two topics"""
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        Rank.objects.create(name='Beginner')
+        self.hvac = Topic.objects.create(name='HVAC Design')
+        self.controls = Topic.objects.create(name='Controls')
+        self.problems = []
+        for i, topics in enumerate([[self.hvac], [self.hvac, self.controls], [self.controls]]):
+            problem = Problem.objects.create(
+                name=f"Problem {i}", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+                correct_answer="A", estimated_time_to_complete=5, difficulty=i + 1
+            )
+            problem.topics.add(*topics)
+            self.problems.append(problem)
+        self.session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=15)
+        self.session.topics_covered.add(self.hvac, self.controls)
+        self.session.set_problems(self.problems)
+        self.client.login(username='testuser', password='testpassword')
+    
+    def answer(self, index, answer):
+        url = reverse('training_problem', kwargs={'session_id': self.session.id, 'problem_index': index})
+        return self.client.post(url, {'answer': answer})
+    
+    def test_summary_stored_on_completion(self):
+        """Completing a session stores its totals and per-topic breakdown"""
+        from adeptly.models import TrainingSessionSummary
+        
+        self.answer(0, 'A')
+        self.answer(1, 'A')
+        self.answer(2, 'B')
+        self.assertFalse(TrainingSessionSummary.objects.exists())
+        
+        response = self.client.get(reverse('training_problem', kwargs={'session_id': self.session.id, 'problem_index': 3}))
+        self.assertRedirects(response, reverse('training_results', kwargs={'session_id': self.session.id}))
+        
+        summary = TrainingSessionSummary.objects.get(session=self.session)
+        self.assertEqual(summary.total_problems, 3)
+        self.assertEqual(summary.problems_completed, 2)
+        self.assertEqual(summary.correct_attempts, 2)
+        self.assertEqual(summary.incorrect_attempts, 1)
+        self.assertAlmostEqual(summary.accuracy, 200 / 3)
+        self.assertEqual(summary.total_experience, 50)  # 10 for HVAC, then 20 in each topic
+        self.assertEqual(summary.topics_covered, 2)
+        self.assertEqual(summary.topics, [
+            {'name': 'HVAC Design', 'experience': 30, 'problems': 2, 'solved': 2, 'accuracy': 100},
+            {'name': 'Controls', 'experience': 20, 'problems': 2, 'solved': 1, 'accuracy': 50},
+        ])
+        self.assertEqual([problem['correct'] for problem in summary.problems], [True, True, False])
+        self.assertEqual(summary.problems[1]['topics'], ['Controls', 'HVAC Design'])
+    
+    def test_results_page_reads_summary(self):
+        """The results page renders from the summary without touching the ledger"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self.answer(0, 'A')
+        self.client.get(reverse('training_problem', kwargs={'session_id': self.session.id, 'problem_index': 3}))
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('training_results', kwargs={'session_id': self.session.id}))
+        
+        self.assertContains(response, '+10')
+        self.assertContains(response, '1 correct out of 3')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('adeptly_topicexperienceearned', sql)
+        self.assertNotIn('adeptly_sessionproblem', sql)
+    
+    def test_in_progress_results_are_not_stored(self):
+        """A session still in progress shows current results without storing them"""
+        from adeptly.models import TrainingSessionSummary
+        
+        self.answer(0, 'A')
+        response = self.client.get(reverse('training_results', kwargs={'session_id': self.session.id}))
+        
+        self.assertEqual(response.context['summary'].total_experience, 10)
+        self.assertFalse(TrainingSessionSummary.objects.exists())
+    
+    def test_dashboard_backfills_missing_summaries(self):
+        """Completed sessions from before summaries existed get one on the dashboard"""
+        from adeptly.models import TrainingSessionSummary
+        
+        self.answer(0, 'A')
+        TrainingSession.objects.filter(pk=self.session.pk).update(was_completed=True, completed_at=timezone.now())
+        
+        response = self.client.get(reverse('dashboard'))
+        
+        self.assertContains(response, '1 correct out of 3, +10 XP')
+        self.assertTrue(TrainingSessionSummary.objects.filter(session=self.session).exists())
+
+
+class UserSummaryTests(TestCase):
+    """Tests for the cached user summary in the context processor"""
+    
+    def setUp(self):
+        """Set up a user with stats in a few topics"""
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.rank = Rank.objects.create(name='Beginner')
+        for i, experience in enumerate([30, 90, 60, 10]):
+            topic = Topic.objects.create(name=f"Topic {i}")
+            UserTopicStats.objects.create(user=self.user, topic=topic, experience=experience, rank=self.rank)
+        self.client.login(username='testuser', password='testpassword')
+    
+    def test_unrelated_page_skips_summary_query(self):
+        """Test that pages which don't display the summary never query for it"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('training_setup'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('adeptly_usertopicstats' in q['sql'] for q in queries.captured_queries))
+    
+    def test_summary_is_lazy_and_cached(self):
+        """Test that the summary is fetched once with a joined query and then cached"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        response = self.client.get(reverse('training_setup'))
+        top_topics = response.context['user_top_topics']
+        
+        with self.assertNumQueries(1):
+            names = [stats.topic.name for stats in top_topics]
+            ranks = [stats.rank.name for stats in top_topics]
+        self.assertEqual(names, ['Topic 1', 'Topic 2', 'Topic 0'])
+        self.assertEqual(ranks, ['Beginner'] * 3)
+        
+        response = self.client.get(reverse('training_setup'))
+        with self.assertNumQueries(0):
+            self.assertEqual(len(response.context['user_top_topics']), 3)
+    
+    def test_summary_invalidated_on_experience_change(self):
+        """Test that an XP change drops the cached summary"""
+        from adeptly.stats import get_user_summary
+        
+        self.assertEqual(get_user_summary(self.user.pk)['top_topics'][0].experience, 90)
+        
+        stats = UserTopicStats.objects.get(user=self.user, topic__name='Topic 3')
+        stats.experience = 500
+        stats.save()
+        
+        self.assertEqual(get_user_summary(self.user.pk)['top_topics'][0].topic.name, 'Topic 3')
+    
+    def test_summary_invalidated_by_grading(self):
+        """Test that answering a problem correctly drops the cached summary"""
+        from adeptly import grading
+        from adeptly.stats import get_user_summary
+        
+        topic = Topic.objects.get(name='Topic 3')
+        problem = Problem.objects.create(
+            name="Test Problem", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+            correct_answer="A", estimated_time_to_complete=5, difficulty=50
+        )
+        problem.topics.add(topic)
+        session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=15)
+        
+        get_user_summary(self.user.pk)
+        grading.record_answer(self.user, session, problem, 'A')
+        
+        top = get_user_summary(self.user.pk)['top_topics'][0]
+        self.assertEqual((top.topic.name, top.experience), ('Topic 3', 510))
+    
+    def test_summary_dropped_again_on_commit(self):
+        """Test that a summary cached between the invalidation and the commit doesn't survive it"""
+        from django.core.cache import cache
+        from adeptly.stats import USER_SUMMARY_CACHE_KEY, get_user_summary, invalidate_user_summary
+        
+        key = USER_SUMMARY_CACHE_KEY.format(user_id=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_user_summary(self.user.pk)
+            # A concurrent render caching the not-yet-committed state
+            get_user_summary(self.user.pk)
+            self.assertIsNotNone(cache.get(key))
+        
+        self.assertIsNone(cache.get(key))
+
+
+class ProblemListPaginationTests(TestCase):
+    """Tests for keyset pagination of the problem list"""
+    
+    def setUp(self):
+        """Set up a bank of problems spread over two topics"""
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.topic_a = Topic.objects.create(name="Topic A")
+        self.topic_b = Topic.objects.create(name="Topic B")
+        self.problems = []
+        for i in range(60):
+            problem = Problem.objects.create(
+                name=f"Problem {i}", prompt="?", choice_a="A", choice_b="B", choice_c="C", choice_d="D",
+                correct_answer="A", estimated_time_to_complete=5, difficulty=i % 5 + 1
+            )
+            problem.topics.add(self.topic_a if i % 2 else self.topic_b)
+            self.problems.append(problem)
+        self.client.login(username='testuser', password='testpassword')
+        self.url = reverse('problem-list')
+    
+    def get_json(self, **params):
+        """Fetch a page of the problem list as JSON"""
+        response = self.client.get(self.url, dict(params, format='json'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def test_walk_pages_forwards_and_backwards(self):
+        """Test that cursors visit every problem exactly once in both directions"""
+        seen = []
+        page = self.get_json()
+        self.assertIsNone(page['previous_cursor'])
+        while True:
+            seen.extend(problem['id'] for problem in page['problems'])
+            if page['next_cursor'] is None:
+                break
+            page = self.get_json(after=page['next_cursor'])
+        self.assertEqual(seen, [problem.id for problem in self.problems])
+        
+        back = []
+        while page['previous_cursor'] is not None:
+            page = self.get_json(before=page['previous_cursor'])
+            back = [problem['id'] for problem in page['problems']] + back
+        self.assertEqual(back, seen[:50])
+    
+    def test_filters_apply_to_pages(self):
+        """Test that topic and difficulty filters are applied to each page"""
+        page = self.get_json(topic=self.topic_a.id)
+        self.assertEqual(len(page['problems']), 25)
+        self.assertTrue(all(problem['topics'] == [{'id': self.topic_a.id, 'name': 'Topic A'}]
+                            for problem in page['problems']))
+        
+        page = self.get_json(topic=self.topic_a.id, after=page['next_cursor'])
+        self.assertEqual(len(page['problems']), 5)
+        self.assertIsNone(page['next_cursor'])
+        
+        page = self.get_json(difficulty=3)
+        self.assertEqual(len(page['problems']), 12)
+        self.assertTrue(all(problem['difficulty'] == 3 for problem in page['problems']))
+        
+        # Invalid filter values are ignored rather than raising errors
+        self.assertEqual(len(self.get_json(topic='abc')['problems']), 25)
+    
+    def test_html_page_has_constant_queries(self):
+        """Test that topics are prefetched and the page cost doesn't depend on depth"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['problems']), 25)
+        self.assertContains(response, 'Next')
+        
+        with CaptureQueriesContext(connection) as deep:
+            response = self.client.get(self.url, {'after': self.problems[30].id})
+        self.assertEqual(len(response.context['problems']), 25)
+        self.assertEqual(len(first.captured_queries), len(deep.captured_queries))
+        self.assertFalse(any('OFFSET' in q['sql'] for q in deep.captured_queries))
+
+
+class ProblemSearchTests(TestCase):
+    """Tests for full-text search over the problem bank"""
+    
+    def setUp(self):
+        """Set up a few problems with distinct wording"""
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.topic = Topic.objects.create(name="HVAC Design")
+        self.chiller = self.create_problem("Chiller Sizing", "Size the chiller for a hospital wing.", difficulty=3)
+        self.duct = self.create_problem("Duct Design", "Which chiller feeds this duct run?", difficulty=2)
+        self.pump = self.create_problem("Pump Head", "Compute the pump head.", choice_a="Centrifugal", difficulty=3)
+        self.chiller.topics.add(self.topic)
+        self.client.login(username='testuser', password='testpassword')
+    
+    def create_problem(self, name, prompt, choice_a="A", difficulty=1):
+        return Problem.objects.create(
+            name=name, prompt=prompt, choice_a=choice_a, choice_b="B", choice_c="C", choice_d="D",
+            correct_answer="A", estimated_time_to_complete=5, difficulty=difficulty
+        )
+    
+    def test_ranked_matches(self):
+        """Test that name matches rank above prompt matches"""
+        from adeptly import search
+        
+        self.assertEqual(search.search_ids('chiller'), [self.chiller.id, self.duct.id])
+        self.assertEqual(search.search_ids('centrifugal'), [self.pump.id])
+        self.assertEqual(search.search_ids('chill hosp'), [self.chiller.id])
+        self.assertEqual(search.search_ids('"; DROP TABLE'), [])
+        self.assertEqual(search.search_ids('  '), [])
+    
+    def test_raw_saves_are_not_indexed(self):
+        """Test that fixture loading leaves the index to be rebuilt separately"""
+        from adeptly import search
+        
+        self.pump.name = "Boiler Sizing"
+        self.pump.save_base(raw=True)
+        self.assertEqual(search.search_ids('boiler'), [])
+        
+        search.rebuild()
+        self.assertEqual(search.search_ids('boiler'), [self.pump.id])
+    
+    def test_index_follows_saves_and_deletes(self):
+        """Test that signals keep the index current"""
+        from adeptly import search
+        
+        self.pump.name = "Boiler Pump Head"
+        self.pump.save()
+        self.assertEqual(search.search_ids('boiler'), [self.pump.id])
+        
+        self.chiller.delete()
+        self.assertEqual(search.search_ids('chiller'), [self.duct.id])
+    
+    def test_rebuild_command(self):
+        """Test that the rebuild command restores a cleared index"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connection
+        from adeptly import search
+        
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(search.search_ids('pump'), [])
+        
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 3 problems', out.getvalue())
+        self.assertEqual(search.search_ids('pump'), [self.pump.id])
+    
+    def test_problem_list_search(self):
+        """Test the ?q= parameter on the problem list, with and without filters"""
+        url = reverse('problem-list')
+        
+        data = self.client.get(url, {'q': 'chiller', 'format': 'json'}).json()
+        self.assertEqual([problem['id'] for problem in data['problems']], [self.chiller.id, self.duct.id])
+        
+        data = self.client.get(url, {'q': 'chiller', 'difficulty': 2, 'format': 'json'}).json()
+        self.assertEqual([problem['id'] for problem in data['problems']], [self.duct.id])
+        
+        data = self.client.get(url, {'q': 'chiller', 'topic': self.topic.id, 'format': 'json'}).json()
+        self.assertEqual([problem['id'] for problem in data['problems']], [self.chiller.id])
+        
+        response = self.client.get(url, {'q': 'pump'})
+        self.assertContains(response, 'Pump Head')
+        self.assertNotContains(response, 'Chiller Sizing')
+    
+    def test_filters_apply_before_the_result_cap(self):
+        """Test that a filtered search still finds matches ranked below the cap"""
+        from adeptly import search
+        
+        self.assertEqual(search.search_ids('chiller', limit=1), [self.chiller.id])
+        self.assertEqual(search.search_ids('chiller', limit=1, within=Problem.objects.filter(difficulty=2)), [self.duct.id])
+        self.assertEqual(search.search_ids('chiller', within=Problem.objects.filter(difficulty=5)), [])
+    
+    def test_search_pages(self):
+        """Test that search results page in rank order"""
+        for i in range(30):
+            self.create_problem(f"Valve {i}", "Pick a valve.")
+        url = reverse('problem-list')
+        
+        first = self.client.get(url, {'q': 'valve', 'format': 'json'}).json()
+        second = self.client.get(url, {'q': 'valve', 'format': 'json', 'after': first['next_cursor']}).json()
+        self.assertEqual(len(first['problems']), 25)
+        self.assertEqual(len(second['problems']), 5)
+        self.assertIsNone(second['next_cursor'])
+        
+        back = self.client.get(url, {'q': 'valve', 'format': 'json', 'before': second['previous_cursor']}).json()
+        self.assertEqual(back['problems'], first['problems'])
+
+
+class ProblemImporterTests(TestCase):
+    """Tests for the bulk problem importer and the import commands"""
+    
+    def setUp(self):
+        """Set up the topics the problem bank uses"""
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        for name in ['HVAC Design', 'HVAC Load Calculations', 'Ductwork Design', 'Refrigeration',
+                     'Energy Code Compliance', 'Electrical Design', 'Electrical Code Requirements',
+                     'Power Distribution', 'Lighting Design', 'Control Systems']:
+            Topic.objects.create(name=name)
+    
+    def write_file(self, name, content):
+        import os
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+    
+    def row(self, **overrides):
+        row = {
+            'name': 'Duct Sizing', 'topics': ['Ductwork Design'], 'prompt': 'Size the duct.',
+            'choice_a': '10 in', 'choice_b': '12 in', 'choice_c': '14 in', 'choice_d': '16 in',
+            'correct_answer': 'B', 'estimated_time_to_complete': 4, 'difficulty': 2,
+        }
+        row.update(overrides)
+        return row
+    
+    def test_bank_commands_are_idempotent(self):
+        """Test that re-running the bundled import commands updates instead of duplicating"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        for command in ['import_engineering_problems', 'import_hvac_control_problems', 'import_energy_code_problems']:
+            call_command(command, stdout=StringIO())
+        self.assertEqual(Problem.objects.count(), 37)
+        links = Problem.topics.through.objects.count()
+        
+        out = StringIO()
+        call_command('import_engineering_problems', stdout=out)
+        self.assertIn('0 added, 20 updated', out.getvalue())
+        self.assertEqual(Problem.objects.count(), 37)
+        self.assertEqual(Problem.topics.through.objects.count(), links)
+        self.assertEqual(Topic.objects.get(name='Electrical Design').problems.count(), 10)
+    
+    def test_upsert_updates_fields_and_topics(self):
+        """Test that an existing slug is updated in place, including its topics"""
+        import json
+        from adeptly import importer, search
+        
+        path = self.write_file('bank.jsonl', json.dumps(self.row()) + '\n')
+        result = importer.import_files([path])
+        self.assertEqual((result.created, result.updated), (1, 0))
+        problem = Problem.objects.get(slug='duct-sizing')
+        
+        path = self.write_file('bank.jsonl', json.dumps(self.row(
+            prompt='Size the return duct.', difficulty=4, topics=['HVAC Design', 'Refrigeration']
+        )) + '\n')
+        result = importer.import_files([path])
+        self.assertEqual((result.created, result.updated), (0, 1))
+        
+        problem.refresh_from_db()
+        self.assertEqual(problem.prompt, 'Size the return duct.')
+        self.assertEqual(problem.difficulty, 4)
+        self.assertEqual(sorted(problem.topics.values_list('name', flat=True)), ['HVAC Design', 'Refrigeration'])
+        self.assertEqual(search.search_ids('return'), [problem.id])
+    
+    def test_csv_and_yaml_files(self):
+        """Test reading CSV and YAML problem files"""
+        import csv
+        import io
+        from adeptly import importer
+        
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(self.row()))
+        writer.writeheader()
+        writer.writerow(self.row(topics='HVAC Design|Control Systems'))
+        importer.import_files([self.write_file('bank.csv', buffer.getvalue())])
+        problem = Problem.objects.get(slug='duct-sizing')
+        self.assertEqual(problem.estimated_time_to_complete, 4)
+        self.assertEqual(problem.topics.count(), 2)
+        
+        try:
+            import yaml
+        except ImportError:
+            return
+        path = self.write_file('bank.yaml', yaml.safe_dump([self.row(name='Fan Law'), self.row(name='Pump Law')]))
+        self.assertEqual(importer.import_files([path]).created, 2)
+    
+    def test_invalid_rows_roll_back(self):
+        """Test that an invalid row or unknown topic aborts the whole import"""
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        
+        path = self.write_file('bank.jsonl', '\n'.join([
+            json.dumps(self.row()),
+            json.dumps(self.row(name='Bad Answer', correct_answer='E')),
+        ]))
+        with self.assertRaisesMessage(CommandError, 'bank.jsonl:2: correct_answer'):
+            call_command('import_problems', path, stdout=StringIO())
+        self.assertEqual(Problem.objects.count(), 0)
+        
+        path = self.write_file('bank.jsonl', json.dumps(self.row(topics=['Acoustics'])))
+        with self.assertRaisesMessage(CommandError, 'Unknown topics: Acoustics'):
+            call_command('import_problems', path, stdout=StringIO())
+        
+        call_command('import_problems', path, '--create-topics', stdout=StringIO())
+        self.assertTrue(Topic.objects.get(name='Acoustics').problems.exists())
+    
+    def test_derived_slugs_must_be_usable_and_unique(self):
+        """Test that empty or colliding derived slugs are reported instead of overwriting rows"""
+        from adeptly import importer
+        
+        with self.assertRaisesMessage(ValueError, 'row 1: cannot derive a slug'):
+            importer.import_rows([('row 1', self.row(name='???'))])
+        
+        with self.assertRaisesMessage(ValueError, 'row 2: slug "duct-sizing" is also used by row 1'):
+            importer.import_rows([('row 1', self.row()), ('row 2', self.row(name='Duct  Sizing!'))])
+        self.assertEqual(Problem.objects.count(), 0)
+        
+        # Repeating an explicit slug still replaces the earlier row
+        result = importer.import_rows([
+            ('row 1', self.row(slug='duct')), ('row 2', self.row(slug='duct', prompt='Size the return duct.')),
+        ])
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Problem.objects.get(slug='duct').prompt, 'Size the return duct.')
+    
+    def test_queries_scale_with_batches_not_rows(self):
+        """Test that rows and topic links are written in bulk rather than one by one"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from adeptly import importer
+        
+        rows = (
+            (f'row {i}', self.row(name=f'Problem {i}', topics=['HVAC Design', 'Refrigeration', 'Control Systems']))
+            for i in range(500)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = importer.import_rows(rows, batch_size=250)
+        
+        self.assertEqual(result.created, 500)
+        self.assertEqual(Problem.topics.through.objects.count(), 1500)
+        self.assertLess(len(queries.captured_queries), 60)
+
+
+class DataExportTests(TestCase):
+    """Tests for the streaming export_data command"""
+    
+    def setUp(self):
+        """Set up a little of everything, including many-to-many rows"""
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.rank = Rank.objects.create(name='Beginner')
+        self.topic = Topic.objects.create(name="HVAC Design")
+        self.problem = Problem.objects.create(
+            name="Psychrometrics", prompt="Mixed air temperature? 75°F", choice_a="A", choice_b="B",
+            choice_c="C", choice_d="D", correct_answer="A", estimated_time_to_complete=5, difficulty=2
+        )
+        self.problem.topics.add(self.topic)
+        session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=15)
+        session.problems.add(self.problem)
+        UserTopicStats.objects.create(user=self.user, topic=self.topic, experience=20, rank=self.rank)
+    
+    def export(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('export_data', self.tmpdir.name, *args, stdout=out)
+        return out.getvalue()
+    
+    def read_manifest(self):
+        import json
+        import os
+        with open(os.path.join(self.tmpdir.name, 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    
+    def test_manifest_counts_checksums_and_order(self):
+        """Test the manifest against the files and the database"""
+        import hashlib
+        import json
+        import os
+        from adeptly import dataio
+        
+        output = self.export('--compress', 'gzip')
+        self.assertIn('Exported', output)
+        manifest = self.read_manifest()
+        self.assertEqual(manifest['format'], 'adeptly-export')
+        
+        entries = {entry['model']: entry for entry in manifest['models']}
+        order = [entry['model'] for entry in manifest['models']]
+        self.assertNotIn('contenttypes.contenttype', entries)
+        self.assertNotIn('auth.permission', entries)
+        self.assertLess(order.index('adeptly.topic'), order.index('adeptly.problem'))
+        self.assertLess(order.index('adeptly.problem'), order.index('adeptly.problem_topics'))
+        self.assertLess(order.index('auth.user'), order.index('adeptly.trainingsession'))
+        self.assertLess(order.index('adeptly.trainingsession'), order.index('adeptly.sessionproblem'))
+        
+        self.assertEqual(entries['adeptly.problem_topics']['count'], 1)
+        self.assertEqual(entries['adeptly.usertotalstats']['count'], 1)
+        
+        for entry in manifest['models']:
+            with dataio.open_reader(os.path.join(self.tmpdir.name, entry['file'])) as f:
+                data = f.read()
+            self.assertEqual(hashlib.sha256(data).hexdigest(), entry['sha256'])
+            self.assertEqual(len(data.splitlines()), entry['count'])
+        
+        with dataio.open_reader(os.path.join(self.tmpdir.name, entries['adeptly.problem']['file'])) as f:
+            row = dict(zip(entries['adeptly.problem']['fields'], json.loads(f.readline())))
+        self.assertEqual(row['prompt'], "Mixed air temperature? 75°F")
+        self.assertEqual(row['id'], self.problem.id)
+    
+    def test_exclude_and_unknown_compression(self):
+        """Test excluding models and the zstd dependency check"""
+        from django.core.management.base import CommandError
+        from adeptly import dataio
+        
+        self.export('--exclude', 'adeptly.TopicExperienceEarned')
+        models = [entry['model'] for entry in self.read_manifest()['models']]
+        self.assertNotIn('adeptly.topicexperienceearned', models)
+        
+        try:
+            import zstandard
+        except ImportError:
+            with self.assertRaisesMessage(CommandError, 'zstandard'):
+                self.export('--compress', 'zstd')
+        else:
+            self.export('--compress', 'zstd')
+            self.assertEqual(self.read_manifest()['compression'], 'zstd')
+
+
+class ScratchDatabaseMixin:
+    """
+    Registers a migrated SQLite database under the 'scratch' alias for the
+    test class, for tests that copy or restore into a second database.
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from django.db import connections
+        
+        cls.scratch_dir = tempfile.TemporaryDirectory()
+        connections.settings['scratch'] = connections.configure_settings({
+            **connections.settings,
+            'scratch': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.scratch_dir.name, 'scratch.sqlite3')},
+        })['scratch']
+        call_command('migrate', database='scratch', verbosity=0)
+        # Added here rather than in the class body, where the test runner
+        # would look for the alias before it exists
+        cls.databases = {*cls.databases, 'scratch'}
+        super().setUpClass()
+    
+    @classmethod
+    def tearDownClass(cls):
+        from django.db import connections
+        
+        super().tearDownClass()
+        connections['scratch'].close()
+        del connections['scratch']
+        del connections.settings['scratch']
+        cls.scratch_dir.cleanup()
+
+
+class DataRestoreTests(ScratchDatabaseMixin, TestCase):
+    """Tests for the bulk restore_data command"""
+    
+    def setUp(self):
+        """Set up related rows across several tables"""
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.rank = Rank.objects.create(name='Beginner')
+        self.topics = [Topic.objects.create(name=f"Topic {i}") for i in range(3)]
+        for i in range(5):
+            problem = Problem.objects.create(
+                name=f"Problem {i}", prompt="Find the load.", choice_a="", choice_b="B",
+                choice_c="C", choice_d="D", correct_answer="A", estimated_time_to_complete=5, difficulty=2
+            )
+            problem.topics.add(*self.topics[:i % 3 + 1])
+        session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=15)
+        session.set_problems(Problem.objects.all())
+        UserTopicStats.objects.create(user=self.user, topic=self.topics[0], experience=20, rank=self.rank)
+    
+    def snapshot(self, milliseconds=False):
+        """Every row of the tables under test"""
+        from datetime import datetime
+        
+        def normalize(value):
+            # dumpdata only keeps milliseconds
+            if milliseconds and isinstance(value, datetime):
+                return value.replace(microsecond=value.microsecond // 1000 * 1000)
+            return value
+        
+        snapshot = {
+            model._meta.label: [
+                {name: normalize(value) for name, value in row.items()}
+                for row in model.objects.order_by('pk').values()
+            ]
+            for model in [User, Rank, Topic, Problem, TrainingSession, SessionProblem, UserTopicStats,
+                          UserTotalStats, TopicStats]
+        }
+        # Many-to-many rows have no ids in JSON dumps
+        snapshot['problem_topics'] = list(
+            Problem.topics.through.objects.order_by('problem_id', 'topic_id').values_list('problem_id', 'topic_id')
+        )
+        return snapshot
+    
+    def wipe(self):
+        User.objects.all().delete()
+        Problem.objects.all().delete()
+        Topic.objects.all().delete()
+        Rank.objects.all().delete()
+        TopicStats.objects.all().delete()
+    
+    def restore(self, source, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('restore_data', source, *args, stdout=out)
+        return out.getvalue()
+    
+    def test_round_trip_through_export(self):
+        """Test that an export restores to identical rows, in small transactions"""
+        from io import StringIO
+        from django.core.management import call_command
+        from adeptly import search
+        
+        call_command('export_data', self.tmpdir.name, '--compress', 'gzip', stdout=StringIO())
+        before = self.snapshot()
+        self.wipe()
+        
+        output = self.restore(self.tmpdir.name, '--batch-size', '2', '--transaction-rows', '7')
+        self.assertIn('rows/s', output)
+        self.assertNotIn('rejected', output)
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(len(search.search_ids('load')), 5)
+        
+        # Sequences continue after the restored ids
+        self.assertGreater(Topic.objects.create(name="New Topic").id, max(t.id for t in self.topics))
+    
+    def test_permissions_are_restored_by_natural_key(self):
+        """Test that user and group permissions survive a restore, matched by natural key"""
+        import json
+        import os
+        from io import StringIO
+        from django.contrib.auth.models import Group, Permission
+        from django.core.management import call_command
+        
+        change_problem = Permission.objects.get(codename='change_problem', content_type__app_label='adeptly')
+        delete_topic = Permission.objects.get(codename='delete_topic', content_type__app_label='adeptly')
+        self.user.user_permissions.add(change_problem)
+        group = Group.objects.create(name='Editors')
+        group.permissions.add(delete_topic)
+        group.user_set.add(self.user)
+        
+        def permissions():
+            return (
+                sorted(User.objects.get(username='testuser').user_permissions.values_list('codename', flat=True)),
+                sorted(Group.objects.get(name='Editors').permissions.values_list('codename', flat=True)),
+            )
+        
+        before = permissions()
+        call_command('export_data', self.tmpdir.name, stdout=StringIO())
+        with open(os.path.join(self.tmpdir.name, 'auth.user_user_permissions.ndjson'), encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())[2], ['change_problem', 'adeptly', 'problem'])
+        self.wipe()
+        Group.objects.all().delete()
+        
+        output = self.restore(self.tmpdir.name)
+        self.assertNotIn('rejected', output)
+        self.assertEqual(permissions(), before)
+    
+    def test_search_index_is_rebuilt_in_the_target_database(self):
+        """Test that restoring into another alias indexes that database's problems"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connections
+        
+        call_command('export_data', self.tmpdir.name, '--exclude', 'auth.user', stdout=StringIO())
+        self.restore(self.tmpdir.name, '--database', 'scratch', '--exclude', 'adeptly.trainingsession')
+        
+        with connections['scratch'].cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM adeptly_problem_search WHERE adeptly_problem_search MATCH 'load'")
+            self.assertEqual(cursor.fetchone()[0], 5)
+    
+    def test_corrupt_export_is_refused(self):
+        """Test that files not matching the manifest are rejected before loading"""
+        import os
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        
+        call_command('export_data', self.tmpdir.name, stdout=StringIO())
+        with open(os.path.join(self.tmpdir.name, 'adeptly.topic.ndjson'), 'a') as f:
+            f.write('[99, "Extra"]\n')
+        
+        with self.assertRaisesMessage(CommandError, 'does not match the manifest'):
+            self.restore(self.tmpdir.name)
+    
+    def test_legacy_json_dump(self):
+        """Test streaming a dumpdata-style JSON file, including many-to-many fields"""
+        import os
+        from io import StringIO
+        from django.core.management import call_command
+        
+        path = os.path.join(self.tmpdir.name, 'data_dump.json')
+        call_command('dumpdata', '--indent', '4', '--output', path, stdout=StringIO())
+        before = self.snapshot(milliseconds=True)
+        self.wipe()
+        
+        from adeptly import dataio
+        with open(path, encoding='utf-8') as f:
+            # Small reads make items straddle buffer boundaries
+            self.assertTrue(any(item['model'] == 'adeptly.problem' for item in dataio.iter_json_array(f, read_size=7)))
+        
+        self.restore(path)
+        self.assertEqual(self.snapshot(milliseconds=True), before)
+    
+    def test_bad_rows_go_to_reject_file(self):
+        """Test that rows with missing parents or duplicate keys are rejected, not fatal"""
+        import json
+        import os
+        
+        path = os.path.join(self.tmpdir.name, 'data_dump.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([
+                {'model': 'adeptly.topic', 'pk': 500, 'fields': {'name': 'Acoustics'}},
+                {'model': 'adeptly.topic', 'pk': 501, 'fields': {'name': 'Acoustics'}},
+                {'model': 'adeptly.usertopicstats', 'pk': 900,
+                 'fields': {'user': 12345, 'topic': 500, 'experience': 5, 'rank': self.rank.id}},
+            ], f)
+        
+        output = self.restore(path)
+        self.assertIn('2 rows were rejected', output)
+        self.assertTrue(Topic.objects.filter(pk=500, name='Acoustics').exists())
+        self.assertFalse(UserTopicStats.objects.filter(pk=900).exists())
+        
+        with open(path + '.rejects.ndjson', encoding='utf-8') as f:
+            rejects = [json.loads(line) for line in f]
+        self.assertEqual([reject['model'] for reject in rejects], ['adeptly.topic', 'adeptly.usertopicstats'])
+        self.assertIn('no auth.user row with id=12345', rejects[1]['error'])
+
+
+class DatabaseCopyTests(ScratchDatabaseMixin, TestCase):
+    """Tests for the resumable migrate_to_postgres copy between database aliases"""
+    
+    def setUp(self):
+        """Set up related rows in the source database"""
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.rank = Rank.objects.create(name='Beginner')
+        self.topics = [Topic.objects.create(name=f"Topic {i}") for i in range(3)]
+        for i in range(7):
+            problem = Problem.objects.create(
+                name=f"Problem {i}", prompt="Find the load.", choice_a="A", choice_b="B",
+                choice_c="C", choice_d="D", correct_answer="A", estimated_time_to_complete=5, difficulty=2
+            )
+            problem.topics.add(*self.topics[:i % 3 + 1])
+        session = TrainingSession.objects.create(user=self.user, estimated_time_to_complete=15)
+        session.set_problems(Problem.objects.all())
+        UserTopicStats.objects.create(user=self.user, topic=self.topics[0], experience=20, rank=self.rank)
+    
+    def migrate(self, **options):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        options = {'source': 'default', 'target': 'scratch', **options}
+        call_command('migrate_to_postgres', stdout=out, **options)
+        return out.getvalue()
+    
+    def assertCopied(self):
+        from adeptly import dataio
+        for model in dataio.export_models():
+            self.assertEqual(
+                list(model._base_manager.using('scratch').order_by('pk').values()),
+                list(model._base_manager.using('default').order_by('pk').values()),
+                model._meta.label,
+            )
+    
+    def test_copy_and_verify(self):
+        """Every table is copied with its ids and verified against the source"""
+        output = self.migrate(batch_size=3)
+        
+        self.assertIn('tables match', output)
+        self.assertCopied()
+        self.assertEqual(Problem.objects.using('scratch').get(name='Problem 4').topics.count(), 2)
+    
+    def test_resumes_from_checkpoint(self):
+        """A copy interrupted after a committed batch carries on from its checkpoint"""
+        from adeptly import dbcopy
+        from adeptly.models import MigrationCheckpoint
+        
+        def crash(label, rows):
+            if label == 'adeptly.problem':
+                raise RuntimeError('connection lost')
+        
+        with self.assertRaises(RuntimeError):
+            dbcopy.copy_database('default', 'scratch', batch_size=3, on_batch=crash)
+        checkpoint = MigrationCheckpoint.objects.using('scratch').get(model='adeptly.problem')
+        self.assertEqual(checkpoint.rows_copied, 3)
+        self.assertEqual(Problem.objects.using('scratch').count(), 3)
+        
+        result = dbcopy.copy_database('default', 'scratch', batch_size=3)
+        
+        self.assertEqual(result.counts['adeptly.problem'], 4)
+        self.assertEqual(result.counts['adeptly.topic'], 0)
+        self.assertTrue(all(check.matches for check in dbcopy.verify('default', 'scratch')))
+        self.assertCopied()
+    
+    def test_picks_up_new_rows(self):
+        """Running the copy again copies rows added to the source since"""
+        from django.core.management.base import CommandError
+        
+        self.migrate()
+        Topic.objects.create(name="Topic 3")
+        
+        with self.assertRaises(CommandError):
+            self.migrate(verify_only=True)
+        output = self.migrate()
+        
+        self.assertIn('Copied 2 new rows', output)  # The topic and its TopicStats row
+        self.assertCopied()
+    
+    def test_changed_rows_fail_verification(self):
+        """Rows changed after they were copied are reported by the verification pass"""
+        from adeptly import dbcopy
+        
+        self.migrate()
+        Problem.objects.filter(name='Problem 0').update(prompt="Find the flow.")
+        
+        checks = {check.model: check for check in dbcopy.verify('default', 'scratch')}
+        self.assertFalse(checks['adeptly.problem'].matches)
+        self.assertEqual(checks['adeptly.problem'].source_count, checks['adeptly.problem'].target_count)
+        self.assertTrue(checks['adeptly.topic'].matches)
+    
+    def test_refuses_non_empty_target(self):
+        """A target with rows but no checkpoints is only overwritten with --flush"""
+        from django.core.management.base import CommandError
+        
+        Rank.objects.using('scratch').create(name='Stray')
+        
+        with self.assertRaisesMessage(CommandError, '--flush'):
+            self.migrate()
+        self.migrate(flush=True)
+        
+        self.assertCopied()
+    
+    def test_unconfigured_alias_is_refused(self):
+        """Test that a missing alias names the setting that defines it"""
+        from django.core.management.base import CommandError
+        
+        with self.assertRaisesMessage(CommandError, 'DATABASE_URL'):
+            self.migrate(target='postgres-missing')
+
+
+class LoadDataGeneratorTests(TestCase):
+    """Tests for the synthetic generate_load_data dataset"""
+    
+    def generate(self, **kwargs):
+        from adeptly import loadgen
+        options = {'users': 40, 'topics': 6, 'problems': 80, 'sessions': 150, 'seed': 3, **kwargs}
+        return loadgen.generate(**options)
+    
+    def snapshot(self):
+        return {
+            'problems': list(Problem.objects.order_by('id').values_list('name', 'difficulty', 'correct_answer')),
+            'sessions': list(TrainingSession.objects.order_by('id').values_list(
+                'user_id', 'created_at', 'correct_attempts', 'incorrect_attempts')),
+            'ledger': list(TopicExperienceEarned.objects.order_by('id').values_list(
+                'user_id', 'topic_id', 'problem_id', 'experience_earned')),
+        }
+    
+    def test_generated_data_is_consistent(self):
+        """Test that derived tables agree with the generated history"""
+        from django.db.models import F, Sum
+        from adeptly import leaderboard
+        from adeptly.models import AnswerAttempt, TrainingSessionSummary
+        
+        result = self.generate()
+        
+        self.assertEqual(result.counts['auth.user'], 40)
+        self.assertEqual(TrainingSession.objects.count(), 150)
+        self.assertEqual(leaderboard.find_discrepancies(), [])
+        self.assertEqual(
+            UserTopicStats.objects.aggregate(total=Sum('experience'))['total'],
+            TopicExperienceEarned.objects.aggregate(total=Sum('experience_earned'))['total'],
+        )
+        completed = TrainingSession.objects.filter(was_completed=True)
+        self.assertEqual(TrainingSessionSummary.objects.count(), completed.count())
+        session = completed.filter(correct_attempts__gt=0).first()
+        self.assertEqual(session.summary.correct_attempts, session.problems_completed.count())
+        self.assertEqual(session.items.count(), session.total_problems)
+        self.assertTrue(Problem.solved_by.through.objects.filter(user_id=session.user_id).exists())
+        
+        # Every answer is in the attempt log and counted on its problem
+        answers = TrainingSession.objects.aggregate(total=Sum(F('correct_attempts') + F('incorrect_attempts')))['total']
+        self.assertEqual(AnswerAttempt.objects.count(), answers)
+        self.assertEqual(Problem.objects.aggregate(total=Sum('attempt_count'))['total'], answers)
+        self.assertEqual(
+            AnswerAttempt.objects.filter(is_correct=True).count(),
+            TrainingSession.objects.aggregate(total=Sum('correct_attempts'))['total'],
+        )
+    
+    def test_same_seed_same_data(self):
+        """Test that a seed always generates the same rows"""
+        from django.db import transaction
+        
+        now = timezone.now()
+        with transaction.atomic():
+            self.generate(now=now)
+            first = self.snapshot()
+            transaction.set_rollback(True)
+        self.generate(now=now)
+        self.assertEqual(self.snapshot(), first)
+        
+        self.generate(seed=4, now=now)
+        added = self.snapshot()['problems'][len(first['problems']):]
+        self.assertNotEqual([problem[1:] for problem in added], [problem[1:] for problem in first['problems']])
+    
+    def test_generated_users_can_log_in(self):
+        """Test that generated users log in with the shared password"""
+        from adeptly import loadgen
+        
+        self.generate(sessions=5)
+        user = User.objects.order_by('id').first()
+        self.assertTrue(self.client.login(username=user.username, password=loadgen.PASSWORD))
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+    
+    def test_command(self):
+        """Test that the command reports the rows it generated"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        out = StringIO()
+        call_command('generate_load_data', users=5, topics=2, problems=10, sessions=20, stdout=out)
+        
+        self.assertIn('adeptly.trainingsession: 20 rows', out.getvalue())
+        self.assertIn('Generated', out.getvalue())
+
+
+class LoadTestHarnessTests(LiveServerTestCase):
+    """Tests for the HTTP load-test harness against a live server"""
+    
+    def setUp(self):
+        from adeptly import loadgen
+        loadgen.generate(users=4, topics=3, problems=30, sessions=10, seed=17)
+        self.usernames = list(User.objects.order_by('id').values_list('username', flat=True))
+    
+    def tearDown(self):
+        # Write the live server's queued attempts before the tables are flushed
+        from adeptly import attempts
+        attempts.buffer.flush()
+    
+    def test_journeys_cover_the_training_flow(self):
+        """Test that every journey walks the whole flow and is reported per endpoint"""
+        from adeptly import loadgen, loadtest
+        
+        sessions = TrainingSession.objects.count()
+        
+        report = loadtest.run(
+            self.live_server_url, [(username, loadgen.PASSWORD) for username in self.usernames],
+            concurrency=1, journeys=3, problems=2, seed=1,
+        )
+        
+        self.assertEqual(report.errors, [])
+        self.assertEqual((report.journeys, report.failed_journeys), (3, 0))
+        endpoints = {stats.endpoint: stats for stats in report.endpoints}
+        self.assertEqual(set(endpoints), {
+            'GET login', 'POST login', 'GET training_setup', 'POST training_setup',
+            'GET training_problem', 'POST training_problem', 'GET training_results', 'GET leaderboard',
+        })
+        self.assertEqual(endpoints['POST training_problem'].requests, 6)
+        self.assertEqual(endpoints['GET leaderboard'].requests, 3)
+        self.assertTrue(all(stats.p50_ms <= stats.p95_ms <= stats.max_ms for stats in report.endpoints))
+        started = TrainingSession.objects.order_by('id')[sessions:]
+        self.assertEqual([session.was_completed for session in started], [True] * 3)
+    
+    def test_failed_logins_are_counted(self):
+        """Test that a rejected login fails the journey and counts as an error"""
+        from adeptly import loadtest
+        
+        report = loadtest.run(self.live_server_url, [(self.usernames[0], 'wrong')], concurrency=1, journeys=2)
+        
+        self.assertEqual(report.failed_journeys, 2)
+        endpoints = {stats.endpoint: stats for stats in report.endpoints}
+        self.assertEqual(endpoints['POST login'].errors, 2)
+        self.assertEqual(endpoints['POST login'].error_rate, 1)
+        self.assertNotIn('GET training_setup', endpoints)
+    
+    def test_command(self):
+        """Test that the command prints a row per endpoint and writes a JSON report"""
+        import json
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('loadtest', self.live_server_url, concurrency=1, journeys=1, problems=1,
+                         json=path, stdout=out)
+            with open(path) as f:
+                saved = json.load(f)
+        
+        self.assertIn('POST training_problem', out.getvalue())
+        self.assertIn('1 journeys', out.getvalue())
+        self.assertEqual(saved['failed_journeys'], 0)
+    
+    def test_command_needs_users(self):
+        """Test that the command asks for load data when there are no test users"""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        
+        User.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('loadtest', self.live_server_url)
+
+
+class RequestMetricsTests(TestCase):
+    """Tests for the per-request SQL and timing middleware"""
+    
+    def setUp(self):
+        import request_metrics
+        request_metrics.metrics.clear()
+        self.user = User.objects.create_user(username='metricsuser', password='testpassword')
+        self.client = Client()
+        self.client.login(username='metricsuser', password='testpassword')
+    
+    def test_server_timing_and_log_line(self):
+        """Test that a request is logged as JSON and staff responses carry Server-Timing"""
+        import json
+        
+        with self.assertLogs('request_metrics', level='INFO') as logs:
+            response = self.client.get(reverse('dashboard'))
+        
+        self.assertNotIn('Server-Timing', response)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['view'], line['status']), ('dashboard', 200))
+        self.assertGreater(line['queries'], 0)
+        
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('dashboard'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries", app;dur=')
+    
+    def test_fingerprint(self):
+        """Test that fingerprints ignore literals and IN list lengths"""
+        from request_metrics import fingerprint
+        
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'it''s'"),
+            fingerprint("SELECT *  FROM t WHERE id = 22 AND name = 'x'"),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+    
+    def test_repeated_queries_are_reported(self):
+        """Test that an N+1 is logged and shows up in the metrics dump for staff"""
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from request_metrics import RequestMetricsMiddleware
+        
+        topics = [Topic.objects.create(name=f'Topic {i}') for i in range(4)]
+        
+        def n_plus_one(request):
+            for topic in topics:
+                Topic.objects.get(pk=topic.pk)
+            return HttpResponse()
+        
+        with self.assertLogs('request_metrics.slow', level='WARNING'):
+            RequestMetricsMiddleware(n_plus_one)(RequestFactory().get('/n-plus-one/'))
+        
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        
+        self.user.is_staff = True
+        self.user.save()
+        dump = self.client.get('/metrics/').json()
+        
+        self.assertEqual(len(dump['duplicate_queries']), 1)
+        duplicate = dump['duplicate_queries'][0]
+        self.assertEqual((duplicate['view'], duplicate['requests'], duplicate['max_runs']), ('unresolved', 1, 4))
+        self.assertIn('"adeptly_topic"', duplicate['sql'])
+        views = {summary['view']: summary for summary in dump['slow_views']}
+        self.assertEqual(views['unresolved']['max_queries'], 4)
+        self.assertEqual(sum(views['unresolved']['histogram'].values()), 1)
+
+
+class PerformanceBudgetTests(TestCase):
+    """
+    Query-count budgets for every view in adeptly/urls.py, measured against a
+    large synthetic dataset. Each view is requested several times; the most
+    queries any request issued must stay within its budget. Set
+    ADEPTLY_PERF_REPORT to a file path to also write p50/p95 latencies there
+    as a JSON report.
+    """
+    
+    SAMPLES = 10
+    
+    USERS = 2000
+    TOPICS = 20
+    PROBLEMS = 2000
+    SESSIONS = 3000
+    PROBLEMS_PER_SESSION = 5
+    
+    # URL name: (query budget, whether the client is logged in, method)
+    BUDGETS = {
+        'simple_home': (0, False, 'get'),
+        'dashboard': (4, True, 'get'),
+        'training_setup': (3, True, 'get'),
+        'training_problem': (4, True, 'get'),
+        'training_results': (3, True, 'get'),
+        'problem-list': (6, True, 'get'),
+        'problem-create': (3, True, 'get'),
+        'problem-preview': (4, True, 'get'),
+        'problem-update': (5, True, 'get'),
+        'problem-delete': (4, True, 'get'),
+        'topic-create': (2, True, 'get'),
+        'topic-update': (3, True, 'get'),
+        'topic-delete': (3, True, 'get'),
+        'leaderboard': (9, True, 'get'),
+        'login': (0, False, 'get'),
+        'logout': (0, False, 'post'),
+        'register': (0, False, 'get'),
+    }
+    
+    # Query strings measured on top of the plain URL, with their own budgets
+    VARIANTS = {
+        'problem-list': {'?after=1000': 6, '?topic={topic}': 6, '?q=design': 8},
+        'leaderboard': {'?period=week': 10, '?period=month': 10},
+    }
+    
+    report = {}
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Generate users, problems, sessions and an XP ledger"""
+        from adeptly import loadgen
+        
+        loadgen.generate(
+            users=cls.USERS, topics=cls.TOPICS, problems=cls.PROBLEMS, sessions=cls.SESSIONS,
+            problems_per_session=cls.PROBLEMS_PER_SESSION, seed=15,
+        )
+        
+        # The most active trainee, so the dashboard shows full pages
+        cls.user = User.objects.order_by('id').first()
+        cls.topic = Topic.objects.order_by('id').first()
+        cls.problem = Problem.objects.order_by('id').first()
+        cls.session = TrainingSession.objects.create(user=cls.user, estimated_time_to_complete=30)
+        cls.session.set_problems(Problem.objects.order_by('id').values_list('id', flat=True)[:cls.PROBLEMS_PER_SESSION])
+        cls.completed_session = TrainingSession.objects.filter(user=cls.user, was_completed=True).first()
+    
+    @classmethod
+    def tearDownClass(cls):
+        import json
+        import os
+        
+        super().tearDownClass()
+        path = os.environ.get('ADEPTLY_PERF_REPORT')
+        if not path:
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(cls.report, f, indent=2, sort_keys=True)
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+    
+    def url_kwargs(self, name):
+        return {
+            'training_problem': {'session_id': self.session.id, 'problem_index': 2},
+            'training_results': {'session_id': self.completed_session.id},
+            'problem-preview': {'pk': self.problem.pk},
+            'problem-update': {'pk': self.problem.pk},
+            'problem-delete': {'pk': self.problem.pk},
+            'topic-update': {'pk': self.topic.pk},
+            'topic-delete': {'pk': self.topic.pk},
+        }.get(name, {})
+    
+    def measure(self, url, logged_in, method):
+        """(most queries issued, latencies in ms) over SAMPLES requests"""
+        import time
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        client = Client()
+        if logged_in:
+            client.force_login(self.user)
+        most_queries = 0
+        latencies = []
+        for _ in range(self.SAMPLES):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = getattr(client, method)(url)
+                latencies.append((time.perf_counter() - start) * 1000)
+            self.assertLess(response.status_code, 400, url)
+            most_queries = max(most_queries, len(queries.captured_queries))
+        return most_queries, latencies
+    
+    def record(self, label, queries, budget, latencies):
+        import math
+        latencies = sorted(latencies)
+        
+        def percentile(p):
+            return round(latencies[max(math.ceil(p / 100 * len(latencies)) - 1, 0)], 2)
+        
+        self.report[label] = {
+            'queries': queries,
+            'budget': budget,
+            'p50_ms': percentile(50),
+            'p95_ms': percentile(95),
+            'samples': len(latencies),
+        }
+    
+    def test_every_view_has_a_budget(self):
+        """Test that new URLs can't be added without a query budget"""
+        from adeptly.urls import urlpatterns
+        self.assertEqual({pattern.name for pattern in urlpatterns}, set(self.BUDGETS))
+    
+    def test_query_budgets(self):
+        """Test that no view issues more queries than its budget"""
+        for name, (budget, logged_in, method) in self.BUDGETS.items():
+            url = reverse(name, kwargs=self.url_kwargs(name))
+            variants = {'': budget, **self.VARIANTS.get(name, {})}
+            for variant, budget in variants.items():
+                label = name + variant.format(topic='<id>')
+                with self.subTest(view=label):
+                    queries, latencies = self.measure(url + variant.format(topic=self.topic.pk), logged_in, method)
+                    self.record(label, queries, budget, latencies)
+                    self.assertLessEqual(queries, budget, f'{label} issued {queries} queries')
+
+
 class RegistrationTests(TestCase):
     """Tests for the user registration functionality"""
     
@@ -8,8 +8,10 @@ from django.contrib.auth import login, authenticate
 from django.utils import timezone
 from django.db.models import Sum, Count, Q, F, Value, IntegerField, Case, When
 
-from .models import User, Topic, Problem, TrainingSession, UserTopicStats, TopicExperienceEarned, Rank
+from .models import User, Topic, Problem, TrainingSession, SessionProblem, UserTopicStats, TopicExperienceEarned, Rank
 from .forms import ProblemForm, TrainingPreferencesForm, RegistrationForm, TopicForm
+from . import attempts, grading, search, selection, solved, stats
+from . import leaderboard as leaderboard_engine
 
 def register(request):
     """User registration view"""
@@ -33,24 +35,7 @@ def dashboard(request):
     Main dashboard for the Adeptly application.
     Shows user stats, recent training, and navigation options.
     """
-    user = request.user
-    
-    # Calculate user stats
-    total_experience = UserTopicStats.objects.filter(user=user).aggregate(Sum('experience'))['experience__sum'] or 0
-    
-    # Calculate user's overall rank
-    users_above = User.objects.annotate(
-        total_experience=Sum('topic_stats__experience')
-    ).filter(total_experience__gt=total_experience).count()
-    user_rank = users_above + 1
-    
-    user_stats = {
-        'total_experience': total_experience,
-        'topics_trained': UserTopicStats.objects.filter(user=user).count(),
-        'problems_solved': user.solved_problems.count(),
-        'recent_sessions': user.training_sessions.order_by('-created_at')[:5],
-        'rank': user_rank,
-    }
+    user_stats = stats.get_dashboard_stats(request.user)
     
     return render(request, 'adeptly/dashboard.html', {
         'user_stats': user_stats,
@@ -74,26 +59,20 @@ def training_setup(request):
             # Add selected topics
             session.topics_covered.set(form.cleaned_data['topics'])
             
-            # Select problems based on preferences
-            problems = Problem.objects.filter(
-                topics__in=form.cleaned_data['topics'],
-                difficulty__in=form.cleaned_data['difficulty_levels']
-            ).distinct()
+            # Select problems from the user's adaptive queue, packed into the available time
+            problem_ids = selection.select_problems(
+                request.user,
+                [topic.id for topic in form.cleaned_data['topics']],
+                form.cleaned_data['difficulty_levels'],
+                form.cleaned_data['time_available']
+            )
             
             # Check if we have any problems matching the criteria
-            if not problems.exists():
-                session.was_completed = True
-                session.completed_at = timezone.now()
-                session.save()
+            if not problem_ids:
+                stats.complete_session(session)
                 return redirect('training_results', session_id=session.id)
             
-            # Limit problems based on available time
-            avg_time_per_problem = problems.aggregate(avg=Sum('estimated_time_to_complete') / Count('id'))['avg'] or 5
-            max_problems = int(form.cleaned_data['time_available'] / avg_time_per_problem)
-            
-            selected_problems = problems.order_by('?')[:max_problems]
-            session.problems.set(selected_problems)
-            session.save()
+            session.set_problems(problem_ids)
             
             return redirect('training_problem', session_id=session.id, problem_index=0)
     else:
@@ -107,72 +86,27 @@ def training_problem(request, session_id, problem_index):
     View for displaying a problem during a training session.
     """
     session = get_object_or_404(TrainingSession, id=session_id, user=request.user)
-    problems = list(session.problems.all())
     
     # Check if we've reached the end of the session or have an invalid index
-    if problem_index >= len(problems) or problem_index < 0:
-        session.was_completed = True
-        session.completed_at = timezone.now()
-        session.save()
+    if problem_index >= session.total_problems or problem_index < 0:
+        stats.complete_session(session)
         return redirect('training_results', session_id=session.id)
     
-    current_problem = problems[problem_index]
+    item = SessionProblem.objects.select_related('problem').filter(
+        session=session, position=problem_index
+    ).first()
+    
+    # The problem was deleted from the bank after the session started
+    if item is None:
+        return redirect('training_problem', session_id=session.id, problem_index=problem_index + 1)
+    
+    current_problem = item.problem
     
     if request.method == 'POST':
         selected_answer = request.POST.get('answer')
         if selected_answer:
-            is_correct = selected_answer == current_problem.correct_answer
-            
-            # Update session stats
-            if is_correct:
-                session.correct_attempts += 1
-                
-                # Mark problem as solved and add to completed problems
-                if current_problem not in request.user.solved_problems.all():
-                    request.user.solved_problems.add(current_problem)
-                
-                session.problems_completed.add(current_problem)
-                
-                # Award experience for each topic
-                for topic in current_problem.topics.all():
-                    # Calculate experience based on difficulty
-                    exp_earned = current_problem.difficulty * 10
-                    
-                    # Record experience earned
-                    TopicExperienceEarned.objects.create(
-                        user=request.user,
-                        topic=topic,
-                        experience_earned=exp_earned,
-                        training_session=session,
-                        problem=current_problem
-                    )
-                    
-                    # Update user topic stats
-                    stat, created = UserTopicStats.objects.get_or_create(
-                        user=request.user,
-                        topic=topic,
-                        defaults={
-                            'rank': Rank.objects.get_or_create(name='Beginner')[0],
-                            'experience': 0
-                        }
-                    )
-                    
-                    stat.experience += exp_earned
-                    
-                    # Update rank based on experience
-                    if stat.experience >= 1000:
-                        stat.rank = Rank.objects.get_or_create(name='Expert')[0]
-                    elif stat.experience >= 500:
-                        stat.rank = Rank.objects.get_or_create(name='Advanced')[0]
-                    elif stat.experience >= 100:
-                        stat.rank = Rank.objects.get_or_create(name='Intermediate')[0]
-                    
-                    stat.save()
-            
-            else:
-                session.incorrect_attempts += 1
-            
-            session.save()
+            elapsed_ms = attempts.elapsed_ms(request.POST.get('shown'), session.id, current_problem.id)
+            grading.record_answer(request.user, session, current_problem, selected_answer, elapsed_ms)
             
             # Move to the next problem
             return redirect('training_problem', session_id=session.id, problem_index=problem_index + 1)
@@ -181,78 +115,158 @@ def training_problem(request, session_id, problem_index):
         'problem': current_problem,
         'session': session,
         'problem_number': problem_index + 1,
-        'total_problems': len(problems)
+        'total_problems': session.total_problems,
+        'shown_token': attempts.shown_token(session.id, current_problem.id),
     })
 
 @login_required
 def training_results(request, session_id):
     """
     View for displaying the results of a completed training session.
+    Renders from the session's stored summary.
     """
-    session = get_object_or_404(TrainingSession, id=session_id, user=request.user)
+    session = get_object_or_404(
+        TrainingSession.objects.select_related('summary'), id=session_id, user=request.user
+    )
     
-    # Calculate statistics
-    total_problems = session.problems.count()
-    correct = session.correct_attempts
-    accuracy = (correct / total_problems * 100) if total_problems > 0 else 0
-    
-    # Prepare context variables
-    context = {
+    return render(request, 'adeptly/training_results.html', {
         'session': session,
-        'total_problems': total_problems,
-        'correct': correct,
-        'accuracy': accuracy,
-    }
-    
-    # If there are no problems, we don't need to calculate experience
-    if total_problems == 0:
-        context['total_exp_earned'] = 0
-        context['experience_breakdown'] = []
-        return render(request, 'adeptly/training_results.html', context)
-    
-    # Calculate total experience earned
-    experience_breakdown = TopicExperienceEarned.objects.filter(
-        training_session=session
-    ).values('topic__name').annotate(total_exp=Sum('experience_earned'))
-    
-    total_exp_earned = TopicExperienceEarned.objects.filter(
-        training_session=session
-    ).aggregate(Sum('experience_earned'))['experience_earned__sum'] or 0
-    
-    context['experience_breakdown'] = experience_breakdown
-    context['total_exp_earned'] = total_exp_earned
-    
-    return render(request, 'adeptly/training_results.html', context)
+        'summary': stats.get_session_summary(session),
+    })
 
 class ProblemListView(LoginRequiredMixin, ListView):
     """
     View for listing and managing training problems.
+    Pages are fetched with keyset pagination on the problem id (?after= and
+    ?before= cursors), so every page costs the same however deep it is.
+    ?q= searches the full-text index and lists matches best first.
+    Problems the user has solved are marked from their cached solved set.
+    Add ?format=json for a JSON version of the page.
     """
     model = Problem
     template_name = 'adeptly/problem_list.html'
     context_object_name = 'problems'
+    paginate_by = 25
+    
+    def get_int_param(self, name):
+        """An integer query parameter, or None if it's missing or invalid"""
+        try:
+            return int(self.request.GET[name])
+        except (KeyError, ValueError):
+            return None
     
     def get_queryset(self):
-        queryset = Problem.objects.all()
+        queryset = Problem.objects.only(
+            'id', 'name', 'difficulty', 'estimated_time_to_complete', 'solve_count', 'attempt_count'
+        )
         
         # Apply filters if present
-        topic = self.request.GET.get('topic')
-        difficulty = self.request.GET.get('difficulty')
+        topic = self.get_int_param('topic')
+        difficulty = self.get_int_param('difficulty')
         
-        if topic:
-            queryset = queryset.filter(topics__id=topic)
+        if topic is not None:
+            # Filter through the (topic_id, problem_id) index rather than joining
+            queryset = queryset.filter(
+                id__in=Problem.topics.through.objects.filter(topic_id=topic).values('problem_id')
+            )
         
-        if difficulty:
+        if difficulty is not None:
             queryset = queryset.filter(difficulty=difficulty)
         
-        return queryset
+        return queryset.prefetch_related('topics')
+    
+    def paginate_queryset(self, queryset, page_size):
+        after = self.get_int_param('after')
+        before = self.get_int_param('before')
+        
+        query = self.request.GET.get('q', '').strip()
+        if query:
+            return self.paginate_search(queryset, query, page_size, after, before)
+        
+        # Fetch one extra row to find out whether there's another page
+        if before is not None:
+            rows = list(queryset.filter(id__lt=before).order_by('-id')[:page_size + 1])
+            has_more = len(rows) > page_size
+            problems = rows[:page_size][::-1]
+            has_previous, has_next = has_more, True
+        else:
+            if after is not None:
+                queryset = queryset.filter(id__gt=after)
+            rows = list(queryset.order_by('id')[:page_size + 1])
+            problems = rows[:page_size]
+            has_previous, has_next = after is not None, len(rows) > page_size
+        
+        self.next_cursor = problems[-1].id if problems and has_next else None
+        self.previous_cursor = problems[0].id if problems and has_previous else None
+        return (None, None, problems, has_next or has_previous)
+    
+    def paginate_search(self, queryset, query, page_size, after, before):
+        """Page through search matches in rank order, using ids as cursors"""
+        # The topic and difficulty filters go into the search itself, so the
+        # result cap applies to filtered matches rather than hiding them
+        within = queryset if queryset.query.has_filters() else None
+        ranked = search.search_ids(query, within=within)
+        positions = {problem_id: position for position, problem_id in enumerate(ranked)}
+        
+        if before in positions:
+            end = positions[before]
+            start = max(end - page_size, 0)
+        else:
+            start = positions[after] + 1 if after in positions else 0
+            end = start + page_size
+        
+        page_ids = ranked[start:end]
+        problems = sorted(queryset.filter(id__in=page_ids), key=lambda problem: positions[problem.id])
+        
+        self.next_cursor = page_ids[-1] if page_ids and end < len(ranked) else None
+        self.previous_cursor = page_ids[0] if page_ids and start > 0 else None
+        return (None, None, problems, len(ranked) > page_size)
+    
+    def page_url(self, cursor_name, cursor):
+        """The current URL with the page cursor replaced"""
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[cursor_name] = cursor
+        return '?' + params.urlencode()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['topics'] = Topic.objects.all()
-        context['difficulty_levels'] = Problem.DIFFICULTY_CHOICES
-        context['topic_form'] = TopicForm()
+        solved_set = solved.get_solved_set(self.request.user.pk)
+        for problem in context['problems']:
+            problem.is_solved = problem.id in solved_set
+        context['solved_total'] = len(solved_set)
+        if self.next_cursor is not None:
+            context['next_page_url'] = self.page_url('after', self.next_cursor)
+        if self.previous_cursor is not None:
+            context['previous_page_url'] = self.page_url('before', self.previous_cursor)
+        if self.request.GET.get('format') != 'json':
+            context['topics'] = Topic.objects.all()
+            context['difficulty_levels'] = Problem.DIFFICULTY_CHOICES
+            context['topic_form'] = TopicForm()
         return context
+    
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get('format') == 'json':
+            return JsonResponse({
+                'problems': [
+                    {
+                        'id': problem.id,
+                        'name': problem.name,
+                        'difficulty': problem.difficulty,
+                        'estimated_time_to_complete': problem.estimated_time_to_complete,
+                        'solve_count': problem.solve_count,
+                        'attempt_count': problem.attempt_count,
+                        'is_solved': problem.is_solved,
+                        'topics': [{'id': topic.id, 'name': topic.name} for topic in problem.topics.all()],
+                    }
+                    for problem in context['problems']
+                ],
+                'solved_total': context['solved_total'],
+                'next_cursor': self.next_cursor,
+                'previous_cursor': self.previous_cursor,
+            })
+        return super().render_to_response(context, **response_kwargs)
 
 class ProblemCreateView(LoginRequiredMixin, CreateView):
     model = Problem
@@ -344,10 +358,18 @@ def leaderboard(request):
         except (Topic.DoesNotExist, ValueError):
             pass
     
+    # Overall leaderboard for the selected period, from the XP rollups
+    # unless it's all time
+    period = request.GET.get('period', 'all')
+    if period not in leaderboard_engine.PERIODS:
+        period = 'all'
+    period_start = leaderboard_engine.period_start(period)
+    
     # Overall leaderboard - users ranked by total experience
-    overall_leaderboard = User.objects.annotate(
-        total_experience=Sum('topic_stats__experience')
-    ).filter(total_experience__isnull=False).order_by('-total_experience')[:10]
+    if period_start:
+        overall_leaderboard = leaderboard_engine.top_users_since(period_start, 10)
+    else:
+        overall_leaderboard = leaderboard_engine.top_users(10)
     
     # Topic-specific leaderboard
     if selected_topic:
@@ -360,68 +382,43 @@ def leaderboard(request):
     # Get user's rank in the overall leaderboard (if logged in)
     user_rank = None
     if request.user.is_authenticated:
-        user_total_exp = UserTopicStats.objects.filter(user=request.user).aggregate(Sum('experience'))['experience__sum'] or 0
-        # Count users with more experience than the current user
-        users_above = User.objects.annotate(
-            total_experience=Sum('topic_stats__experience')
-        ).filter(total_experience__gt=user_total_exp).count()
-        
-        # User's rank is the number of users with more experience + 1
-        user_rank = users_above + 1
+        if period_start:
+            user_rank = leaderboard_engine.user_rank_since(request.user, period_start)
+        else:
+            user_rank = leaderboard_engine.user_rank(request.user)
     
     # Get user's rank in the topic-specific leaderboard (if applicable)
     user_topic_rank = None
     user_topic_stats = None
     if request.user.is_authenticated and selected_topic:
-        # Use a flag to track if we found the user's stats for this topic
-        user_has_topic_stats = False
-        
-        # Get all user's stats for all topics
         user_topic_stats = UserTopicStats.objects.filter(
-            user=request.user
-        )
-        
-        # Check if the user has stats for the selected topic
-        for stat in user_topic_stats:
-            if stat.topic_id == selected_topic.id:
-                user_has_topic_stats = True
-                user_experience = stat.experience
-                break
+            user=request.user,
+            topic=selected_topic
+        ).first()
         
         # Count users with more experience in this topic only if the user has stats
-        if user_has_topic_stats:
+        if user_topic_stats:
             users_above_topic = UserTopicStats.objects.filter(
                 topic=selected_topic,
-                experience__gt=user_experience
+                experience__gt=user_topic_stats.experience
             ).count()
             
             # User's topic rank is the number of users with more experience + 1
             user_topic_rank = users_above_topic + 1
     
     # Get some additional stats for the leaderboard
-    total_users_with_exp = User.objects.annotate(
-        total_experience=Sum('topic_stats__experience')
-    ).filter(total_experience__gt=0).count()
-    
-    # Find the most popular topic based on number of stats entries
-    topic_popularity = UserTopicStats.objects.values('topic__name').annotate(
-        users_count=Count('user', distinct=True)
-    ).order_by('-users_count').first()
-    
-    most_popular_topic = topic_popularity['topic__name'] if topic_popularity else None
-    
-    # Find the top user's experience
-    top_user_exp = UserTopicStats.objects.values('user').annotate(
-        total_exp=Sum('experience')
-    ).order_by('-total_exp').first()
-    
-    top_exp = top_user_exp['total_exp'] if top_user_exp else 0
+    total_users_with_exp = leaderboard_engine.total_users_with_experience()
+    most_popular_topic = leaderboard_engine.most_popular_topic()
+    top_exp = leaderboard_engine.top_experience()
     
     return render(request, 'adeptly/leaderboard.html', {
         'overall_leaderboard': overall_leaderboard,
         'topic_leaderboard': topic_leaderboard,
         'topics': topics,
         'selected_topic': selected_topic,
+        'periods': leaderboard_engine.PERIODS,
+        'period': period,
+        'period_label': leaderboard_engine.PERIODS[period],
         'user_rank': user_rank,
         'user_topic_rank': user_topic_rank,
         'user_topic_stats': user_topic_stats,
@@ -1,15 +1,19 @@
 """
-Script to import data from a JSON file into a PostgreSQL database.
+Script to import data into a PostgreSQL database.
 Run this after export_sqlite_data.py and setting up PostgreSQL.
+
+This is a thin wrapper around `python manage.py restore_data`, which streams
+the export and bulk-loads it with COPY. It accepts the data_export/ directory
+written by export_sqlite_data.py or an older data_dump.json file.
 """
 
 import os
 import sys
 import django
-import json
 from django.core.management import call_command
 from django.db import connection
-from django.core import serializers
+
+SOURCES = ['data_export', 'data_dump.json']
 
 def main():
     print("Starting data import to PostgreSQL database...")
@@ -18,9 +22,10 @@ def main():
     if 'USE_SQLITE' in os.environ:
         del os.environ['USE_SQLITE']
     
-    # Check if data_dump.json exists
-    if not os.path.exists('data_dump.json'):
-        print("❌ Error: data_dump.json not found!")
+    # Find the export to load
+    source = next((path for path in SOURCES if os.path.exists(path)), None)
+    if source is None:
+        print("❌ Error: neither data_export/ nor data_dump.json was found!")
         print("Please run export_sqlite_data.py first.")
         sys.exit(1)
     
@@ -43,28 +48,9 @@ def main():
     print("\nRunning migrations...")
     call_command('migrate')
     
-    # Clear ContentType table to avoid conflicts
-    print("\nClearing ContentType table...")
+    print(f"\nImporting data from {source}...")
     try:
-        from django.contrib.contenttypes.models import ContentType
-        ContentType.objects.all().delete()
-        print("ContentType table cleared successfully!")
-    except Exception as e:
-        print(f"Warning: Could not clear ContentType table: {e}")
-    
-    # Import data with better error handling
-    print("\nImporting data from data_dump.json...")
-    try:
-        # Read the data file with explicit encoding
-        with open('data_dump.json', 'r', encoding='utf-8') as f:
-            data = f.read()
-        
-        # Process the data
-        for obj in serializers.deserialize('json', data):
-            try:
-                obj.save()
-            except Exception as e:
-                print(f"Warning: Could not save object {obj.object.__class__.__name__} - {e}")
+        call_command('restore_data', source)
         
         print("\n✅ Data import completed successfully!")
         print("Your PostgreSQL database now contains all the data from SQLite.")
@@ -76,6 +62,7 @@ def main():
         print("1. Try using loaddata directly:")
         print("   python manage.py loaddata data_dump.json")
         print("2. If that fails, you may need to manually recreate your data in PostgreSQL")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
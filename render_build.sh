@@ -13,6 +13,9 @@ pip install -r requirements.txt
 # Initialize application data - commented out since not currently needed
 # python manage.py setup_adeptly
 
+# Create the table behind the shared cache (a no-op once it exists)
+python manage.py createcachetable
+
 # Collect static files
 python manage.py collectstatic --no-input
 
@@ -0,0 +1,209 @@
+"""
+Per-request SQL and timing instrumentation for Django
+
+RequestMetricsMiddleware wraps every request in connection.execute_wrapper()
+to count its queries and the time spent in the database. Each request is
+logged as one JSON line: at INFO on the "request_metrics" logger, or as a
+warning on "request_metrics.slow" if it was slow or ran an N+1. Responses
+get a Server-Timing header (visible in the browser's network panel) when
+DEBUG is on or the user is staff, so timings aren't exposed to everyone.
+
+Timings are also kept in process, per URL name, over a rolling window of the
+last WINDOW requests. Queries are fingerprinted with their literals stripped;
+a fingerprint that runs DUPLICATE_THRESHOLD or more times in one request is
+almost always an N+1 and is recorded against the view. metrics_view dumps
+the slowest views and the worst duplicates for staff users.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponseForbidden, JsonResponse
+
+logger = logging.getLogger('request_metrics')
+slow_logger = logging.getLogger('request_metrics.slow')
+
+# Requests kept per URL name
+WINDOW = 500
+
+# Requests slower than this are logged as warnings
+SLOW_MS = 500
+
+# Runs of the same query in one request that count as an N+1
+DUPLICATE_THRESHOLD = 3
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """`sql` with literals and IN lists collapsed, so repeats of a query match."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _percentile(values, p):
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return 0
+    return values[max(-(-p * len(values) // 100) - 1, 0)]
+
+
+class _QueryRecorder:
+    """An execute_wrapper that counts one request's queries and DB time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        """(fingerprint, runs) of the queries repeated DUPLICATE_THRESHOLD or more times."""
+        return [(sql, runs) for sql, runs in self.fingerprints.most_common() if runs >= DUPLICATE_THRESHOLD]
+
+
+class Metrics:
+    """Rolling per-view timings and duplicate-query counts for this process."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.samples = {}
+            self.requests = Counter()
+            self.duplicates = {}
+
+    def record(self, view, duration, queries, db_duration, duplicates):
+        with self.lock:
+            samples = self.samples.get(view)
+            if samples is None:
+                samples = self.samples[view] = deque(maxlen=self.window)
+            samples.append((duration, queries, db_duration))
+            self.requests[view] += 1
+            for sql, runs in duplicates:
+                seen = self.duplicates.setdefault((view, sql), {'requests': 0, 'max_runs': 0})
+                seen['requests'] += 1
+                seen['max_runs'] = max(seen['max_runs'], runs)
+
+    def views(self):
+        """Summaries of every view seen, slowest p95 first."""
+        with self.lock:
+            samples = {view: list(window) for view, window in self.samples.items()}
+            requests = dict(self.requests)
+
+        summaries = []
+        for view, window in samples.items():
+            durations = sorted(duration for duration, queries, db_duration in window)
+            histogram = [0] * (len(BUCKETS_MS) + 1)
+            for duration in durations:
+                histogram[next(
+                    (i for i, bound in enumerate(BUCKETS_MS) if duration <= bound), len(BUCKETS_MS)
+                )] += 1
+            summaries.append({
+                'view': view,
+                'requests': requests[view],
+                'window': len(window),
+                'p50_ms': round(_percentile(durations, 50), 2),
+                'p95_ms': round(_percentile(durations, 95), 2),
+                'max_ms': round(durations[-1], 2),
+                'avg_queries': round(sum(queries for _, queries, _ in window) / len(window), 2),
+                'max_queries': max(queries for _, queries, _ in window),
+                'avg_db_ms': round(sum(db_duration for _, _, db_duration in window) / len(window), 2),
+                'histogram': dict(zip([f'<={bound}ms' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}ms'], histogram)),
+            })
+        summaries.sort(key=lambda summary: summary['p95_ms'], reverse=True)
+        return summaries
+
+    def duplicate_queries(self):
+        """The repeated query fingerprints seen, most frequent first."""
+        with self.lock:
+            duplicates = [
+                {'view': view, 'sql': sql, **seen} for (view, sql), seen in self.duplicates.items()
+            ]
+        duplicates.sort(key=lambda duplicate: (duplicate['requests'], duplicate['max_runs']), reverse=True)
+        return duplicates
+
+
+metrics = Metrics()
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = _QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        duration = (time.perf_counter() - start) * 1000
+        db_duration = recorder.duration * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else 'unresolved'
+        duplicates = recorder.duplicates()
+        metrics.record(view, duration, recorder.count, db_duration, duplicates)
+
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response['Server-Timing'] = (
+                f'db;dur={db_duration:.2f};desc="{recorder.count} queries", '
+                f'app;dur={duration - db_duration:.2f}, total;dur={duration:.2f}'
+            )
+
+        line = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(duration, 2),
+            'queries': recorder.count,
+            'db_ms': round(db_duration, 2),
+        }
+        if duplicates:
+            line['duplicate_queries'] = [{'sql': sql, 'runs': runs} for sql, runs in duplicates[:5]]
+        if duplicates or duration > SLOW_MS:
+            slow_logger.warning(json.dumps(line))
+        else:
+            logger.info(json.dumps(line))
+        return response
+
+
+def metrics_view(request):
+    """The slowest views and repeated queries in this process, for staff only"""
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    try:
+        limit = max(int(request.GET.get('limit', 20)), 1)
+    except ValueError:
+        limit = 20
+    return JsonResponse({
+        'window': metrics.window,
+        'slow_views': metrics.views()[:limit],
+        'duplicate_queries': metrics.duplicate_queries()[:limit],
+    })
@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'request_metrics.RequestMetricsMiddleware',  # Query counts and timings per request
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise middleware
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -135,6 +136,23 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGIN_URL = 'login'
 
+# Per-request JSON log lines from request_metrics; slow requests and N+1
+# queries are logged as warnings, every request at INFO
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'request_metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_METRICS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 # Security settings
 # Temporarily disable these security settings to troubleshoot the 400 error
 SECURE_SSL_REDIRECT = False  # Set to True after fixing the 400 error
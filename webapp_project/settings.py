@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'request_metrics.RequestMetricsMiddleware',  # Query counts and timings per request
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +89,41 @@ else:
     }
     print(f"Using database specified in DATABASE_URL environment variable")
 
+# Aliases for migrate_to_postgres, which reads the SQLite database and writes
+# the PostgreSQL one in the same process. They're only defined when
+# DATABASE_URL or MIGRATE_FROM_SQLITE is set, and mirror the default database
+# under test so test runs never create a copy of them.
+if os.environ.get('DATABASE_URL') or os.environ.get('MIGRATE_FROM_SQLITE'):
+    DATABASES['sqlite'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+if os.environ.get('DATABASE_URL'):
+    DATABASES['postgres'] = dj_database_url.parse(os.environ['DATABASE_URL'])
+    DATABASES['postgres']['TEST'] = {'MIRROR': 'default'}
+
+# Cache
+# Rank ladder and problem index version stamps, solved sets and user
+# summaries are kept in Django's cache, which every worker process has to
+# share. Set REDIS_URL to use Redis (needs the redis package); otherwise a
+# local-memory cache is used, which only suits a single process such as
+# runserver or the test runner. settings_production falls back to a
+# database cache instead.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -125,3 +161,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Login redirect
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGIN_URL = 'login'
+
+# Per-request JSON log lines from request_metrics; slow requests and N+1
+# queries are logged as warnings on request_metrics.slow, every request at
+# INFO
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'request_metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_METRICS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
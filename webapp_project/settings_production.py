@@ -34,6 +34,16 @@ DATABASES = {
     )
 }
 
+# Gunicorn runs several workers, so without Redis the cache lives in a
+# database table shared by all of them (created by `createcachetable`)
+if not os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'adeptly_cache',
+        }
+    }
+
 # Security settings
 SECURE_SSL_REDIRECT = False  # Temporarily disable for troubleshooting
 SESSION_COOKIE_SECURE = False  # Temporarily disable for troubleshooting
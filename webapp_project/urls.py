@@ -7,6 +7,7 @@ from django.conf.urls.static import static
 # Import the debug view and health check
 from debug_view import debug_info
 from health_check import health_check
+from request_metrics import metrics_view
 from adeptly.simple_views import simple_home
 
 urlpatterns = [
@@ -14,6 +15,7 @@ urlpatterns = [
     path('', include('adeptly.urls')),
     path('debug/', debug_info),  # Add a debug URL
     path('health/', health_check),  # Add a health check URL
+    path('metrics/', metrics_view),  # Slow views and repeated queries, for staff
     path('test/', simple_home),  # Add a simple test page
 ]
 